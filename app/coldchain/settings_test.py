@@ -0,0 +1,33 @@
+# coldchain/settings_test.py
+"""
+Test settings: python manage.py test --settings=coldchain.settings_test
+
+SQLite instead of PostgreSQL (the PostgreSQL-only paths fall back to their
+generic twins), with a second database as the "lab" measurement shard so
+cross-shard code runs against two databases.
+"""
+import tempfile
+from pathlib import Path
+
+from coldchain.settings import *  # noqa: F401,F403
+
+_TMP = Path(tempfile.gettempdir())
+
+# files rather than in-memory: fan_out() reads shards from worker threads
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(_TMP / "coldchain_default.sqlite3"),
+        "TEST": {"NAME": str(_TMP / "coldchain_test_default.sqlite3")},
+    },
+    "lab": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(_TMP / "coldchain_lab.sqlite3"),
+        "TEST": {"NAME": str(_TMP / "coldchain_test_lab.sqlite3")},
+    },
+}
+MEASUREMENT_SITE_SHARDS = {"LAB": "lab"}
+MEASUREMENT_DEFAULT_SHARD = "default"
+
+RECENT_RING_PATH = ""
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
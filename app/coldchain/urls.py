@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
+from core.serializers.jwt import TokenRefreshWithClaimsSerializer
 from core.views import LoginView
 
 urlpatterns = [
@@ -8,7 +9,8 @@ urlpatterns = [
 
     # JWT endpoints (UPDATED LOGIN)
     path("api/auth/login", LoginView.as_view(), name="token_obtain_pair"),
-    path("api/auth/refresh", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/auth/refresh", TokenRefreshView.as_view(serializer_class=TokenRefreshWithClaimsSerializer),
+         name="token_refresh"),
 
     # Main ColdChain IoT API
     path("api/", include("core.urls")),
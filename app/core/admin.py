@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Device, Measurement, AlertRule, Ticket
+from .models import Device, Measurement, AlertRule, Ticket, ReclassifyJob, ExportJob, ImportJob, IngestRateStat
 
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
@@ -20,3 +20,23 @@ class AlertRuleAdmin(admin.ModelAdmin):
 class TicketAdmin(admin.ModelAdmin):
     list_display = ("device","status","severity","opened_at","closed_at","last_notified_role_index","attempt_count")
     list_filter = ("status","severity")
+
+@admin.register(ReclassifyJob)
+class ReclassifyJobAdmin(admin.ModelAdmin):
+    list_display = ("id","device","status","reason","rows_scanned","rows_total","rows_changed","created_at","finished_at")
+    list_filter = ("status","reason")
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id","user","device","site","fmt","status","rows_written","rows_total","created_at","expires_at")
+    list_filter = ("status","fmt")
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id","user","filename","status","stage","rows_read","inserted","skipped_duplicates","error_count","created_at")
+    list_filter = ("status",)
+
+@admin.register(IngestRateStat)
+class IngestRateStatAdmin(admin.ModelAdmin):
+    list_display = ("code","site","accepted","limited","bypassed","last_limited_at")
+    ordering = ("-last_limited_at",)
@@ -0,0 +1,76 @@
+# core/aggregates.py
+"""
+Registry of derived per-device aggregates that can be rebuilt from raw
+Measurement rows. Each builder is `fn(device_id, frm, to, *, using) -> rows`
+and must be idempotent for its [frm, to) slice, so the backfill command can
+run slices in any order, in parallel, and while live ingest continues.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from core.bucket_cache import invalidate as invalidate_metrics_cache
+from core.compliance import rebuild_compliance
+from core.excursions import rebuild_excursions
+from core.models import Measurement
+from core.rollups import rebuild_rollups
+from core.sharding import db_for_device
+
+AGGREGATES = {}
+
+DEFAULT_SLICE = timedelta(days=7)
+
+
+def register(name: str):
+    def deco(fn):
+        AGGREGATES[name] = fn
+        return fn
+    return deco
+
+
+register("rollups")(rebuild_rollups)
+# after "rollups": cached metric buckets are derived from them
+register("metrics_cache")(invalidate_metrics_cache)
+register("compliance")(rebuild_compliance)
+register("excursions")(rebuild_excursions)
+
+
+def device_bounds(device_id: int, *, using: str | None = None):
+    """(first ts, last ts) of a device's readings, via the (device, ts) index."""
+    using = using or db_for_device(device_id)
+    qs = Measurement.objects.using(using).filter(device_id=device_id).order_by("ts")
+    first = qs.values_list("ts", flat=True).first()
+    if first is None:
+        return None, None
+    last = qs.reverse().values_list("ts", flat=True).first()
+    return first, last
+
+
+def iter_slices(frm, to, step: timedelta = DEFAULT_SLICE):
+    """[lo, hi) slices covering [frm, to], aligned on UTC midnight."""
+    lo = frm.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    while lo <= to:
+        hi = lo + step
+        yield lo, hi
+        lo = hi
+
+
+def refresh_aggregates(device_id: int, frm=None, to=None, *, names=None, using: str | None = None,
+                       step: timedelta = DEFAULT_SLICE) -> int:
+    """
+    Rebuild the given (default: all) aggregates of one device over [frm, to];
+    open ends fall back to the device's first/last reading. Runs slice by
+    slice so no single transaction covers months of data.
+    """
+    using = using or db_for_device(device_id)
+    if frm is None or to is None:
+        first, last = device_bounds(device_id, using=using)
+        if first is None:
+            return 0
+        frm = frm or first
+        to = to or last
+
+    rows = 0
+    for name in (names or list(AGGREGATES)):
+        fn = AGGREGATES[name]
+        for lo, hi in iter_slices(frm, to, step):
+            rows += fn(device_id, lo, hi, using=using)
+    return rows
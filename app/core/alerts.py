@@ -1,8 +1,10 @@
 # core/alerts.py
 from datetime import timedelta
 from django.utils import timezone
+from core import counters, live, watermarks
 from core.models import Ticket, Measurement
 from core.notify import telegram_send
+from core.sharding import db_for_device
 
 CLEARANCE_MIN = 10  # normal-for-X minutes before auto-close
 
@@ -19,6 +21,9 @@ def on_violation(device, severity: str):
             opened_at=now,
             last_notified_at=now,
         )
+        counters.sync_tickets(device.id)
+        watermarks.touch(device.id, tickets=True)
+        live.publish_ticket(t, "opened")
         print(f"[alerts] OPEN ticket #{t.id} {device.code} {severity}", flush=True)
         telegram_send(f"🚨 {device.code} {severity}\nOpened at {now:%Y-%m-%d %H:%M UTC}")
         return
@@ -28,6 +33,9 @@ def on_violation(device, severity: str):
         t.severity = "CRITICAL"
         t.last_notified_at = now
         t.save(update_fields=["severity", "last_notified_at"])
+        counters.sync_tickets(device.id)
+        watermarks.touch(device.id, tickets=True)
+        live.publish_ticket(t, "escalated")
         print(f"[alerts] ESCALATE ticket #{t.id} -> CRITICAL", flush=True)
         telegram_send(f"⏫ {device.code} escalated to CRITICAL at {now:%H:%M} UTC")
 
@@ -42,12 +50,34 @@ def on_recovery(device):
     now = timezone.now()
     since = now - timedelta(minutes=CLEARANCE_MIN)
     recent_states = list(
-        Measurement.objects.filter(device=device, ts__gte=since).values_list("state", flat=True)
+        Measurement.objects.using(db_for_device(device)).filter(device=device, ts__gte=since).values_list("state", flat=True)
     )
 
     if recent_states and all(s == "NORMAL" for s in recent_states):
         t.status = "CLOSED"
         t.closed_at = now
         t.save(update_fields=["status", "closed_at"])
+        counters.sync_tickets(device.id)
+        watermarks.touch(device.id, tickets=True)
+        live.publish_ticket(t, "closed")
         print(f"[alerts] RESOLVE ticket #{t.id}", flush=True)
         telegram_send(f"✅ {device.code} back to normal\nClosed at {now:%Y-%m-%d %H:%M UTC}")
+
+
+def on_readings(device, states):
+    """
+    The hooks above for a batch of one device's readings (states in time
+    order), once per batch: recovery if the newest reading is NORMAL,
+    otherwise a violation at the worst severity of the trailing out-of-range run.
+    """
+    if not states:
+        return
+    if states[-1] == "NORMAL":
+        on_recovery(device)
+        return
+    run = []
+    for state in reversed(states):
+        if state == "NORMAL":
+            break
+        run.append(state)
+    on_violation(device, "CRITICAL" if "CRITICAL" in run else states[-1])
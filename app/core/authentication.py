@@ -0,0 +1,161 @@
+# core/authentication.py
+import time
+from functools import cached_property
+
+from django.conf import settings
+from rest_framework import authentication, exceptions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from core import credentials
+
+
+class DevicePrincipal:
+    """request.user for a request authenticated with a device key (not a person)."""
+    is_authenticated = True
+    is_anonymous = False
+    is_staff = False
+    is_superuser = False
+    is_active = True
+
+    def __init__(self, credential):
+        self.credential = credential
+        self.device_code = credential.code
+        self.pk = self.id = None
+
+    def __str__(self):
+        return f"device:{self.device_code}"
+
+
+class DeviceKeyAuthentication(authentication.BaseAuthentication):
+    """
+    `Authorization: Device <code>:<hex key>` (see core.credentials), checked
+    against the in-memory credential table: no user row, no query per
+    request. request.auth is the device's Credential.
+    """
+    keyword = "Device"
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid device credentials header.")
+        code, sep, key = header[1].decode("latin-1").partition(":")
+        cred = credentials.verify_key(code, key) if sep else None
+        if cred is None:
+            raise exceptions.AuthenticationFailed("Unknown device or invalid key.")
+        return DevicePrincipal(cred), cred
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+# ----------------------------
+#  Users: JWT with claims + per-process user cache
+# ----------------------------
+
+def token_claims(user) -> dict:
+    """What access tokens carry about their user, so reads need no user row."""
+    return {
+        "email": user.email,
+        "role": getattr(user, "role", ""),
+        "is_staff": user.is_staff,
+        "is_superuser": user.is_superuser,
+        "is_active": user.is_active,
+    }
+
+
+class ClaimsUser(TokenUser):
+    """request.user read from the token's claims (AUTH_READ_MODE=claims)."""
+
+    @cached_property
+    def email(self) -> str:
+        return self.token.get("email", "")
+
+    @cached_property
+    def role(self) -> str:
+        return self.token.get("role", "")
+
+    @cached_property
+    def is_active(self) -> bool:
+        return self.token.get("is_active", True)
+
+
+# keyed by str(user id): tokens carry the id as a string
+_users = {}  # user_id -> (expires at, User)
+_invalidated = {}  # user_id -> when its cached state was last dropped in this process
+
+
+def _read_mode() -> str:
+    return str(getattr(settings, "AUTH_READ_MODE", "cache")).lower()
+
+
+def _cache_ttl() -> float:
+    return float(getattr(settings, "AUTH_USER_CACHE_TTL_S", 30))
+
+
+def _remember(user):
+    if len(_users) >= 10000:
+        _users.clear()
+    _users[str(user.pk)] = (time.monotonic() + _cache_ttl(), user)
+
+
+def invalidate_user(user_id):
+    """
+    Forget a user changed or deactivated in this process: the next request
+    reloads the row, and tokens issued before now stop being trusted for
+    their claims. Other processes follow within AUTH_USER_CACHE_TTL_S
+    (claims mode: within the access token lifetime).
+    """
+    _users.pop(str(user_id), None)
+    _invalidated[str(user_id)] = time.time()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Bearer JWT. Writes load the user row as usual. Reads (GET/HEAD/OPTIONS),
+    which is what dashboards poll, take the user from a per-process cache
+    (AUTH_USER_CACHE_TTL_S) or, with AUTH_READ_MODE=claims, straight from
+    the token's claims (see token_claims()), without a query.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = self.get_validated_token(raw_token)
+        if request.method in SAFE_METHODS:
+            return self.get_read_user(token), token
+        user = self.get_user(token)
+        _remember(user)
+        return user, token
+
+    def get_read_user(self, token):
+        try:
+            user_id = str(token[jwt_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        stale = token.get("iat", 0) < _invalidated.get(user_id, 0)
+        if _read_mode() == "claims" and "is_staff" in token and not stale:
+            if not token.get("is_active", True):
+                raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+            return ClaimsUser(token)
+
+        cached = _users.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        user = self.get_user(token)
+        _remember(user)
+        return user
+
+
+# ingest endpoints: a device's own key, or the usual user authentication
+INGEST_AUTHENTICATION = [DeviceKeyAuthentication, CachedJWTAuthentication]
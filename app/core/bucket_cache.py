@@ -0,0 +1,336 @@
+# core/bucket_cache.py
+"""
+Bucket-aligned cache of device metrics (core_metricsbucket).
+
+A completed bucket, one whose end is in the past, only changes when late data
+lands in it. Device metrics therefore keeps completed buckets per device and
+bucket size, and each request computes only:
+  - the buckets outside the cached range, extending that range,
+  - the buckets a late reading marked stale,
+  - the open trailing bucket, which is never stored.
+Minute buckets are computed from raw readings. Hour and coarser buckets come
+from the hourly rollups, which ingest keeps current. Hit and miss counts per
+bucket size are kept in MetricsCacheStat.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from core.models import Measurement, MeasurementRollup, MetricsBucket, MetricsBucketCoverage, MetricsCacheStat
+from core.sharding import db_for_device
+
+TRUNC = {
+    "minute": TruncMinute,
+    "hour": TruncHour,
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+_WIDTH = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+VALUES = ("temp_avg", "temp_min", "temp_max", "hum_avg", "hum_min", "hum_max")
+
+
+# ---------- bucket arithmetic (UTC, same boundaries as date_trunc) ----------
+def floor(ts, bucket: str):
+    ts = ts.astimezone(dt_timezone.utc)
+    if bucket == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_start(start, bucket: str):
+    if bucket == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + _WIDTH[bucket]
+
+
+def ceil(ts, bucket: str):
+    start = floor(ts, bucket)
+    return start if start == ts else next_start(start, bucket)
+
+
+def count(lo, hi, bucket: str) -> int:
+    """Number of buckets in [lo, hi) (both bucket-aligned)."""
+    if hi <= lo:
+        return 0
+    if bucket == "month":
+        return (hi.year - lo.year) * 12 + hi.month - lo.month
+    return int((hi - lo) / _WIDTH[bucket])
+
+
+# ---------- computing buckets ----------
+def _from_raw(device_id, bucket, lo, hi, using):
+    return list(
+        Measurement.objects.using(using)
+        .filter(device_id=device_id, ts__gte=lo, ts__lt=hi)
+        .annotate(bucket_ts=TRUNC[bucket]("ts"))
+        .values("bucket_ts")
+        .order_by("bucket_ts")
+        .annotate(
+            n=Count("id"),
+            temp_avg=Avg("temp_c"),
+            temp_min=Min("temp_c"),
+            temp_max=Max("temp_c"),
+            hum_avg=Avg("humidity"),
+            hum_min=Min("humidity"),
+            hum_max=Max("humidity"),
+        )
+    )
+
+
+def _from_rollups(device_id, bucket, lo, hi, using):
+    rows = (
+        MeasurementRollup.objects.using(using)
+        .filter(device_id=device_id, bucket_start__gte=lo, bucket_start__lt=hi)
+        .annotate(bucket_ts=TRUNC[bucket]("bucket_start"))
+        .values("bucket_ts")
+        .order_by("bucket_ts")
+        .annotate(
+            n_sum=Sum("n"),
+            t_sum=Sum("temp_sum"),
+            t_min=Min("temp_min"),
+            t_max=Max("temp_max"),
+            h_n=Sum("hum_n"),
+            h_sum=Sum("hum_sum"),
+            h_min=Min("hum_min"),
+            h_max=Max("hum_max"),
+        )
+    )
+    return [
+        {
+            "bucket_ts": r["bucket_ts"],
+            "n": r["n_sum"],
+            "temp_avg": r["t_sum"] / r["n_sum"] if r["n_sum"] else None,
+            "temp_min": r["t_min"],
+            "temp_max": r["t_max"],
+            "hum_avg": r["h_sum"] / r["h_n"] if r["h_n"] else None,
+            "hum_min": r["h_min"],
+            "hum_max": r["h_max"],
+        }
+        for r in rows
+    ]
+
+
+def compute(device_id: int, bucket: str, lo, hi, *, using: str):
+    """Aggregates of the non-empty buckets in [lo, hi), straight from the source data."""
+    if bucket == "minute":
+        return _from_raw(device_id, bucket, lo, hi, using)
+    return _from_rollups(device_id, bucket, lo, hi, using)
+
+
+# ---------- cache maintenance ----------
+def _spans(starts, bucket):
+    """Merge sorted bucket starts into [lo, hi) runs."""
+    out = []
+    for s in starts:
+        e = next_start(s, bucket)
+        if out and out[-1][1] == s:
+            out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+    return out
+
+
+def _plan(cov, lo, hi):
+    """
+    (missing [a, b) ranges of [lo, hi), coverage once they're filled, whether
+    that replaces a disjoint old range).
+    """
+    cf, ct = (cov.covered_from, cov.covered_to) if cov else (None, None)
+    if cf is None or lo > ct or hi < cf:
+        return [(lo, hi)], (lo, hi), cf is not None
+    missing = []
+    if lo < cf:
+        missing.append((lo, cf))
+    if ct < hi:
+        missing.append((ct, hi))
+    return missing, (min(cf, lo), max(ct, hi)), False
+
+
+def _fill(device_id, bucket, spans, using):
+    now = timezone.now()
+    for a, b in spans:
+        computed = compute(device_id, bucket, a, b, using=using)
+        MetricsBucket.objects.using(using).filter(
+            device_id=device_id, bucket=bucket, bucket_start__gte=a, bucket_start__lt=b
+        ).delete()
+        MetricsBucket.objects.using(using).bulk_create([
+            MetricsBucket(
+                device_id=device_id,
+                bucket=bucket,
+                bucket_start=r["bucket_ts"],
+                n=r["n"],
+                computed_at=now,
+                **{k: r[k] for k in VALUES},
+            )
+            for r in computed if r["n"]
+        ], batch_size=1000)
+
+
+def _refresh(device_id, bucket, lo, hi, using) -> int:
+    """Bring [lo, hi) of the cache up to date; returns buckets recomputed."""
+    MetricsBucketCoverage.objects.using(using).get_or_create(device_id=device_id, bucket=bucket)
+    with transaction.atomic(using=using):
+        # the coverage row serializes writers of this (device, bucket) with
+        # each other and with note_reading()
+        cov = MetricsBucketCoverage.objects.using(using).select_for_update().get(device_id=device_id, bucket=bucket)
+        missing, (new_lo, new_hi), replaces = _plan(cov, lo, hi)
+        stale = list(
+            MetricsBucket.objects.using(using)
+            .filter(device_id=device_id, bucket=bucket, stale=True, bucket_start__gte=lo, bucket_start__lt=hi)
+            .order_by("bucket_start")
+            .values_list("bucket_start", flat=True)
+        )
+        if not missing and not stale:
+            return 0
+        if replaces:
+            # one contiguous range per (device, bucket): drop the old one
+            MetricsBucket.objects.using(using).filter(device_id=device_id, bucket=bucket).exclude(
+                bucket_start__gte=lo, bucket_start__lt=hi
+            ).delete()
+        _fill(device_id, bucket, missing + _spans(stale, bucket), using)
+        cov.covered_from, cov.covered_to = new_lo, new_hi
+        cov.save(update_fields=["covered_from", "covered_to"])
+    return sum(count(a, b, bucket) for a, b in missing) + len(stale)
+
+
+def _cached(device_id, bucket, lo, hi, using):
+    return list(
+        MetricsBucket.objects.using(using)
+        .filter(device_id=device_id, bucket=bucket, bucket_start__gte=lo, bucket_start__lt=hi)
+        .order_by("bucket_start")
+        .values("bucket_start", "n", "stale", *VALUES)
+    )
+
+
+def _record_stats(bucket: str, hits: int, misses: int):
+    if not (hits or misses):
+        return
+    if not MetricsCacheStat.objects.filter(bucket=bucket).update(hits=F("hits") + hits, misses=F("misses") + misses):
+        MetricsCacheStat.objects.get_or_create(bucket=bucket)
+        MetricsCacheStat.objects.filter(bucket=bucket).update(hits=F("hits") + hits, misses=F("misses") + misses)
+
+
+def bucket_rows(device, frm, to, bucket: str):
+    """
+    Per-bucket aggregates for the buckets covering [frm, to] (the first and
+    last are whole buckets), oldest first, as dicts with bucket_ts, n and
+    VALUES; plus {"hits", "misses", "live"} bucket counts for this request.
+    """
+    using = db_for_device(device)
+    lo = floor(frm, bucket)
+    hi = next_start(floor(to, bucket), bucket)
+    open_start = floor(timezone.now(), bucket)
+    closed_hi = max(lo, min(hi, open_start))
+
+    if not getattr(settings, "METRICS_BUCKET_CACHE", True):
+        return compute(device.id, bucket, lo, hi, using=using), {"hits": 0, "misses": 0, "live": count(lo, hi, bucket)}
+
+    misses = 0
+    rows = []
+    if closed_hi > lo:
+        cov = MetricsBucketCoverage.objects.using(using).filter(device=device, bucket=bucket).first()
+        cached = _cached(device.id, bucket, lo, closed_hi, using)
+        if _plan(cov, lo, closed_hi)[0] or any(r["stale"] for r in cached):
+            misses = _refresh(device.id, bucket, lo, closed_hi, using)
+            cached = _cached(device.id, bucket, lo, closed_hi, using)
+        rows = [{"bucket_ts": r["bucket_start"], "n": r["n"], **{k: r[k] for k in VALUES}} for r in cached]
+
+    live = 0
+    if hi > closed_hi:
+        rows += compute(device.id, bucket, closed_hi, hi, using=using)
+        live = count(closed_hi, hi, bucket)
+
+    hits = count(lo, closed_hi, bucket) - misses
+    _record_stats(bucket, hits, misses)
+    return rows, {"hits": hits, "misses": misses, "live": live}
+
+
+# ---------- invalidation ----------
+def note_reading(device_id: int, ts, *, using: str):
+    """
+    Ingest hook, after the reading is committed: a late reading marks the
+    cached bucket it landed in (per bucket size) stale.
+    """
+    note_readings(device_id, [ts], using=using)
+
+
+def note_readings(device_id: int, stamps, *, using: str):
+    """note_reading() for a batch of one device's readings: one pass over its coverage rows."""
+    late = [ts for ts in stamps if ts < floor(timezone.now(), "minute")]
+    if not late:
+        return  # only open buckets can hold them
+    with transaction.atomic(using=using):
+        # lock every coverage row of the device, then test: a concurrent
+        # _refresh() may be about to extend one over `ts`
+        for cov in MetricsBucketCoverage.objects.using(using).select_for_update().filter(device_id=device_id):
+            if cov.covered_from is None:
+                continue
+            for start in sorted({floor(ts, cov.bucket) for ts in late if cov.covered_from <= ts < cov.covered_to}):
+                marked = MetricsBucket.objects.using(using).filter(
+                    device_id=device_id, bucket=cov.bucket, bucket_start=start
+                ).update(stale=True)
+                if not marked:
+                    MetricsBucket.objects.using(using).create(
+                        device_id=device_id, bucket=cov.bucket, bucket_start=start, stale=True
+                    )
+
+
+def invalidate(device_id: int, frm, to, *, using: str = "default") -> int:
+    """
+    Aggregate builder (core.aggregates): forget cached buckets overlapping
+    [frm, to), e.g. after a bulk import or a rollup rebuild. Each coverage
+    range keeps its larger remaining side. Returns cached rows dropped.
+    """
+    dropped = 0
+    with transaction.atomic(using=using):
+        for cov in MetricsBucketCoverage.objects.using(using).select_for_update().filter(device_id=device_id):
+            if cov.covered_from is None:
+                continue
+            lo, hi = floor(frm, cov.bucket), ceil(to, cov.bucket)
+            if hi <= cov.covered_from or lo >= cov.covered_to:
+                continue
+            left = (cov.covered_from, max(cov.covered_from, lo))
+            right = (min(hi, cov.covered_to), cov.covered_to)
+            keep = right if right[1] - right[0] >= left[1] - left[0] else left
+            rows = MetricsBucket.objects.using(using).filter(device_id=device_id, bucket=cov.bucket)
+            if keep[0] < keep[1]:
+                rows = rows.exclude(bucket_start__gte=keep[0], bucket_start__lt=keep[1])
+                cov.covered_from, cov.covered_to = keep
+            else:
+                cov.covered_from = cov.covered_to = None
+            dropped += rows.delete()[0]
+            cov.save(update_fields=["covered_from", "covered_to"])
+    return dropped
+
+
+# ---------- stats ----------
+def stats() -> dict:
+    out = {}
+    hits = misses = 0
+    for s in MetricsCacheStat.objects.order_by("bucket"):
+        total = s.hits + s.misses
+        out[s.bucket] = {"hits": s.hits, "misses": s.misses, "hit_ratio": round(s.hits / total, 4) if total else None}
+        hits += s.hits
+        misses += s.misses
+    total = hits + misses
+    return {
+        "buckets": out,
+        "total": {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else None},
+    }
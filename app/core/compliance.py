@@ -0,0 +1,274 @@
+# core/compliance.py
+"""
+Mean Kinetic Temperature and time out of range per device and UTC day
+(ComplianceDay), for audits.
+
+MKT = (dH/R) / -ln(sum(exp(-(dH/R) / T_i)) / n), T_i the readings in
+kelvin and dH = MKT_ACTIVATION_ENERGY_KJ_MOL (83.144 kJ/mol: dH/R = 10000 K).
+The Arrhenius sum and n add up across days, so any month or year is merged
+from its day rows: a year is at most 366 rows, whatever the reading rate.
+
+Time out of range: a reading holds until the next one, for at most
+COMPLIANCE_MAX_GAP_S (the rest of a longer gap is unobserved), and its
+interval counts as out of range when its state is not NORMAL. Intervals
+are split at UTC midnight. The newest reading's interval is open until the
+next reading arrives.
+
+Ingest folds new readings in (add_readings(), in the insert's transaction)
+from the newest reading already folded; a reading older than that re-folds
+the days it changes from raw rows. rebuild_compliance() is the
+backfill_aggregates builder. Both go through the same vectorised _fold().
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from math import log
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from core.models import ComplianceDay, Measurement
+from core.sharding import db_for_device
+
+# pg_advisory_xact_lock(namespace, device_id), exclusive: folds of one
+# device (ingest or rebuild) run one at a time, each from the other's tail.
+_LOCK_NAMESPACE = 0x4D4B5430  # "MKT0"
+
+_DAY_S = 86400
+_EPOCH = date(1970, 1, 1)
+_R_KJ = 8.314462618e-3  # kJ / (mol K)
+
+PERIODS = ("day", "month")
+
+
+def activation_k() -> float:
+    """dH/R in kelvin."""
+    return float(getattr(settings, "MKT_ACTIVATION_ENERGY_KJ_MOL", 83.144)) / _R_KJ
+
+
+def max_gap() -> float:
+    return min(float(getattr(settings, "COMPLIANCE_MAX_GAP_S", 3600)), _DAY_S)
+
+
+def _lock_device(device_id: int, *, using: str):
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_NAMESPACE, int(device_id) & 0x7FFFFFFF])
+
+
+def _day_start(ts) -> datetime:
+    return ts.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _fold(ts, temps, out, next_ts=np.nan, *, counted_from: int = 0, days=None) -> dict:
+    """
+    Per-day sums for one device's readings, in (ts, id) order: `ts` epoch
+    seconds, `out` True where the state is not NORMAL, `next_ts` the reading
+    after the last one (nan: none yet). Readings before `counted_from` only
+    contribute their interval (they were counted before). With `days`
+    (lo, hi) day numbers, other days are left out.
+
+    {day number: [n, arrhenius_sum, temp_min, temp_max, observed_s,
+    out_of_range_s, index of the day's last reading | -1]}
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    temps = np.asarray(temps, dtype=np.float64)
+    out = np.asarray(out, dtype=bool)
+
+    day = np.floor_divide(ts, _DAY_S).astype(np.int64)
+    ends = np.minimum(np.append(ts[1:], next_ts), ts + max_gap())
+    held = np.nan_to_num(ends - ts, nan=0.0).clip(min=0.0)
+    # the gap cap is at most a day, so an interval reaches at most the next day
+    first = np.minimum(held, (day + 1) * _DAY_S - ts)
+    part_day = np.concatenate([day, day + 1])
+    part_s = np.concatenate([first, held - first])
+
+    c_day, c_temp = day[counted_from:], temps[counted_from:]
+    keys = np.unique(np.concatenate([part_day[part_s > 0], c_day]))
+    size = len(keys)
+    inv = np.searchsorted(keys, part_day)
+    keep = part_s > 0
+    observed = np.bincount(inv[keep], weights=part_s[keep], minlength=size)
+    out_s = np.bincount(inv[keep], weights=(part_s * np.concatenate([out, out]))[keep], minlength=size)
+
+    c_inv = np.searchsorted(keys, c_day)
+    n = np.bincount(c_inv, minlength=size)
+    arrhenius = np.bincount(c_inv, weights=np.exp(-activation_k() / (c_temp + 273.15)), minlength=size)
+    t_min = np.full(size, np.inf)
+    t_max = np.full(size, -np.inf)
+    np.minimum.at(t_min, c_inv, c_temp)
+    np.maximum.at(t_max, c_inv, c_temp)
+    # readings are in time order: a day's last reading sits right before the next day's first
+    last = np.searchsorted(c_day, keys, side="right") - 1 + counted_from
+
+    result = {}
+    for i, k in enumerate(keys.tolist()):
+        if days is not None and not days[0] <= k < days[1]:
+            continue
+        counted = int(n[i])
+        result[k] = [
+            counted, float(arrhenius[i]),
+            float(t_min[i]) if counted else None, float(t_max[i]) if counted else None,
+            float(observed[i]), float(out_s[i]),
+            int(last[i]) if counted else -1,
+        ]
+    return result
+
+
+def _refold(device_id: int, lo: datetime, hi: datetime, *, using: str) -> int:
+    """Rewrite the day rows in [lo, hi) (UTC midnights) from raw readings; returns readings counted."""
+    qs = Measurement.objects.using(using).filter(device_id=device_id)
+    rows = list(
+        qs.filter(ts__gte=lo - timedelta(seconds=max_gap()), ts__lt=hi)
+        .order_by("ts", "id").values_list("ts", "temp_c", "state")
+    )
+    after = qs.filter(ts__gte=hi).order_by("ts", "id").values_list("ts", flat=True).first()
+    ComplianceDay.objects.using(using).filter(device_id=device_id, day__gte=lo.date(), day__lt=hi.date()).delete()
+    if not rows:
+        return 0
+
+    counted_from = next((i for i, r in enumerate(rows) if r[0] >= lo), len(rows))
+    days = _fold(
+        [r[0].timestamp() for r in rows], [r[1] for r in rows], [r[2] != "NORMAL" for r in rows],
+        after.timestamp() if after is not None else np.nan,
+        counted_from=counted_from,
+        days=((lo.date() - _EPOCH).days, (hi.date() - _EPOCH).days),
+    )
+    now = timezone.now()
+    ComplianceDay.objects.using(using).bulk_create([
+        ComplianceDay(
+            device_id=device_id, day=_EPOCH + timedelta(days=k),
+            n=n, arrhenius_sum=arr, temp_min=t_min, temp_max=t_max,
+            observed_s=observed, out_of_range_s=out_s,
+            last_ts=rows[last][0] if last >= 0 else None,
+            last_out=rows[last][2] != "NORMAL" if last >= 0 else False,
+            updated_at=now,
+        )
+        for k, (n, arr, t_min, t_max, observed, out_s, last) in sorted(days.items())
+    ], batch_size=1000)
+    return len(rows) - counted_from
+
+
+def rebuild_compliance(device_id: int, frm, to, *, using: str = "default") -> int:
+    """
+    Recompute the day rows covering [frm, to) for one device from raw rows.
+    Returns the number of readings counted.
+    """
+    lo = _day_start(frm)
+    hi = _day_start(to)
+    if hi < to:
+        hi += timedelta(days=1)
+    with transaction.atomic(using=using):
+        _lock_device(device_id, using=using)
+        return _refold(device_id, lo, hi, using=using)
+
+
+def add_readings(readings, *, using: str = "default"):
+    """
+    Fold freshly inserted readings of one device into their days (call in
+    the ingest transaction, after the insert).
+    """
+    readings = sorted(readings, key=lambda m: (m.ts, m.id or 0))
+    if not readings:
+        return
+    device_id = readings[0].device_id
+    _lock_device(device_id, using=using)
+    qs = ComplianceDay.objects.using(using).filter(device_id=device_id)
+    tail = qs.filter(last_ts__isnull=False).order_by("-day").values_list("last_ts", "last_out").first()
+
+    if tail is not None and readings[0].ts < tail[0]:
+        # late reading: re-fold the days whose intervals it splits
+        lo = _day_start(readings[0].ts - timedelta(seconds=max_gap()))
+        hi = _day_start(max(tail[0], readings[-1].ts)) + timedelta(days=1)
+        _refold(device_id, lo, hi, using=using)
+        return
+
+    head = [tail] if tail is not None else []
+    days = _fold(
+        [t.timestamp() for t, _ in head] + [m.ts.timestamp() for m in readings],
+        [0.0] * len(head) + [m.temp_c for m in readings],
+        [o for _, o in head] + [m.state != "NORMAL" for m in readings],
+        counted_from=len(head),
+    )
+    now = timezone.now()
+    for k, (n, arr, t_min, t_max, observed, out_s, last) in sorted(days.items()):
+        day = _EPOCH + timedelta(days=k)
+        updates = {
+            "observed_s": F("observed_s") + observed,
+            "out_of_range_s": F("out_of_range_s") + out_s,
+            "updated_at": now,
+        }
+        if n:
+            m = readings[last - len(head)]
+            updates.update(
+                n=F("n") + n,
+                arrhenius_sum=F("arrhenius_sum") + arr,
+                temp_min=Least(Coalesce(F("temp_min"), Value(t_min)), Value(t_min)),
+                temp_max=Greatest(Coalesce(F("temp_max"), Value(t_max)), Value(t_max)),
+                last_ts=m.ts,
+                last_out=m.state != "NORMAL",
+            )
+        if not qs.filter(day=day).update(**updates):
+            m = readings[last - len(head)] if n else None
+            qs.create(
+                device_id=device_id, day=day, n=n, arrhenius_sum=arr, temp_min=t_min, temp_max=t_max,
+                observed_s=observed, out_of_range_s=out_s,
+                last_ts=m.ts if m else None, last_out=m is not None and m.state != "NORMAL", updated_at=now,
+            )
+
+
+# ---------- reading ----------
+
+COLUMNS = (
+    "period", "readings", "mkt_c", "min_c", "max_c",
+    "observed_minutes", "out_of_range_minutes", "in_range_pct",
+)
+
+
+def _summary(label: str, rows) -> dict:
+    n = sum(r.n for r in rows)
+    arr = sum(r.arrhenius_sum for r in rows)
+    observed = sum(r.observed_s for r in rows)
+    out_s = sum(r.out_of_range_s for r in rows)
+    mins = [r.temp_min for r in rows if r.temp_min is not None]
+    maxs = [r.temp_max for r in rows if r.temp_max is not None]
+    return {
+        "period": label,
+        "readings": n,
+        "mkt_c": round(activation_k() / -log(arr / n) - 273.15, 2) if n and arr > 0 else None,
+        "min_c": min(mins) if mins else None,
+        "max_c": max(maxs) if maxs else None,
+        "observed_minutes": round(observed / 60, 1),
+        "out_of_range_minutes": round(out_s / 60, 1),
+        "in_range_pct": round(100 * (1 - out_s / observed), 2) if observed else None,
+    }
+
+
+def report(device, *, period: str = "day", frm: date | None = None, to: date | None = None) -> dict:
+    """
+    MKT and time out of range per UTC day or month of [frm, to] (inclusive
+    dates), plus the whole range, merged from ComplianceDay rows.
+    """
+    qs = ComplianceDay.objects.using(db_for_device(device)).filter(device_id=device.id)
+    if frm:
+        qs = qs.filter(day__gte=frm)
+    if to:
+        qs = qs.filter(day__lte=to)
+    rows = list(qs.order_by("day"))
+
+    groups = {}
+    for r in rows:
+        label = r.day.isoformat() if period == "day" else r.day.strftime("%Y-%m")
+        groups.setdefault(label, []).append(r)
+    return {
+        "device": device.code,
+        "period": period,
+        "activation_energy_kj_mol": round(activation_k() * _R_KJ, 3),
+        "max_gap_s": max_gap(),
+        "results": [_summary(label, group) for label, group in groups.items()],
+        "total": _summary("total", rows),
+    }
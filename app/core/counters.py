@@ -0,0 +1,186 @@
+# core/counters.py
+"""
+Fleet / per-site dashboard counters, kept current by the ingest and ticket
+code paths instead of being recounted per request.
+
+Each device's contribution lives in DeviceDashboardState; every change locks
+that row, recomputes the contribution and applies the difference to the
+"*" (fleet) and site DashboardCounter rows. Reading the dashboard is then a
+handful of rows, whatever the fleet size.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from core.models import DashboardCounter, Device, DeviceDashboardState, Measurement, Ticket
+from core.sharding import db_for_device
+
+FLEET = "*"
+DEVICE_STATES = ("NORMAL", "SEVERE", "CRITICAL", "UNKNOWN")
+
+
+def _tally(row) -> dict:
+    out = {
+        "tickets.open.SEVERE": row.open_severe,
+        "tickets.open.CRITICAL": row.open_critical,
+        "tickets.unacked": row.unacked,
+    }
+    if row.counted_state:
+        out[f"devices.{row.counted_state}"] = 1
+    return out
+
+
+def _bump(scope: str, name: str, delta: int):
+    if not DashboardCounter.objects.filter(scope=scope, name=name).update(value=F("value") + delta):
+        DashboardCounter.objects.get_or_create(scope=scope, name=name)
+        DashboardCounter.objects.filter(scope=scope, name=name).update(value=F("value") + delta)
+
+
+def _apply(old_site, old, new_site, new):
+    deltas = defaultdict(int)
+    for scope in {FLEET, old_site}:
+        for name, v in old.items():
+            deltas[(scope, name)] -= v
+    for scope in {FLEET, new_site}:
+        for name, v in new.items():
+            deltas[(scope, name)] += v
+    for (scope, name), d in sorted(deltas.items()):
+        if d:
+            _bump(scope, name, d)
+
+
+def _locked_row(device_id: int) -> DeviceDashboardState:
+    row, _ = DeviceDashboardState.objects.select_for_update().get_or_create(device_id=device_id)
+    return row
+
+
+def _recount(row, device, **changes):
+    """Apply field changes to a locked row and push the counter deltas."""
+    old_site, old = row.site, _tally(row)
+    for k, v in changes.items():
+        setattr(row, k, v)
+    row.site = device.site
+    row.counted_state = (row.last_state or "UNKNOWN") if device.is_active else ""
+    _apply(old_site, old, row.site, _tally(row))
+    row.save()
+
+
+def _ticket_tallies(device_id: int) -> dict:
+    return Ticket.objects.filter(device_id=device_id, status="OPEN").aggregate(
+        open_severe=Count("id", filter=Q(severity="SEVERE")),
+        open_critical=Count("id", filter=Q(severity="CRITICAL")),
+        unacked=Count("id", filter=Q(acked_at__isnull=True)),
+    )
+
+
+# ---------- hooks ----------
+def note_reading(device: Device, state: str, ts):
+    """Ingest hook: the device's last state, if this reading is its newest."""
+    with transaction.atomic():
+        row = _locked_row(device.id)
+        if row.last_ts is not None and ts < row.last_ts:
+            return
+        if row.last_state == state and row.site == device.site and row.counted_state:
+            row.last_ts = ts
+            row.save(update_fields=["last_ts"])
+            return
+        _recount(row, device, last_state=state, last_ts=ts)
+
+
+def sync_tickets(device_id: int):
+    """Ticket hook: call after any open/escalate/ack/close of a device's tickets."""
+    with transaction.atomic():
+        device = Device.objects.filter(id=device_id).first()
+        if device is None:
+            return
+        row = _locked_row(device_id)
+        _recount(row, device, **_ticket_tallies(device_id))
+
+
+def sync_device(device_id: int, *, refresh_last: bool = False):
+    """
+    Full recount of one device (created, edited, deactivated, history
+    rewritten). refresh_last re-reads its newest reading from the DB.
+    """
+    with transaction.atomic():
+        device = Device.objects.filter(id=device_id).first()
+        if device is None:
+            forget_device(device_id)
+            return
+        row = _locked_row(device_id)
+        changes = _ticket_tallies(device_id)
+        if refresh_last:
+            last = (
+                Measurement.objects.using(db_for_device(device))
+                .filter(device_id=device_id)
+                .order_by("-ts", "-id")
+                .values_list("state", "ts")
+                .first()
+            )
+            changes["last_state"], changes["last_ts"] = last or ("", None)
+        _recount(row, device, **changes)
+
+
+def forget_device(device_id: int):
+    """Remove a device's contribution (call before deleting it)."""
+    with transaction.atomic():
+        row = DeviceDashboardState.objects.select_for_update().filter(device_id=device_id).first()
+        if row is None:
+            return
+        _apply(row.site, _tally(row), row.site, {})
+        row.delete()
+
+
+# ---------- read side ----------
+def _shape(values: dict) -> dict:
+    return {
+        "devices": {s: values.get(f"devices.{s}", 0) for s in DEVICE_STATES},
+        "tickets": {
+            "open": {
+                "SEVERE": values.get("tickets.open.SEVERE", 0),
+                "CRITICAL": values.get("tickets.open.CRITICAL", 0),
+            },
+            "unacked": values.get("tickets.unacked", 0),
+        },
+    }
+
+
+def snapshot(scope: str = FLEET) -> dict:
+    return _shape(dict(DashboardCounter.objects.filter(scope=scope).values_list("name", "value")))
+
+
+def snapshot_all() -> dict:
+    """{scope: counters} for the fleet ("*") and every site, in one query."""
+    by_scope = defaultdict(dict)
+    for scope, name, value in DashboardCounter.objects.values_list("scope", "name", "value"):
+        by_scope[scope][name] = value
+    by_scope.setdefault(FLEET, {})
+    return {scope: _shape(values) for scope, values in by_scope.items() if scope == FLEET or any(values.values())}
+
+
+# ---------- repair ----------
+def rebuild(*, log=print) -> int:
+    """
+    Recount every device from source data, then recompute all counters as
+    sums of the per-device rows. Returns the number of devices.
+    """
+    ids = list(Device.objects.order_by("id").values_list("id", flat=True))
+    for i, device_id in enumerate(ids, start=1):
+        sync_device(device_id, refresh_last=True)
+        if i % 500 == 0:
+            log(f"[counters] {i}/{len(ids)} devices")
+    DeviceDashboardState.objects.exclude(device_id__in=ids).delete()
+
+    with transaction.atomic():
+        list(DashboardCounter.objects.select_for_update())
+        totals = defaultdict(int)
+        for row in DeviceDashboardState.objects.all().iterator():
+            for name, v in _tally(row).items():
+                totals[(FLEET, name)] += v
+                totals[(row.site, name)] += v
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(scope=s, name=n, value=v) for (s, n), v in totals.items()]
+        )
+    return len(ids)
@@ -0,0 +1,161 @@
+# core/credentials.py
+"""
+Per-device ingest credentials.
+
+A device's secret is derived, never stored:
+HMAC-SHA256(DEVICE_KEY_MASTER, "<code>|<key_version>"). Rotating a key is
+bumping Device.key_version. Devices prove themselves with the secret
+itself (HTTP `Authorization: Device <code>:<hex key>`) or with an HMAC of
+what they send under it (MQTT "sig", UDP datagram tag).
+
+Verification is in memory: every process holds {code: (device_id,
+key_version, site, thresholds)} for the active devices (the ingest rate
+limiter reads the same table), loaded in one query and reloaded
+every DEVICE_CREDENTIALS_TTL_S (so a rotation or deactivation made
+elsewhere applies within that window; in the process that made it,
+invalidate() applies it at once). A code that is not in the table is
+rejected without a query; at most one reload per
+DEVICE_CREDENTIALS_MISS_RELOAD_S picks up devices created meanwhile.
+"""
+import hashlib
+import hmac
+import re
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+from core.models import Device
+
+Credential = namedtuple("Credential", "device_id code key_version key site min_temp max_temp")
+
+_lock = threading.Lock()
+_table = {"loaded_at": None, "miss_reload_at": 0.0, "by_code": {}}
+
+
+def master_key() -> bytes:
+    return str(getattr(settings, "DEVICE_KEY_MASTER", "") or "").encode()
+
+
+def required() -> bool:
+    """
+    DEVICE_AUTH_REQUIRED: ingest only from known devices presenting a valid
+    key or signature (the default once DEVICE_KEY_MASTER is set).
+    """
+    return bool(getattr(settings, "DEVICE_AUTH_REQUIRED", bool(master_key())))
+
+
+def known_only() -> bool:
+    """Readings only for known, active devices (no auto-created ones): whenever device keys exist."""
+    return required() or bool(master_key())
+
+
+def ttl() -> float:
+    return float(getattr(settings, "DEVICE_CREDENTIALS_TTL_S", 60))
+
+
+def miss_reload() -> float:
+    return float(getattr(settings, "DEVICE_CREDENTIALS_MISS_RELOAD_S", 5))
+
+
+@lru_cache(maxsize=65536)
+def _derive(master: bytes, code: str, version: int) -> bytes:
+    return hmac.digest(master, f"{code}|{version}".encode(), hashlib.sha256)
+
+
+def device_key(code: str, key_version: int) -> bytes:
+    return _derive(master_key(), code, key_version)
+
+
+def api_key(device: Device) -> str:
+    """The device's current secret, hex (what gets provisioned onto it)."""
+    return device_key(device.code, device.key_version).hex()
+
+
+def refresh():
+    """Reload the table now (one query)."""
+    with _lock:
+        _load()
+
+
+def _load():
+    rows = Device.objects.filter(is_active=True).values_list(
+        "id", "code", "key_version", "site", "min_temp", "max_temp"
+    )
+    master = master_key()
+    _table["by_code"] = {
+        code: Credential(device_id, code, version, _derive(master, code, version), site, lo, hi)
+        for device_id, code, version, site, lo, hi in rows
+    }
+    _table["loaded_at"] = time.monotonic()
+
+
+def invalidate():
+    """Reload on next use (call after creating, rotating, deactivating or deleting a device)."""
+    _table["loaded_at"] = None
+
+
+def lookup(code: str, *, load: bool = True) -> Credential | None:
+    """
+    The active device's credential, or None for unknown / inactive codes.
+    load=False never queries (callers on an event loop call refresh() from
+    a worker thread instead).
+    """
+    if not load:
+        return _table["by_code"].get(code)
+    now = time.monotonic()
+    loaded_at = _table["loaded_at"]
+    if loaded_at is None or now - loaded_at > ttl():
+        with _lock:
+            if _table["loaded_at"] is loaded_at:
+                _load()
+    cred = _table["by_code"].get(code)
+    if cred is None and now >= _table["miss_reload_at"]:
+        with _lock:
+            if now >= _table["miss_reload_at"]:
+                _table["miss_reload_at"] = now + miss_reload()
+                _load()
+        cred = _table["by_code"].get(code)
+    return cred
+
+
+def verify_key(code: str, presented: str) -> Credential | None:
+    """Credential when `presented` (hex) is the device's current key."""
+    cred = lookup(code) if master_key() else None
+    if cred is None:
+        return None
+    try:
+        raw = bytes.fromhex(presented)
+    except ValueError:
+        return None
+    return cred if hmac.compare_digest(raw, cred.key) else None
+
+
+def sign(key: bytes, message) -> str:
+    return hmac.digest(key, message, hashlib.sha256).hex()
+
+
+def verify_signature(code: str, message, signature: str) -> Credential | None:
+    """Credential when `signature` is hex HMAC-SHA256(device key, message)."""
+    cred = lookup(code) if master_key() else None
+    if cred is None or not isinstance(signature, str) or not signature.isascii():
+        return None
+    return cred if hmac.compare_digest(sign(cred.key, message), signature.lower()) else None
+
+
+_SIG_MEMBER = re.compile(rb',\s*"sig"\s*:\s*"([^"]*)"\s*}\s*$')
+
+
+def split_signed_json(payload: bytes) -> tuple:
+    """
+    (signed bytes, signature | None) for a JSON object whose last member is
+    "sig": the device serialises its object, signs those exact bytes and
+    appends `,"sig":"<hex>"` before the closing brace, so nothing has to be
+    re-serialised to check it.
+    """
+    m = _SIG_MEMBER.search(payload)
+    if m is None:
+        return payload, None
+    return payload[:m.start()] + b"}", m.group(1).decode("ascii", "replace")
@@ -0,0 +1,96 @@
+# core/datagram.py
+"""
+Compact signed telemetry datagrams for the UDP listener (manage.py
+udp_listener). One reading per datagram, big-endian:
+
+    offset  size  field
+    0       1     version (1)
+    1       1     flags (bit 0: ack requested)
+    2       1     n = device code length (1..64)
+    3       n     device code (ASCII)
+    3+n     4     ts: uint32 epoch seconds (required: 0 is rejected)
+    7+n     2     temp_c * 10, int16
+    9+n     2     humidity * 10, int16 (-32768 = none)
+    11+n    2     seq: uint16, sender's counter (retries reuse it)
+    13+n    8     tag: HMAC-SHA256(device key, bytes 0..13+n)[:8]
+
+Ack (listener -> sensor, when requested), signed the same way:
+
+    version (1) | status (1) | seq (2) | ts (4) | tag (8)
+
+status: ACK_STORED, ACK_DUPLICATE (a retry or replay of a reading already
+stored: readings are keyed by device and ts), ACK_REJECTED (well-signed
+but out of range / without a ts / out of the time window) or
+ACK_LIMITED (dropped by the ingest rate limit, core.ratelimit: do not
+retry). Forged or malformed datagrams get no answer.
+
+The key is the device's ingest key (core.credentials), the same one it
+uses over HTTP and MQTT; datagrams from unknown devices are dropped.
+"""
+import hashlib
+import hmac
+import struct
+
+VERSION = 1
+FLAG_ACK = 0x01
+TAG_SIZE = 8
+MAX_CODE = 64
+NO_HUMIDITY = -32768
+
+ACK_STORED = 0
+ACK_DUPLICATE = 1
+ACK_REJECTED = 2
+ACK_LIMITED = 3
+
+_HEAD = struct.Struct("!BBB")
+_BODY = struct.Struct("!IhhH")
+_ACK = struct.Struct("!BBHI")
+
+
+class DatagramError(ValueError):
+    pass
+
+
+def _tag(key: bytes, data) -> bytes:
+    return hmac.digest(key, data, hashlib.sha256)[:TAG_SIZE]
+
+
+def encode_reading(code: str, key: bytes, *, ts: int, temp_c: float, humidity=None, seq: int = 0,
+                   ack: bool = False) -> bytes:
+    """A signed datagram, as a sensor would build it (tests, simulators)."""
+    raw = code.encode("ascii")
+    body = (
+        _HEAD.pack(VERSION, FLAG_ACK if ack else 0, len(raw)) + raw
+        + _BODY.pack(ts, round(temp_c * 10), NO_HUMIDITY if humidity is None else round(humidity * 10), seq)
+    )
+    return body + _tag(key, body)
+
+
+def decode_reading(data: bytes, key_for) -> tuple:
+    """
+    Verify and unpack one datagram, `key_for(code)` giving the device's key
+    (None if unknown): (code, ts, temp_c, humidity | None, seq, wants_ack, key).
+    Raises DatagramError for anything malformed, unknown or wrongly signed.
+    """
+    if len(data) < _HEAD.size + 1 + _BODY.size + TAG_SIZE:
+        raise DatagramError("short datagram")
+    version, flags, n = _HEAD.unpack_from(data)
+    if version != VERSION or not 0 < n <= MAX_CODE or len(data) != _HEAD.size + n + _BODY.size + TAG_SIZE:
+        raise DatagramError("bad header")
+    signed = len(data) - TAG_SIZE
+    code = data[_HEAD.size:_HEAD.size + n].decode("ascii", "replace")
+    key = key_for(code)
+    if key is None:
+        raise DatagramError("unknown device")
+    if not hmac.compare_digest(_tag(key, memoryview(data)[:signed]), data[signed:]):
+        raise DatagramError("bad signature")
+    ts, temp, hum, seq = _BODY.unpack_from(data, _HEAD.size + n)
+    return (
+        code, ts, temp / 10, None if hum == NO_HUMIDITY else hum / 10,
+        seq, bool(flags & FLAG_ACK), key,
+    )
+
+
+def encode_ack(key: bytes, status: int, seq: int, ts: int) -> bytes:
+    body = _ACK.pack(VERSION, status, seq, ts)
+    return body + _tag(key, body)
@@ -0,0 +1,118 @@
+# core/downsample.py
+"""
+Server-side downsampling of chart series to a fixed number of points.
+
+Both functions take x (numeric, ascending) / y arrays and return the sorted
+indices of the points to keep, always including the first and last point.
+
+- lttb:   Largest-Triangle-Three-Buckets; visually faithful line shape.
+- minmax: per bucket the lowest and the highest point; every peak/excursion
+          survives, at the price of a more jagged line.
+"""
+import numpy as np
+from django.conf import settings
+
+METHODS = ("lttb", "minmax")
+
+
+def _edges(n_points: int, n_buckets: int) -> np.ndarray:
+    # bucket boundaries over the interior points [1, n_points - 1)
+    return np.linspace(1, n_points - 1, n_buckets + 1).astype(np.int64)
+
+
+def lttb(x, y, n: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size) if n >= size else np.array([0, size - 1])[:max(n, 0)]
+
+    # gaps (NaN) would poison the areas; they never win a bucket
+    y_f = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    edges = _edges(size, n - 2)
+    # the "next bucket" average used by each step is independent of the choice
+    # made in the previous step, so compute all of them in one pass
+    sums_x = np.add.reduceat(x[1:size - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y_f[1:size - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])[1:]
+    avg_y = np.append(sums_y / counts, y_f[-1])[1:]
+
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y_f[lo:hi]
+        area = np.abs((x[a] - avg_x[i]) * (by - y_f[a]) - (x[a] - bx) * (avg_y[i] - y_f[a]))
+        area[np.isnan(y[lo:hi])] = -1.0
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(y_low, y_high, n: int) -> np.ndarray:
+    """
+    Keep, per bucket, the index of the minimum of y_low and of the maximum of
+    y_high (pass the same array twice for a plain series).
+    """
+    lo_v = np.asarray(y_low, dtype=np.float64)
+    hi_v = np.asarray(y_high, dtype=np.float64)
+    size = len(lo_v)
+    if n >= size or n < 4:
+        return np.arange(size) if n >= size else np.array([0, size - 1])[:max(n, 0)]
+
+    edges = _edges(size, (n - 2) // 2)
+    bucket = np.searchsorted(edges, np.arange(1, size - 1), side="right") - 1
+
+    # within each bucket, order by value (NaN last); first = min, last = max
+    lo_key = np.where(np.isnan(lo_v[1:-1]), np.inf, lo_v[1:-1])
+    hi_key = np.where(np.isnan(hi_v[1:-1]), -np.inf, hi_v[1:-1])
+    by_lo = np.lexsort((lo_key, bucket))
+    by_hi = np.lexsort((hi_key, bucket))
+    starts = np.r_[0, np.flatnonzero(np.diff(bucket[by_lo])) + 1]
+    ends = np.r_[starts[1:], len(by_lo)] - 1
+
+    keep = np.concatenate(([0], by_lo[starts] + 1, by_hi[ends] + 1, [size - 1]))
+    return np.unique(keep)
+
+
+def downsample(method: str, n: int, *, x=None, y=None, y_low=None, y_high=None) -> np.ndarray:
+    if method == "lttb":
+        return lttb(x, y, n)
+    if method == "minmax":
+        return minmax(y if y_low is None else y_low, y if y_high is None else y_high, n)
+    raise ValueError(f"unknown downsample method {method!r}")
+
+
+def downsample_params(query):
+    """
+    (points, method) from ?points=N (capped at METRICS_MAX_POINTS, which also
+    applies when omitted) and ?downsample=lttb|minmax (default lttb).
+    """
+    cap = int(getattr(settings, "METRICS_MAX_POINTS", 5000))
+    try:
+        points = int(query.get("points") or cap)
+    except ValueError:
+        points = cap
+    points = max(4, min(points, cap))
+    method = (query.get("downsample") or "lttb").lower()
+    if method not in METHODS:
+        method = "lttb"
+    return points, method
+
+
+def downsample_rows(rows, points: int, method: str, *, x, y, y_low, y_high):
+    """
+    Subset of `rows` (ascending in time) kept by the downsampler; x/y/y_low/
+    y_high pull the numbers out of a row (None = gap).
+    """
+    if len(rows) <= points:
+        return rows
+
+    def _arr(key):
+        return np.array([np.nan if key(r) is None else key(r) for r in rows], dtype=np.float64)
+
+    idx = downsample(method, points, x=_arr(x), y=_arr(y), y_low=_arr(y_low), y_high=_arr(y_high))
+    return [rows[i] for i in idx]
@@ -0,0 +1,258 @@
+# core/excursions.py
+"""
+Excursion index: one Excursion row per run of out-of-range readings of a
+device, so "when was it out of range, for how long, how bad was the peak"
+reads a few rows instead of run-length encoding every reading's state.
+
+Ingest (add_readings(), in the insert's transaction) extends the device's
+open excursion, closes it at the first NORMAL reading and opens new ones.
+A reading older than the device's newest excursion edge, or a violation
+landing before readings already stored, re-folds the excursions it
+touches from raw rows. rebuild_excursions() is the backfill_aggregates
+builder: the excursions starting in a slice, found in one vectorised pass
+over its states.
+
+The peak is the reading farthest outside the device's min_temp/max_temp
+(the higher one on a tie).
+"""
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Q
+
+from core.models import Device, Excursion, Measurement
+from core.sharding import db_for_device, db_for_site, shard_aliases
+
+# pg_advisory_xact_lock(namespace, device_id), exclusive: one fold per
+# device at a time (ingest or rebuild), each starting from the other's rows.
+_LOCK_NAMESPACE = 0x45584352  # "EXCR"
+
+SEVERITY = {"NORMAL": 0, "SEVERE": 1, "CRITICAL": 2}
+_SEVERITY_NAMES = {v: k for k, v in SEVERITY.items()}
+
+
+def _lock_device(device_id: int, *, using: str):
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_NAMESPACE, int(device_id) & 0x7FFFFFFF])
+
+
+def _deviation(temp: float, device: Device) -> float:
+    return max(temp - device.max_temp, device.min_temp - temp)
+
+
+def _fold(rows, *, device: Device, counted: int, lead_out: bool) -> list:
+    """
+    Excursions starting in rows[:counted], rows being (ts, temp_c, state) in
+    time order; rows[counted:] only carry the last run on to its closing
+    NORMAL reading. lead_out: the reading before rows[0] is out of range, so
+    a run starting at rows[0] belongs to an earlier excursion.
+    """
+    size = len(rows)
+    sev = np.fromiter((SEVERITY[r[2]] for r in rows), dtype=np.int8, count=size)
+    temps = np.fromiter((r[1] for r in rows), dtype=np.float64, count=size)
+    out = sev > 0
+    edges = np.diff(np.concatenate([[0], out.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # exclusive
+    if not len(starts):
+        return []
+
+    # reduceat spans start[i]..start[i+1]: mask the NORMAL readings in between
+    t_max = np.maximum.reduceat(np.where(out, temps, -np.inf), starts)
+    t_min = np.minimum.reduceat(np.where(out, temps, np.inf), starts)
+    worst = np.maximum.reduceat(sev, starts)
+    peak = np.where(t_max - device.max_temp >= device.min_temp - t_min, t_max, t_min)
+
+    keep = starts < counted
+    if lead_out:
+        keep &= starts != 0
+
+    found = []
+    for i in np.flatnonzero(keep).tolist():
+        s, e = int(starts[i]), int(ends[i])
+        start_ts, last_ts = rows[s][0], rows[e - 1][0]
+        end_ts = rows[e][0] if e < size else None
+        found.append(Excursion(
+            device_id=device.id, start_ts=start_ts, end_ts=end_ts, last_ts=last_ts,
+            duration_s=((end_ts or last_ts) - start_ts).total_seconds(),
+            readings=e - s, peak_temp=float(peak[i]), max_severity=_SEVERITY_NAMES[int(worst[i])],
+        ))
+    return found
+
+
+def _refold(device: Device, lo, hi, *, using: str) -> int:
+    """Rewrite the excursions starting in [lo, hi) (hi None: no end) from raw readings; returns readings read."""
+    qs = Measurement.objects.using(using).filter(device_id=device.id)
+    before = qs.filter(ts__lt=lo).order_by("-ts", "-id").values_list("state", flat=True).first()
+    window = qs.filter(ts__gte=lo)
+    if hi is not None:
+        window = window.filter(ts__lt=hi)
+    rows = list(window.order_by("ts", "id").values_list("ts", "temp_c", "state"))
+    counted = len(rows)
+    if rows and rows[-1][2] != "NORMAL" and hi is not None:
+        # carry the last run on to the NORMAL reading that closes it
+        close = qs.filter(ts__gte=hi, state="NORMAL").order_by("ts", "id").values_list("ts", flat=True).first()
+        carry = qs.filter(ts__gte=hi)
+        if close is not None:
+            carry = carry.filter(ts__lte=close)
+        rows += list(carry.order_by("ts", "id").values_list("ts", "temp_c", "state"))
+
+    stale = Excursion.objects.using(using).filter(device_id=device.id, start_ts__gte=lo)
+    if hi is not None:
+        stale = stale.filter(start_ts__lt=hi)
+    stale.delete()
+    if rows:
+        Excursion.objects.using(using).bulk_create(
+            _fold(rows, device=device, counted=counted, lead_out=before not in (None, "NORMAL")),
+            batch_size=1000,
+        )
+    return counted
+
+
+def rebuild_excursions(device_id: int, frm, to, *, using: str = "default") -> int:
+    """
+    Recompute the excursions of one device that start in [frm, to) from raw
+    rows. Returns the number of readings read.
+    """
+    device = Device.objects.get(id=device_id)
+    with transaction.atomic(using=using):
+        _lock_device(device_id, using=using)
+        return _refold(device, frm, to, using=using)
+
+
+def _refold_around(device: Device, readings, *, using: str):
+    """Late readings: re-fold from the excursion they fall into up to the next NORMAL reading after them."""
+    first, last = readings[0].ts, readings[-1].ts
+    lo = first
+    around = (
+        Excursion.objects.using(using).filter(device_id=device.id, start_ts__lte=first)
+        .order_by("-start_ts").first()
+    )
+    if around is not None and (around.end_ts is None or around.end_ts >= first):
+        lo = around.start_ts
+    hi = (
+        Measurement.objects.using(using).filter(device_id=device.id, ts__gt=last, state="NORMAL")
+        .order_by("ts", "id").values_list("ts", flat=True).first()
+    )
+    _refold(device, lo, hi, using=using)
+
+
+def add_readings(readings, *, using: str = "default"):
+    """
+    Fold freshly inserted readings of one device into its excursions (call
+    in the ingest transaction, after the insert).
+    """
+    readings = sorted(readings, key=lambda m: (m.ts, m.id or 0))
+    if not readings:
+        return
+    device = readings[0].device
+    _lock_device(device.id, using=using)
+    latest = Excursion.objects.using(using).filter(device_id=device.id).order_by("-start_ts").first()
+    if latest is not None and readings[0].ts < (latest.end_ts or latest.last_ts):
+        _refold_around(device, readings, using=using)
+        return
+
+    if not any(m.state != "NORMAL" for m in readings):
+        if latest is not None and latest.end_ts is None:
+            m = readings[0]
+            latest.end_ts = m.ts
+            latest.duration_s = (m.ts - latest.start_ts).total_seconds()
+            latest.save(using=using, update_fields=["end_ts", "duration_s"])
+        return
+    # violations: in order only if nothing already stored sits among or after them
+    newer = Measurement.objects.using(using).filter(device_id=device.id, ts__gte=readings[0].ts).count()
+    if newer != len(readings):
+        _refold_around(device, readings, using=using)
+        return
+
+    current = latest if latest is not None and latest.end_ts is None else None
+    changed, created = False, []
+    for m in readings:
+        if m.state == "NORMAL":
+            if current is not None:
+                current.end_ts = m.ts
+                current.duration_s = (m.ts - current.start_ts).total_seconds()
+                changed = changed or current is latest
+                current = None
+            continue
+        if current is None:
+            current = Excursion(
+                device_id=device.id, start_ts=m.ts, last_ts=m.ts, readings=0,
+                peak_temp=m.temp_c, max_severity=m.state,
+            )
+            created.append(current)
+        current.readings += 1
+        current.last_ts = m.ts
+        current.duration_s = (m.ts - current.start_ts).total_seconds()
+        d, p = _deviation(m.temp_c, device), _deviation(current.peak_temp, device)
+        if d > p or (d == p and m.temp_c > current.peak_temp):
+            current.peak_temp = m.temp_c
+        if SEVERITY[m.state] > SEVERITY[current.max_severity]:
+            current.max_severity = m.state
+        changed = changed or current is latest
+
+    if changed:
+        latest.save(using=using, update_fields=[
+            "end_ts", "last_ts", "duration_s", "readings", "peak_temp", "max_severity",
+        ])
+    if created:
+        Excursion.objects.using(using).bulk_create(created)
+
+
+# ---------- reading ----------
+
+EXCURSION_VALUES = (
+    "id", "device_id", "start_ts", "end_ts", "last_ts", "duration_s", "readings", "peak_temp", "max_severity",
+)
+KEY = ("start_ts", "id")
+
+
+def excursion_rows(rows) -> list:
+    """API shape of values() rows; device codes come from one query."""
+    codes = dict(Device.objects.filter(id__in={r["device_id"] for r in rows}).values_list("id", "code"))
+    return [
+        {
+            "id": r["id"],
+            "deviceCode": codes.get(r["device_id"]),
+            "start": r["start_ts"],
+            "end": r["end_ts"],
+            "last": r["last_ts"],
+            "open": r["end_ts"] is None,
+            "duration_s": round(r["duration_s"], 1),
+            "readings": r["readings"],
+            "peak_temp": r["peak_temp"],
+            "max_severity": r["max_severity"],
+        }
+        for r in rows
+    ]
+
+
+def sources(*, device: Device | None = None, site: str | None = None, frm=None, to=None,
+            severity: str | None = None, open_only: bool = False) -> dict:
+    """
+    {alias: queryset} of the excursions to page through: one device's, one
+    site's, or the fleet's (every shard), overlapping [frm, to].
+    """
+    if device is not None:
+        using = db_for_device(device)
+        out = {using: Excursion.objects.using(using).filter(device_id=device.id)}
+    elif site is not None:
+        using = db_for_site(site)
+        ids = list(Device.objects.filter(site=site).values_list("id", flat=True))
+        out = {using: Excursion.objects.using(using).filter(device_id__in=ids)}
+    else:
+        out = {alias: Excursion.objects.using(alias).all() for alias in shard_aliases()}
+
+    for alias, qs in out.items():
+        if to:
+            qs = qs.filter(start_ts__lte=to)
+        if frm:
+            qs = qs.filter(Q(end_ts__gte=frm) | Q(end_ts__isnull=True))
+        if severity:
+            qs = qs.filter(max_severity=severity)
+        if open_only:
+            qs = qs.filter(end_ts__isnull=True)
+        out[alias] = qs
+    return out
@@ -0,0 +1,255 @@
+# core/export_jobs.py
+import gzip
+import os
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import exports
+from core.models import ExportJob
+
+# appendable formats: a checkpoint is a byte offset, so these resume mid-file;
+# Arrow/Parquet restart from the beginning after an interruption
+RESUMABLE = {"csv", "ndjson"}
+
+# pg_advisory_xact_lock(namespace, 0), exclusive: claims run one at a time,
+# so the running count a claim checks cannot change before the claim commits.
+_LOCK_NAMESPACE = 0x45585054  # "EXPT"
+
+
+def _log(msg: str):
+    print(msg, flush=True)
+
+
+def export_dir() -> str:
+    return str(getattr(settings, "EXPORT_DIR", "exports"))
+
+
+def _ttl() -> timedelta:
+    return timedelta(hours=float(getattr(settings, "EXPORT_JOB_TTL_H", 24)))
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=float(getattr(settings, "EXPORT_JOB_STALE_S", 300)))
+
+
+def max_concurrency() -> int:
+    return max(1, int(getattr(settings, "EXPORT_JOB_CONCURRENCY", 2)))
+
+
+def enqueue_export(*, user=None, device=None, site: str = "", frm=None, to=None, fmt: str = "csv",
+                   compress: bool = False) -> ExportJob:
+    job = ExportJob.objects.create(
+        user=user, device=device, site=site or "", frm=frm, to=to, fmt=fmt, compress=compress
+    )
+    scope = device.code if device is not None else (site or "all")
+    _log(f"[export] queued job #{job.id} {scope} {fmt}{' gzip' if compress else ''} frm={frm} to={to}")
+    return job
+
+
+def job_filename(job: ExportJob) -> str:
+    """Download name, e.g. measurements_fridge-1.csv.gz."""
+    ext = exports.FORMATS[job.fmt][2]
+    name = exports.export_filename(ext, device=job.device, site=job.site)
+    return name + ".gz" if job.compress else name
+
+
+def job_content_type(job: ExportJob) -> str:
+    return "application/gzip" if job.compress else exports.FORMATS[job.fmt][1]
+
+
+def _beat(job: ExportJob, rows: int, f, last=None):
+    if last is not None:
+        job.cursor_ts, job.cursor_id, job.cursor_device_id = last[:3]
+    job.rows_written += rows
+    job.bytes_written = f.tell()
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=[
+        "cursor_ts", "cursor_id", "cursor_device_id", "rows_written", "bytes_written", "heartbeat_at",
+    ])
+
+
+def _encode_chunk(job, chunk, codes) -> bytes:
+    parts = exports.FORMATS[job.fmt][0](chunk, codes, rows_per_chunk=len(chunk), header=job.bytes_written == 0)
+    data = b"".join(p.encode() if isinstance(p, str) else p for p in parts)
+    # one gzip member per chunk: the file is valid gzip at every checkpoint
+    return gzip.compress(data) if job.compress else data
+
+
+def _write_appendable(job, f, rows, codes, log):
+    rows = iter(rows)
+    while chunk := list(islice(rows, exports.chunk_rows())):
+        f.write(_encode_chunk(job, chunk, codes))
+        f.flush()
+        os.fsync(f.fileno())
+        _beat(job, len(chunk), f, chunk[-1])
+        log(f"[export] job #{job.id} {job.rows_written}/{job.rows_total} rows ({job.progress:.0%})")
+    if job.bytes_written == 0:
+        # nothing matched: still hand out a well-formed (header-only) file
+        f.write(_encode_chunk(job, [], codes))
+
+
+def _write_arrow(job, f, rows, codes, log):
+    out = gzip.GzipFile(fileobj=f, mode="wb") if job.compress else f
+    schema = exports.arrow_schema()
+    if job.fmt == "parquet":
+        writer = exports.pq.ParquetWriter(out, schema)
+    else:
+        writer = exports.pa.ipc.new_stream(out, schema)
+    for batch in exports.record_batches(rows, codes):
+        writer.write_batch(batch)
+        _beat(job, batch.num_rows, f)
+        log(f"[export] job #{job.id} {job.rows_written}/{job.rows_total} rows ({job.progress:.0%})")
+    writer.close()
+    if out is not f:
+        out.close()
+
+
+def run_export_job(job: ExportJob, *, log=_log) -> ExportJob:
+    """
+    Write the job's rows to its file in chunks (short keyset reads, see
+    exports.iter_rows_after), checkpointing after each one. A CSV/NDJSON job
+    found half-written resumes from its last checkpoint.
+    """
+    resume = (
+        job.fmt in RESUMABLE and job.bytes_written > 0 and job.cursor_ts is not None
+        and job.path and os.path.exists(job.path)
+    )
+    if not resume:
+        job.cursor_ts = job.cursor_id = job.cursor_device_id = None
+        job.rows_written = job.bytes_written = 0
+        job.path = os.path.join(export_dir(), f"export_{job.id}.{exports.FORMATS[job.fmt][2]}")
+        if job.compress:
+            job.path += ".gz"
+    job.status = "RUNNING"
+    job.started_at = job.started_at or timezone.now()
+    job.heartbeat_at = timezone.now()
+    job.save()
+
+    try:
+        if not resume:
+            job.rows_total = exports.count_rows(device=job.device, site=job.site, frm=job.frm, to=job.to)
+            job.save(update_fields=["rows_total"])
+        os.makedirs(export_dir(), exist_ok=True)
+
+        after = (job.cursor_ts, job.cursor_id, job.cursor_device_id) if resume else None
+        rows = exports.iter_rows_after(device=job.device, site=job.site, frm=job.frm, to=job.to, after=after)
+        codes = exports.device_codes(device=job.device, site=job.site)
+        with open(job.path, "r+b" if resume else "wb") as f:
+            if resume:
+                f.truncate(job.bytes_written)
+                f.seek(job.bytes_written)
+                log(f"[export] job #{job.id} resuming after {job.rows_written} rows")
+            if job.fmt in RESUMABLE:
+                _write_appendable(job, f, rows, codes, log)
+            else:
+                _write_arrow(job, f, rows, codes, log)
+    except Exception as e:
+        job.status = "FAILED"
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        _remove_file(job)
+        log(f"[export] job #{job.id} failed: {e}")
+        return job
+
+    job.status = "DONE"
+    job.bytes_written = os.path.getsize(job.path)
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + _ttl()
+    job.save(update_fields=["status", "bytes_written", "finished_at", "expires_at"])
+    log(f"[export] job #{job.id} done: {job.rows_written} rows, {job.bytes_written} bytes")
+    return job
+
+
+def _lock_claims():
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s, 0)", [_LOCK_NAMESPACE])
+
+
+def _claim_next():
+    """
+    A RUNNING job whose worker stopped heartbeating (resume), else the oldest
+    PENDING one; None when nothing is due or EXPORT_JOB_CONCURRENCY jobs are
+    already running. The count and the claim share one transaction under the
+    claim lock, so concurrent workers never run more than the bound.
+    """
+    now = timezone.now()
+    stale = now - _stale_after()
+    with transaction.atomic():
+        _lock_claims()
+        if ExportJob.objects.filter(status="RUNNING", heartbeat_at__gte=stale).count() >= max_concurrency():
+            return None
+        for qs in (
+            ExportJob.objects.filter(status="RUNNING", heartbeat_at__lt=stale),
+            ExportJob.objects.filter(status="PENDING"),
+        ):
+            job = qs.select_for_update(skip_locked=True).order_by("created_at").first()
+            if job is None:
+                continue
+            job.status = "RUNNING"
+            job.heartbeat_at = now
+            job.save(update_fields=["status", "heartbeat_at"])
+            return job
+    return None
+
+
+def run_pending_export_jobs(*, log=_log) -> int:
+    """Drain the queue (within the concurrency bound); returns how many jobs were processed."""
+    done = 0
+    while True:
+        job = _claim_next()
+        if job is None:
+            return done
+        run_export_job(job, log=log)
+        done += 1
+
+
+def _remove_file(job: ExportJob):
+    if job.path:
+        try:
+            os.remove(job.path)
+        except FileNotFoundError:
+            pass
+
+
+def expire_export_jobs(*, log=_log) -> int:
+    """Delete the files of finished jobs past expires_at; the rows stay, as EXPIRED."""
+    n = 0
+    for job in ExportJob.objects.filter(status="DONE", expires_at__lt=timezone.now()):
+        _remove_file(job)
+        job.status = "EXPIRED"
+        job.path = ""
+        job.save(update_fields=["status", "path"])
+        n += 1
+    if n:
+        log(f"[export] expired {n} file(s)")
+    return n
+
+
+def job_as_dict(job: ExportJob) -> dict:
+    return {
+        "id": job.id,
+        "device": job.device.code if job.device_id else None,
+        "site": job.site or None,
+        "from": job.frm,
+        "to": job.to,
+        "format": job.fmt,
+        "compress": "gzip" if job.compress else None,
+        "status": job.status,
+        "progress": round(job.progress, 4),
+        "rows_total": job.rows_total,
+        "rows_written": job.rows_written,
+        "bytes_written": job.bytes_written,
+        "download": f"/api/exports/{job.id}/download" if job.status == "DONE" else None,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "expires_at": job.expires_at,
+    }
@@ -0,0 +1,240 @@
+# core/exports.py
+"""
+Streaming exports of raw readings. Rows come off a server-side cursor per
+shard (`iterator(chunk_size=...)`), are merged in (ts, id) order and encoded
+chunk by chunk, so server memory stays flat whatever the size of the export.
+
+Formats (FORMATS): CSV, NDJSON, and, when pyarrow is installed, Arrow IPC
+stream and Parquet written one record batch / row group per chunk, with a
+typed UTC timestamp column and float readings.
+"""
+import csv
+import heapq
+import io
+import zlib
+from itertools import islice
+
+import orjson
+from django.conf import settings
+from django.db.models import Q
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow/Parquet exports unavailable
+    pa = pq = None
+
+from core.models import Device, Measurement
+from core.sharding import db_for_device, db_for_site, shard_aliases
+
+EXPORT_FIELDS = ("ts", "id", "device_id", "temp_c", "humidity", "state")
+CSV_HEADER = ("device", "timestamp", "temp_c", "humidity", "state")
+
+
+def chunk_rows() -> int:
+    return max(1, int(getattr(settings, "EXPORT_CHUNK_ROWS", 5000)))
+
+
+def device_codes(*, device: Device | None = None, site: str | None = None) -> dict:
+    """{device_id: code} for everything the export may touch, in one query."""
+    if device is not None:
+        return {device.id: device.code}
+    qs = Device.objects.all()
+    if site:
+        qs = qs.filter(site=site)
+    return dict(qs.values_list("id", "code"))
+
+
+def _sources(device, site) -> dict:
+    if device is not None:
+        using = db_for_device(device)
+        return {using: Measurement.objects.using(using).filter(device=device)}
+    if site:
+        using = db_for_site(site)
+        ids = list(Device.objects.filter(site=site).values_list("id", flat=True))
+        return {using: Measurement.objects.using(using).filter(device_id__in=ids)}
+    return {alias: Measurement.objects.using(alias).all() for alias in shard_aliases()}
+
+
+def _filtered(device, site, frm, to) -> list:
+    sources = []
+    for qs in _sources(device, site).values():
+        if frm:
+            qs = qs.filter(ts__gte=frm)
+        if to:
+            qs = qs.filter(ts__lte=to)
+        sources.append(qs.order_by("ts", "id").values_list(*EXPORT_FIELDS))
+    return sources
+
+
+def iter_rows(*, device: Device | None = None, site: str | None = None, frm=None, to=None,
+              chunk_size: int | None = None):
+    """
+    EXPORT_FIELDS tuples in (ts, id) order for one device, one site or the
+    whole fleet. Each shard is read through its own server-side cursor;
+    heapq.merge only ever holds one row per shard.
+    """
+    chunk_size = chunk_size or chunk_rows()
+    return heapq.merge(*(qs.iterator(chunk_size=chunk_size) for qs in _filtered(device, site, frm, to)))
+
+
+def _after(ts, pk, device_id) -> Q:
+    # (ts, id, device_id) > cursor; device_id only breaks ties between shards
+    return Q(ts__gte=ts) & (Q(ts__gt=ts) | Q(id__gt=pk) | Q(id=pk, device_id__gt=device_id))
+
+
+def _keyset_chunks(qs, after, chunk_size):
+    while True:
+        chunk = list((qs.filter(_after(*after)) if after else qs)[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        ts, pk, device_id = chunk[-1][:3]
+        after = (ts, pk, device_id)
+
+
+def iter_rows_after(*, device: Device | None = None, site: str | None = None, frm=None, to=None,
+                    after=None, chunk_size: int | None = None):
+    """
+    Same rows as iter_rows(), read as one short keyset query per chunk and
+    shard instead of a cursor held open, starting strictly after `after` =
+    (ts, id, device_id). For long-running jobs that checkpoint and resume.
+    """
+    chunk_size = chunk_size or chunk_rows()
+    return heapq.merge(*(_keyset_chunks(qs, after, chunk_size) for qs in _filtered(device, site, frm, to)))
+
+
+def count_rows(*, device: Device | None = None, site: str | None = None, frm=None, to=None) -> int:
+    return sum(qs.order_by().count() for qs in _filtered(device, site, frm, to))
+
+
+def export_filename(ext: str, *, device: Device | None = None, site: str | None = None) -> str:
+    if device is not None:
+        return f"measurements_{device.code}.{ext}"
+    if site:
+        return f"measurements_{site}.{ext}"
+    return f"measurements_all.{ext}"
+
+
+def csv_chunks(rows, codes: dict, *, rows_per_chunk: int | None = None, header: bool = True):
+    """Encode rows as CSV text, yielding one string per `rows_per_chunk` rows."""
+    rows_per_chunk = rows_per_chunk or chunk_rows()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(CSV_HEADER)
+    for i, (ts, _id, device_id, temp_c, humidity, state) in enumerate(rows, 1):
+        writer.writerow((codes.get(device_id), ts.isoformat(), temp_c, humidity, state))
+        if i % rows_per_chunk == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def gzip_chunks(chunks, *, level: int = 6):
+    """gzip a stream of str/bytes chunks on the fly (a single .gz member)."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield z.flush()
+
+
+def ndjson_chunks(rows, codes: dict, *, rows_per_chunk: int | None = None, header: bool = True):
+    """One JSON object per line, same columns as the CSV (`header` is ignored)."""
+    rows_per_chunk = rows_per_chunk or chunk_rows()
+    lines = []
+    for ts, _id, device_id, temp_c, humidity, state in rows:
+        lines.append(orjson.dumps(
+            {"device": codes.get(device_id), "ts": ts, "temp_c": temp_c, "humidity": humidity, "state": state},
+            option=orjson.OPT_UTC_Z,
+        ))
+        if len(lines) == rows_per_chunk:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def arrow_schema():
+    return pa.schema([
+        ("device", pa.string()),
+        ("ts", pa.timestamp("us", tz="UTC")),
+        ("temp_c", pa.float64()),
+        ("humidity", pa.float64()),
+        ("state", pa.string()),
+    ])
+
+
+def record_batches(rows, codes: dict, *, rows_per_batch: int | None = None):
+    """Rows regrouped into typed pyarrow RecordBatches of `rows_per_batch`."""
+    schema = arrow_schema()
+    rows = iter(rows)
+    rows_per_batch = rows_per_batch or chunk_rows()
+    while batch := list(islice(rows, rows_per_batch)):
+        ts, _ids, device_ids, temps, hums, states = zip(*batch)
+        yield pa.RecordBatch.from_arrays([
+            pa.array([codes.get(d) for d in device_ids], pa.string()),
+            pa.array(ts, schema.field("ts").type),
+            pa.array(temps, pa.float64()),
+            pa.array(hums, pa.float64()),
+            pa.array(states, pa.string()),
+        ], schema=schema)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self._parts, self._pos = [], 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _arrow_writer_chunks(open_writer, rows, codes):
+    sink = _Sink()
+    writer = open_writer(sink)
+    for batch in record_batches(rows, codes):
+        writer.write_batch(batch)
+        if data := sink.drain():
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def arrow_chunks(rows, codes: dict):
+    """Arrow IPC stream (pyarrow.ipc.open_stream / pandas via pyarrow), one batch per chunk."""
+    return _arrow_writer_chunks(lambda sink: pa.ipc.new_stream(sink, arrow_schema()), rows, codes)
+
+
+def parquet_chunks(rows, codes: dict):
+    """Parquet file, one row group per chunk; the footer goes out last."""
+    return _arrow_writer_chunks(lambda sink: pq.ParquetWriter(sink, arrow_schema()), rows, codes)
+
+
+# name -> (encoder(rows, codes) -> chunks, content type, file extension, needs pyarrow)
+FORMATS = {
+    "csv": (csv_chunks, "text/csv", "csv", False),
+    "ndjson": (ndjson_chunks, "application/x-ndjson", "ndjson", False),
+    "arrow": (arrow_chunks, "application/vnd.apache.arrow.stream", "arrow", True),
+    "parquet": (parquet_chunks, "application/vnd.apache.parquet", "parquet", True),
+}
+
+
+def available(fmt: str) -> bool:
+    return fmt in FORMATS and (pa is not None or not FORMATS[fmt][3])
@@ -0,0 +1,407 @@
+# core/imports.py
+"""
+Bulk CSV import of readings (columns device, timestamp, temp_c[, humidity]).
+
+The upload is read once and its rows routed to a spool file per shard. On
+PostgreSQL each spool is then COPYed into a temp staging table, and device
+resolution, validation, state classification and the duplicate-skipping
+insert are a few set-based statements; elsewhere the same steps run in
+Python a chunk at a time. All shards commit together, so a failed import
+leaves nothing behind. Uploads above IMPORT_INLINE_MAX_BYTES run as an
+ImportJob on the jobs worker instead of inside the request.
+"""
+import csv
+import os
+import tempfile
+from contextlib import ExitStack
+from datetime import timedelta, timezone as dt_timezone
+from io import TextIOWrapper
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import counters, recent_ring, watermarks
+from core.aggregates import refresh_aggregates
+from core.models import Device, ImportJob, Measurement
+from core.sharding import db_for_site
+from core.utils import classify_state
+
+REQUIRED_COLUMNS = ("device", "timestamp", "temp_c")
+
+# classify_state()'s default band around [min_temp, max_temp]
+CRITICAL_MARGIN = 5.0
+
+_TEMP_FIELD = Measurement._meta.get_field("temp_c")
+
+
+def _log(msg: str):
+    print(msg, flush=True)
+
+
+def import_dir() -> str:
+    return str(getattr(settings, "IMPORT_DIR", "imports"))
+
+
+def inline_max_bytes() -> int:
+    return int(getattr(settings, "IMPORT_INLINE_MAX_BYTES", 5 * 1024 * 1024))
+
+
+def max_errors() -> int:
+    return int(getattr(settings, "IMPORT_MAX_ERRORS", 1000))
+
+
+def _chunk_rows() -> int:
+    return max(1, int(getattr(settings, "IMPORT_CHUNK_ROWS", 5000)))
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=float(getattr(settings, "IMPORT_JOB_STALE_S", 600)))
+
+
+def save_upload(upload, *, user=None) -> ImportJob:
+    """Persist an uploaded file under IMPORT_DIR as a PENDING ImportJob."""
+    job = ImportJob.objects.create(user=user, filename=getattr(upload, "name", "") or "")
+    os.makedirs(import_dir(), exist_ok=True)
+    job.path = os.path.join(import_dir(), f"import_{job.id}.csv")
+    with open(job.path, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    job.bytes_total = os.path.getsize(job.path)
+    job.save(update_fields=["path", "bytes_total"])
+    return job
+
+
+def _save(job: ImportJob, *fields):
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=[*fields, "heartbeat_at"])
+
+
+# ---------------------------------------------------------------------------
+# parse: upload -> one spool file per shard (line, device, timestamp, temp_c, humidity)
+# ---------------------------------------------------------------------------
+def _spool(job: ImportJob, routes: dict, stack: ExitStack) -> dict:
+    spools = {}
+    with open(job.path, "rb") as raw:
+        reader = csv.DictReader(TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+        missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV header must include {', '.join(REQUIRED_COLUMNS)} (missing {', '.join(missing)})")
+
+        for line_no, row in enumerate(reader, start=2):
+            code = (row.get("device") or "").strip()
+            # unknown codes go to the default shard and are reported from there
+            alias = routes.get(code, DEFAULT_DB_ALIAS)
+            if alias not in spools:
+                f = stack.enter_context(tempfile.TemporaryFile("w+", newline="", encoding="utf-8"))
+                spools[alias] = (f, csv.writer(f))
+            spools[alias][1].writerow((
+                line_no, code, (row.get("timestamp") or "").strip(),
+                (row.get("temp_c") or "").strip(), (row.get("humidity") or "").strip(),
+            ))
+            job.rows_read += 1
+            if job.rows_read % 50000 == 0:
+                job.bytes_read = raw.tell()
+                _save(job, "rows_read", "bytes_read")
+        job.bytes_read = job.bytes_total
+        _save(job, "rows_read", "bytes_read")
+
+    for f, _ in spools.values():
+        f.seek(0)
+    return {alias: f for alias, (f, _) in spools.items()}
+
+
+def _report(errors: list, line, error, device, ts, temp_c, humidity):
+    if len(errors) < max_errors():
+        errors.append({
+            "line": line,
+            "error": error,
+            "row": {"device": device, "timestamp": ts, "temp_c": temp_c, "humidity": humidity},
+        })
+
+
+# ---------------------------------------------------------------------------
+# merge, PostgreSQL: COPY into staging, then set-based validate/classify/insert
+# ---------------------------------------------------------------------------
+_STAGE = "import_stage"
+_DEVICES = "import_devices"
+
+
+def _pg_merge(alias: str, spool, devices: list, errors: list) -> tuple:
+    """(error_count, valid_rows, {device_id: (count, min ts, max ts)}) for one shard."""
+    meta = Measurement._meta
+    table = meta.db_table
+    scale_t = meta.get_field("temp_c").scale
+    scale_h = meta.get_field("humidity").scale
+    limit = meta.get_field("temp_c").max_value
+    codes = Measurement.STATE_CODES
+
+    # first failing check per row; NULL = valid
+    err_sql = f"""
+        CASE
+          WHEN d.id IS NULL THEN 'Unknown device'
+          WHEN s.ts IS NULL OR NOT pg_input_is_valid(s.ts, 'timestamptz') THEN 'Invalid timestamp'
+          WHEN s.temp_c IS NULL OR NOT pg_input_is_valid(s.temp_c, 'float8')
+               OR abs(s.temp_c::float8) > {limit} THEN 'Invalid temp_c'
+          WHEN s.humidity IS NOT NULL AND (NOT pg_input_is_valid(s.humidity, 'float8')
+               OR abs(s.humidity::float8) > {limit}) THEN 'Invalid humidity'
+        END
+    """
+    with connections[alias].cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE {_STAGE} (line bigint, device text, ts text, temp_c text, humidity text) "
+            f"ON COMMIT DROP"
+        )
+        cur.execute(
+            f"CREATE TEMP TABLE {_DEVICES} (id bigint PRIMARY KEY, code text UNIQUE, "
+            f"min_temp float8, max_temp float8) ON COMMIT DROP"
+        )
+        with cur.copy(f"COPY {_STAGE} (line, device, ts, temp_c, humidity) FROM STDIN WITH (FORMAT csv)") as cp:
+            while block := spool.read(1 << 20):
+                cp.write(block)
+        with cur.copy(f"COPY {_DEVICES} (id, code, min_temp, max_temp) FROM STDIN") as cp:
+            for d in devices:
+                cp.write_row((d.id, d.code, d.min_temp, d.max_temp))
+        cur.execute(f"ANALYZE {_STAGE}")
+
+        cur.execute(f"""
+            SELECT s.line, e.error, s.device, s.ts, s.temp_c, s.humidity, count(*) OVER ()
+            FROM {_STAGE} s LEFT JOIN {_DEVICES} d ON d.code = s.device
+            CROSS JOIN LATERAL (SELECT {err_sql} AS error) e
+            WHERE e.error IS NOT NULL
+            ORDER BY s.line
+            LIMIT %s
+        """, [max(1, max_errors() - len(errors))])
+        failed = cur.fetchall()
+        error_count = failed[0][-1] if failed else 0
+        for line, error, device, ts, temp_c, humidity, _ in failed:
+            _report(errors, line, error, device, ts, temp_c, humidity)
+
+        cur.execute(f"SELECT count(*) FROM {_STAGE}")
+        valid = cur.fetchone()[0] - error_count
+
+        # one statement: dedupe within the file, skip readings already stored, classify, insert
+        cur.execute(f"""
+            WITH ok AS (
+                SELECT DISTINCT ON (d.id, s.ts::timestamptz)
+                       d.id AS device_id, s.ts::timestamptz AS ts,
+                       -- on the stored grid, so the state is that of the stored value
+                       round(s.temp_c::float8 * %s) / %s AS t, s.humidity::float8 AS h, d.min_temp, d.max_temp
+                FROM {_STAGE} s JOIN {_DEVICES} d ON d.code = s.device
+                WHERE ({err_sql}) IS NULL
+                ORDER BY d.id, s.ts::timestamptz, s.line
+            ), ins AS (
+                INSERT INTO {table} (device_id, ts, temp_c, humidity, state)
+                SELECT device_id, ts, round(t * %s)::smallint, round(h * %s)::smallint,
+                       CASE
+                         WHEN t < min_temp - %s OR t > max_temp + %s THEN %s
+                         WHEN t < min_temp OR t > max_temp THEN %s
+                         ELSE %s
+                       END
+                FROM ok
+                WHERE NOT EXISTS (SELECT 1 FROM {table} m WHERE m.device_id = ok.device_id AND m.ts = ok.ts)
+                RETURNING device_id, ts
+            )
+            SELECT device_id, count(*), min(ts), max(ts) FROM ins GROUP BY device_id
+        """, [
+            scale_t, scale_t, scale_t, scale_h, CRITICAL_MARGIN, CRITICAL_MARGIN,
+            codes["CRITICAL"], codes["SEVERE"], codes["NORMAL"],
+        ])
+        touched = {device_id: (n, lo, hi) for device_id, n, lo, hi in cur.fetchall()}
+    return error_count, valid, touched
+
+
+# ---------------------------------------------------------------------------
+# merge, other databases: the same steps in Python, a chunk at a time
+# ---------------------------------------------------------------------------
+def _check(device, ts_raw, temp_raw, hum_raw, limit):
+    if device is None:
+        return "Unknown device", None
+    ts = parse_datetime(ts_raw) if ts_raw else None
+    if ts is None:
+        return "Invalid timestamp", None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt_timezone.utc)  # as PostgreSQL's UTC session would read it
+    try:
+        temp = float(temp_raw)
+        if not abs(temp) <= limit:
+            raise ValueError
+    except ValueError:
+        return "Invalid temp_c", None
+    hum = None
+    if hum_raw:
+        try:
+            hum = float(hum_raw)
+            if not abs(hum) <= limit:
+                raise ValueError
+        except ValueError:
+            return "Invalid humidity", None
+    return None, (ts, temp, hum)
+
+
+def _generic_merge(alias: str, spool, devices: list, errors: list) -> tuple:
+    by_code = {d.code: d for d in devices}
+    limit = Measurement._meta.get_field("temp_c").max_value
+    error_count = valid = 0
+    touched = {}
+
+    reader = csv.reader(spool)
+    while True:
+        chunk = [row for _, row in zip(range(_chunk_rows()), reader)]
+        if not chunk:
+            break
+        good = {}
+        for line, code, ts_raw, temp_raw, hum_raw in chunk:
+            device = by_code.get(code)
+            error, parsed = _check(device, ts_raw, temp_raw, hum_raw, limit)
+            if error:
+                error_count += 1
+                _report(errors, int(line), error, code, ts_raw or None, temp_raw or None, hum_raw or None)
+                continue
+            valid += 1
+            ts, temp, hum = parsed
+            good.setdefault((device.id, ts), (device, ts, _TEMP_FIELD.quantize(temp), hum))  # first line wins
+
+        existing = set()
+        for device_id in {k[0] for k in good}:
+            stamps = [ts for (d_id, ts) in good if d_id == device_id]
+            existing.update(
+                (device_id, ts) for ts in Measurement.objects.using(alias)
+                .filter(device_id=device_id, ts__in=stamps).values_list("ts", flat=True)
+            )
+        rows = [
+            Measurement(
+                device=device, ts=ts, temp_c=temp, humidity=hum,
+                state=classify_state(temp, min_temp=device.min_temp, max_temp=device.max_temp),
+            )
+            for key, (device, ts, temp, hum) in good.items() if key not in existing
+        ]
+        Measurement.objects.using(alias).bulk_create(rows, batch_size=1000)
+        for m in rows:
+            n, lo, hi = touched.get(m.device_id, (0, m.ts, m.ts))
+            touched[m.device_id] = (n + 1, min(lo, m.ts), max(hi, m.ts))
+    return error_count, valid, touched
+
+
+# ---------------------------------------------------------------------------
+# job
+# ---------------------------------------------------------------------------
+def run_import_job(job: ImportJob, *, log=_log) -> ImportJob:
+    job.status = "RUNNING"
+    job.stage = "parse"
+    job.started_at = timezone.now()
+    job.rows_read = job.bytes_read = job.inserted = job.skipped_duplicates = job.error_count = 0
+    job.devices_total = job.devices_done = 0
+    job.errors = []
+    _save(job, "status", "stage", "started_at", "rows_read", "bytes_read", "inserted",
+          "skipped_duplicates", "error_count", "devices_total", "devices_done", "errors")
+
+    try:
+        devices = list(Device.objects.all())
+        routes = {d.code: db_for_site(d.site) for d in devices}
+        touched = {}
+        with ExitStack() as files:
+            spools = _spool(job, routes, files)
+            log(f"[import] job #{job.id} read {job.rows_read} rows into {len(spools)} shard(s)")
+
+            job.stage = "merge"
+            _save(job, "stage")
+            errors = []
+            # one transaction per database receiving rows: all or nothing
+            with ExitStack() as stack:
+                for alias in spools:
+                    stack.enter_context(transaction.atomic(using=alias))
+                for alias, spool in spools.items():
+                    merge = _pg_merge if connections[alias].vendor == "postgresql" else _generic_merge
+                    shard_devices = [d for d in devices if routes[d.code] == alias]
+                    n_errors, valid, shard_touched = merge(alias, spool, shard_devices, errors)
+                    inserted = sum(n for n, _, _ in shard_touched.values())
+                    job.error_count += n_errors
+                    job.inserted += inserted
+                    job.skipped_duplicates += valid - inserted
+                    touched.update(shard_touched)
+            job.errors = sorted(errors, key=lambda e: e["line"])
+
+        log(f"[import] job #{job.id} inserted {job.inserted}, skipped {job.skipped_duplicates}, "
+            f"{job.error_count} error(s)")
+        job.stage = "aggregates"
+        job.devices_total = len(touched)
+        _save(job, "stage", "inserted", "skipped_duplicates", "error_count", "errors", "devices_total")
+
+        # keep hourly rollups & other derived aggregates in step with the new rows
+        for device_id, (_, lo, hi) in touched.items():
+            refresh_aggregates(device_id, lo, hi)
+            recent_ring.invalidate(device_id)
+            counters.sync_device(device_id, refresh_last=True)
+            watermarks.touch(device_id)
+            job.devices_done += 1
+            _save(job, "devices_done")
+    except Exception as e:
+        job.status = "FAILED"
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        log(f"[import] job #{job.id} failed: {e}")
+        return job
+    finally:
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+    job.status = "DONE"
+    job.stage = "done"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "stage", "finished_at"])
+    log(f"[import] job #{job.id} done in {(job.finished_at - job.started_at).total_seconds():.1f}s")
+    return job
+
+
+def _claim_next():
+    # an import is all-or-nothing, so one whose worker died simply runs again
+    stale = timezone.now() - _stale_after()
+    for qs in (
+        ImportJob.objects.filter(status="RUNNING", heartbeat_at__lt=stale),
+        ImportJob.objects.filter(status="PENDING"),
+    ):
+        job = qs.order_by("created_at").first()
+        if job is None:
+            continue
+        claimed = ImportJob.objects.filter(id=job.id, status=job.status, heartbeat_at=job.heartbeat_at).update(
+            status="RUNNING", heartbeat_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_pending_import_jobs(*, log=_log) -> int:
+    """Drain the queue one job at a time; returns how many jobs were processed."""
+    done = 0
+    while True:
+        job = _claim_next()
+        if job is None:
+            return done
+        run_import_job(job, log=log)
+        done += 1
+
+
+def job_as_dict(job: ImportJob) -> dict:
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": round(job.progress, 4),
+        "rows_read": job.rows_read,
+        "inserted": job.inserted,
+        "skipped_duplicates": job.skipped_duplicates,
+        "error_count": job.error_count,
+        "errors": job.errors,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
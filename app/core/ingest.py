@@ -0,0 +1,221 @@
+# core/ingest.py
+"""
+Batched ingest for gateways: one request carrying many readings, as a JSON
+array or NDJSON (one object per line), optionally gzip-compressed.
+
+Items are validated one by one with the single-reading serializer's rules,
+so a bad item only fails itself. Valid readings are grouped per device and
+written with MeasurementService.record_batch (one transaction per device),
+and ticket handling runs once per device over its readings in time order,
+with the same outcome as posting them one at a time. Items over the
+device's or site's ingest rate (core.ratelimit) come back "limited".
+"""
+import zlib
+
+import orjson
+from django.conf import settings
+from rest_framework import serializers
+
+from core import credentials, ratelimit
+from core.models import Device, Measurement
+from core.serializers import IngestMeasurementSerializer
+from core.services.measurements import MeasurementService
+from core.services.tickets import TicketService
+from core.sharding import db_for_device
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+GZIP_TYPES = ("application/gzip", "application/x-gzip")
+
+_READ_SIZE = 64 * 1024
+
+# placeholder for an NDJSON line that did not parse
+INVALID_JSON = object()
+
+
+class BatchError(Exception):
+    """The body as a whole is unusable; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_bytes() -> int:
+    return int(getattr(settings, "INGEST_BATCH_MAX_BYTES", 10 * 1024 * 1024))
+
+
+def max_items() -> int:
+    return int(getattr(settings, "INGEST_BATCH_MAX_ITEMS", 5000))
+
+
+def read_body(stream, *, gzipped: bool) -> bytes:
+    """
+    The request body, gunzipped when `gzipped`, read in chunks and capped at
+    INGEST_BATCH_MAX_BYTES after decompression.
+    """
+    limit = max_bytes()
+    out = bytearray()
+    inflate = zlib.decompressobj(wbits=47) if gzipped else None  # gzip or zlib header
+    while stream is not None:
+        chunk = stream.read(_READ_SIZE)
+        if not chunk:
+            break
+        if inflate is not None:
+            try:
+                chunk = inflate.decompress(chunk, limit + 1 - len(out))
+            except zlib.error:
+                raise BatchError("Body is not valid gzip.")
+        out += chunk
+        if len(out) > limit:
+            raise BatchError(f"Batch larger than {limit} bytes.", status=413)
+    if inflate is not None and out and not inflate.eof:
+        raise BatchError("Body is not valid gzip.")
+    return bytes(out)
+
+
+def parse_items(body: bytes, *, ndjson: bool) -> list:
+    """
+    The batch items. A malformed JSON array rejects the whole body; a
+    malformed NDJSON line only becomes an invalid item.
+    """
+    if ndjson:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                items.append(INVALID_JSON)
+    else:
+        try:
+            items = orjson.loads(body) if body.strip() else []
+        except orjson.JSONDecodeError:
+            raise BatchError("Body is not valid JSON.")
+        if not isinstance(items, list):
+            raise BatchError("Expected a JSON array of readings.")
+    if not items:
+        raise BatchError("Empty batch.")
+    if len(items) > max_items():
+        raise BatchError(f"Batch has {len(items)} items, limit is {max_items()}.", status=413)
+    return items
+
+
+def validate_items(items: list) -> list:
+    """[(validated_data, None) | (None, errors)] per item, in input order."""
+    ser = IngestMeasurementSerializer()
+    out = []
+    for item in items:
+        if item is INVALID_JSON:
+            out.append((None, {"non_field_errors": ["Invalid JSON."]}))
+            continue
+        try:
+            out.append((ser.run_validation(item), None))
+        except serializers.ValidationError as e:
+            out.append((None, serializers.as_serializer_error(e)))
+    return out
+
+
+def device_error(code: str, auth=None) -> str | None:
+    """
+    Why readings for `code` are refused under the request's credentials, or
+    None: a device key only covers its own device, and once device keys
+    exist (DEVICE_KEY_MASTER) or DEVICE_AUTH_REQUIRED is on, only known,
+    active devices take readings. In memory, no query (core.credentials).
+    """
+    if isinstance(auth, credentials.Credential):
+        return None if code == auth.code else "Not permitted with this device's key."
+    if credentials.known_only() and credentials.lookup(code) is None:
+        return "Unknown or inactive device."
+    return None
+
+
+def _devices(codes) -> dict:
+    """
+    {code: Device} for the batch, creating unknown devices like the
+    single-reading ingest does (only reached without device keys, see
+    device_error).
+    """
+    devices = {d.code: d for d in Device.objects.filter(code__in=codes)}
+    for code in codes:
+        if code not in devices:
+            devices[code], _ = Device.objects.get_or_create(code=code)
+    return devices
+
+
+def _unstored(device, group: list) -> list:
+    """`group` without the readings whose (device, ts) is already stored or repeats an earlier item."""
+    stored = set(
+        Measurement.objects.using(db_for_device(device))
+        .filter(device=device, ts__in={data["ts"] for _, data in group}).values_list("ts", flat=True)
+    )
+    out = []
+    for key, data in group:
+        if data["ts"] not in stored:
+            stored.add(data["ts"])
+            out.append((key, data))
+    return out
+
+
+def store_valid(entries: list, *, skip_stored: bool = False) -> tuple:
+    """
+    Store validated readings, `entries` being (key, data) pairs with the
+    serializer's validated data. Grouped per device: one record_batch and
+    one ticket pass each. Returns ({key: Measurement},
+    {Device: states in time order}). With `skip_stored`, a reading whose
+    (device, ts) is already stored, or repeats an earlier entry, is left
+    out (its key is missing from the result).
+    """
+    per_code = {}
+    for key, data in entries:
+        per_code.setdefault(data["deviceId"], []).append((key, data))
+
+    stored, touched = {}, {}
+    devices = _devices(per_code) if per_code else {}
+    for code, group in per_code.items():
+        device = devices[code]
+        if skip_stored:
+            group = _unstored(device, group)
+            if not group:
+                continue
+        readings = [
+            {
+                "ts": data["ts"],
+                "temp_c": data["tempC"],
+                "humidity": data.get("humidity"),
+            }
+            for _, data in group
+        ]
+        rows = MeasurementService.record_batch(device=device, readings=readings)
+        for (key, _), m in zip(group, rows):
+            stored[key] = m
+        # alerts: once per device, over its readings in time order
+        states = [m.state for m in sorted(rows, key=lambda m: m.ts)]
+        TicketService.on_reading_states(device, states)
+        touched[device] = states
+    return stored, touched
+
+
+def ingest_batch(items: list, *, auth=None) -> list:
+    """
+    Validate and store a batch; per-item results in input order:
+    {"index", "status": "created", "id", "state"} or
+    {"index", "status": "invalid", "errors"} or
+    {"index", "status": "limited"}.
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, (data, errors) in enumerate(validate_items(items)):
+        if errors is None and (refused := device_error(data["deviceId"], auth)):
+            errors = {"deviceId": [refused]}
+        if errors is not None:
+            results[index] = {"index": index, "status": "invalid", "errors": errors}
+        elif not ratelimit.admit(data["deviceId"], temp_c=data["tempC"], ts=data["ts"]):
+            results[index] = {"index": index, "status": "limited"}
+        else:
+            valid.append((index, data))
+
+    stored, _ = store_valid(valid)
+    for index, m in stored.items():
+        results[index] = {"index": index, "status": "created", "id": m.id, "state": m.state}
+    return results
@@ -0,0 +1,266 @@
+# core/live.py
+"""
+Live event stream (Server-Sent Events) of new readings and ticket changes.
+
+Publishing (ingest and ticket code paths, in any process) writes one
+LiveEvent row and, on Postgres, sends `NOTIFY coldchain_live`. Its id is the
+SSE event id, so a reconnecting client resumes from Last-Event-ID.
+
+Streaming runs under ASGI. Each process has a single Hub, which LISTENs on
+one connection and reads every new batch of rows with one query. It then
+fans those rows out to the queues of all connected clients. Any number of
+open dashboards therefore costs one notification and one query per batch.
+Without Postgres the hub polls the table every LIVE_POLL_S instead.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+
+from core.models import LiveEvent
+
+CHANNEL = "coldchain_live"
+READING = "reading"
+TICKET = "ticket"
+
+# ids are allocated at insert but become visible at commit, so a concurrent
+# publisher can commit an id below the hub's cursor; re-check this many
+_LOOKBACK = 256
+_SAFETY_POLL_S = 10.0  # with LISTEN: re-check even without a notification
+_PRUNE_EVERY_S = 60.0
+_FIELDS = ("id", "kind", "device_id", "site", "data")
+
+_dt = DateTimeField()
+
+
+# ---------- publishing ----------
+def _publish(kind: str, device, data: dict):
+    events = _publish_many(kind, [(device, data)])
+    return events[0] if events else None
+
+
+def _publish_many(kind: str, items) -> list:
+    """One LiveEvent row per (device, data), inserted together, and a single NOTIFY."""
+    if not getattr(settings, "LIVE_EVENTS_ENABLED", True) or not items:
+        return []
+    events = LiveEvent.objects.bulk_create([
+        LiveEvent(kind=kind, device_id=device.id, site=device.site or "", data=data) for device, data in items
+    ])
+    conn = connections[DEFAULT_DB_ALIAS]
+    if conn.vendor == "postgresql":
+        # delivered at commit (or right away in autocommit); the hub reads
+        # every new row on any notification
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", [CHANNEL, str(events[-1].id)])
+    return events
+
+
+def _reading_data(m) -> dict:
+    return {
+        "id": m.id,
+        "deviceCode": m.device.code,
+        "ts": _dt.to_representation(m.ts),
+        "temp_c": m.temp_c,
+        "humidity": m.humidity,
+        "state": m.state,
+    }
+
+
+def publish_reading(m):
+    """A new reading (same fields as MeasurementSerializer)."""
+    return _publish(READING, m.device, _reading_data(m))
+
+
+def publish_readings(readings) -> list:
+    """publish_reading() for a batch: one INSERT and one NOTIFY."""
+    return _publish_many(READING, [(m.device, _reading_data(m)) for m in readings])
+
+
+def publish_ticket(t, event: str):
+    """Ticket change; event is opened / escalated / acked / closed / resolved."""
+    device = t.device
+    return _publish(TICKET, device, {
+        "event": event,
+        "id": t.id,
+        "deviceCode": device.code,
+        "status": t.status,
+        "severity": t.severity,
+        "opened_at": _dt.to_representation(t.opened_at) if t.opened_at else None,
+        "closed_at": _dt.to_representation(t.closed_at) if t.closed_at else None,
+        "acked_by": t.acked_by,
+        "acked_at": _dt.to_representation(t.acked_at) if t.acked_at else None,
+    })
+
+
+def prune() -> int:
+    """Drop events older than LIVE_EVENTS_RETENTION_MIN; returns rows deleted."""
+    minutes = int(getattr(settings, "LIVE_EVENTS_RETENTION_MIN", 60))
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return LiveEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+# ---------- reading side (sync, called through sync_to_async) ----------
+def _recent_ids():
+    last = LiveEvent.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    return last, set(LiveEvent.objects.filter(id__gt=last - _LOOKBACK).values_list("id", flat=True))
+
+
+def _fetch_new(cursor: int, seen: set):
+    qs = LiveEvent.objects.filter(id__gt=cursor - _LOOKBACK)
+    if seen:
+        qs = qs.exclude(id__in=seen)
+    return list(qs.order_by("id").values(*_FIELDS))
+
+
+def replay(after_id: int, *, device_ids=None, site=None):
+    """Events after a Last-Event-ID (newest LIVE_REPLAY_MAX), filtered, oldest first."""
+    qs = LiveEvent.objects.filter(id__gt=after_id)
+    if device_ids:
+        qs = qs.filter(device_id__in=device_ids)
+    if site:
+        qs = qs.filter(site=site)
+    limit = int(getattr(settings, "LIVE_REPLAY_MAX", 1000))
+    rows = list(qs.order_by("-id").values(*_FIELDS)[:limit])
+    rows.reverse()
+    return rows
+
+
+def _reset_connections():
+    close_old_connections()
+    connections[DEFAULT_DB_ALIAS].close()
+
+
+def _conninfo() -> str:
+    from psycopg.conninfo import make_conninfo
+
+    db = settings.DATABASES[DEFAULT_DB_ALIAS]
+    params = {
+        "dbname": db.get("NAME"),
+        "user": db.get("USER"),
+        "password": db.get("PASSWORD"),
+        "host": db.get("HOST"),
+        "port": db.get("PORT"),
+    }
+    return make_conninfo(**{k: str(v) for k, v in params.items() if v})
+
+
+# ---------- fan-out ----------
+class Subscriber:
+    """One connected client: its filters and a bounded queue of rows."""
+
+    def __init__(self, *, device_ids=None, site=None):
+        self.device_ids = set(device_ids or ())
+        self.site = site or None
+        self.queue = asyncio.Queue(maxsize=int(getattr(settings, "LIVE_CLIENT_BUFFER", 1000)))
+
+    def matches(self, row) -> bool:
+        if self.device_ids and row["device_id"] not in self.device_ids:
+            return False
+        return self.site is None or row["site"] == self.site
+
+    def offer(self, row) -> bool:
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class Hub:
+    """Per-process, per-event-loop fan-out; runs only while clients are connected."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.clients = set()
+        self.wake = asyncio.Event()
+        self.task = None
+
+    def subscribe(self, sub: Subscriber):
+        self.clients.add(sub)
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self._run())
+
+    def unsubscribe(self, sub: Subscriber):
+        self.clients.discard(sub)
+
+    def _dispatch(self, rows):
+        for sub in list(self.clients):
+            for row in rows:
+                if sub.matches(row) and not sub.offer(row):
+                    # too far behind: drop it, it resumes via Last-Event-ID
+                    self.clients.discard(sub)
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    sub.queue.put_nowait(None)
+                    break
+
+    async def _listen(self):
+        import psycopg
+
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(_conninfo(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    self.wake.set()  # catch up on anything sent while disconnected
+                    async for _ in conn.notifies():
+                        self.wake.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[live] listen error: {e}", flush=True)
+                await asyncio.sleep(5)
+
+    async def _run(self):
+        listen = connections[DEFAULT_DB_ALIAS].vendor == "postgresql"
+        listener = self.loop.create_task(self._listen()) if listen else None
+        poll = _SAFETY_POLL_S if listen else float(getattr(settings, "LIVE_POLL_S", 1.0))
+        cursor, seen = await sync_to_async(_recent_ids)()
+        last_prune = 0.0
+        try:
+            while self.clients:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=poll)
+                except asyncio.TimeoutError:
+                    pass
+                self.wake.clear()
+                try:
+                    rows = await sync_to_async(_fetch_new)(cursor, seen)
+                    if time.monotonic() - last_prune > _PRUNE_EVERY_S:
+                        last_prune = time.monotonic()
+                        await sync_to_async(prune)()
+                except Exception as e:
+                    print(f"[live] fetch error: {e}", flush=True)
+                    await sync_to_async(_reset_connections)()
+                    await asyncio.sleep(1)
+                    continue
+                if not rows:
+                    continue
+                cursor = max(cursor, rows[-1]["id"])
+                seen.update(r["id"] for r in rows)
+                seen = {i for i in seen if i > cursor - _LOOKBACK}
+                self._dispatch(rows)
+        finally:
+            if listener is not None:
+                listener.cancel()
+
+
+_hub = None
+
+
+def hub() -> Hub:
+    global _hub
+    loop = asyncio.get_running_loop()
+    if _hub is None or _hub.loop is not loop:
+        _hub = Hub(loop)
+    return _hub
+
+
+def sse_event(row) -> str:
+    data = json.dumps(row["data"], separators=(",", ":"))
+    return f"id: {row['id']}\nevent: {row['kind']}\ndata: {data}\n\n"
@@ -0,0 +1,139 @@
+# core/management/commands/backfill_aggregates.py
+import json
+import multiprocessing
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+
+from core.aggregates import AGGREGATES, device_bounds, iter_slices
+from core.models import Device
+from core.sharding import db_for_device
+
+
+def _task_key(task) -> str:
+    name, device_id, lo, hi, _using = task
+    return f"{name}:{device_id}:{lo.isoformat()}:{hi.isoformat()}"
+
+
+def _init_worker():
+    # Never reuse a connection inherited from the parent across fork.
+    connections.close_all()
+
+
+def _run_task(task):
+    name, device_id, lo, hi, using = task
+    t0 = time.perf_counter()
+    try:
+        rows = AGGREGATES[name](device_id, lo, hi, using=using)
+        return _task_key(task), rows, time.perf_counter() - t0, None
+    except Exception as e:
+        return _task_key(task), 0, time.perf_counter() - t0, str(e)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute derived aggregates (hourly rollups, ...) from raw measurements, "
+        "partitioned by device and time slice across a process pool. "
+        "Checkpointed: re-run with the same --checkpoint to resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--aggregate", action="append", choices=sorted(AGGREGATES),
+                            help="aggregate to rebuild (repeatable; default: all)")
+        parser.add_argument("--device", action="append", help="device code (repeatable; default: all devices)")
+        parser.add_argument("--site", help="only devices of this site")
+        parser.add_argument("--from", dest="frm", help="ISO 8601 start (default: first reading per device)")
+        parser.add_argument("--to", help="ISO 8601 end (default: last reading per device)")
+        parser.add_argument("--slice-days", type=int, default=7, help="time slice per task (default 7)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--checkpoint", default="backfill_aggregates.ckpt",
+                            help="file of completed tasks (default ./backfill_aggregates.ckpt)")
+        parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+
+    def handle(self, *args, **opts):
+        names = opts["aggregate"] or sorted(AGGREGATES)
+        frm = parse_datetime(opts["frm"]) if opts["frm"] else None
+        to = parse_datetime(opts["to"]) if opts["to"] else None
+        if (opts["frm"] and frm is None) or (opts["to"] and to is None):
+            raise CommandError("--from/--to must be ISO 8601 datetimes")
+
+        devices = Device.objects.all().order_by("id")
+        if opts["device"]:
+            devices = devices.filter(code__in=opts["device"])
+        if opts["site"]:
+            devices = devices.filter(site=opts["site"])
+
+        tasks = self._plan(names, devices, frm, to, timedelta(days=max(1, opts["slice_days"])))
+
+        ckpt_path = opts["checkpoint"]
+        done = set()
+        if os.path.exists(ckpt_path) and not opts["restart"]:
+            with open(ckpt_path) as fh:
+                done = {json.loads(line)["task"] for line in fh if line.strip()}
+        elif opts["restart"] and os.path.exists(ckpt_path):
+            os.remove(ckpt_path)
+
+        todo = [t for t in tasks if _task_key(t) not in done]
+        self.stdout.write(
+            f"[backfill] aggregates={','.join(names)} tasks={len(tasks)} "
+            f"already done={len(tasks) - len(todo)} workers={opts['workers']}"
+        )
+        if not todo:
+            self.stdout.write(self.style.SUCCESS("[backfill] nothing to do"))
+            return
+
+        self._run(todo, opts["workers"], ckpt_path)
+
+    def _plan(self, names, devices, frm, to, step):
+        tasks = []
+        for device in devices:
+            using = db_for_device(device)
+            lo, hi = frm, to
+            if lo is None or hi is None:
+                first, last = device_bounds(device.id, using=using)
+                if first is None:
+                    continue
+                lo, hi = lo or first, hi or last
+            for s_lo, s_hi in iter_slices(lo, hi, step):
+                for name in names:
+                    tasks.append((name, device.id, s_lo, s_hi, using))
+        return tasks
+
+    def _run(self, todo, workers, ckpt_path):
+        # Children must open their own DB connections.
+        connections.close_all()
+
+        started = time.perf_counter()
+        total_rows = failed = finished = 0
+        with open(ckpt_path, "a") as ckpt, multiprocessing.Pool(max(1, workers), initializer=_init_worker) as pool:
+            for key, rows, secs, err in pool.imap_unordered(_run_task, todo):
+                finished += 1
+                if err:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f"[backfill] {key} failed: {err}"))
+                    continue
+                total_rows += rows
+                ckpt.write(json.dumps({"task": key, "rows": rows, "secs": round(secs, 3)}) + "\n")
+                ckpt.flush()
+
+                elapsed = max(time.perf_counter() - started, 1e-6)
+                if finished % 50 == 0 or finished == len(todo):
+                    self.stdout.write(
+                        f"[backfill] {finished}/{len(todo)} tasks, {total_rows} rows, "
+                        f"{total_rows / elapsed:,.0f} rows/s"
+                    )
+
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(
+            f"[backfill] done: {finished - failed} ok, {failed} failed, {total_rows} rows "
+            f"in {elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/s)"
+        ))
+        if failed:
+            self.stdout.write("[backfill] re-run the same command to retry the failed slices")
@@ -0,0 +1,87 @@
+# core/management/commands/benchmark_measurement_render.py
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Device, Measurement
+from core.renderers import ORJSONRenderer
+from core.serializers import MEASUREMENT_VALUES, MeasurementSerializer, measurement_rows
+from core.sharding import db_for_device
+
+
+def _median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering N measurements the old way (model instances -> "
+        "MeasurementSerializer(many=True) -> JSONRenderer) against values() rows -> "
+        "measurement_rows() -> ORJSONRenderer. With --device the rows come from "
+        "the database (fetch included); otherwise in-memory synthetic rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--device", help="device code to read from (default: synthetic rows)")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        n, repeat = max(1, opts["rows"]), max(1, opts["repeat"])
+
+        if opts["device"]:
+            device = Device.objects.filter(code=opts["device"]).first()
+            if device is None:
+                raise CommandError(f"Unknown device {opts['device']!r}")
+            qs = Measurement.objects.using(db_for_device(device)).filter(device=device).order_by("-ts", "-id")
+            n = min(n, qs.count())
+
+            # the per-row device.code lookup is part of the old path's cost
+            def old():
+                return JSONRenderer().render(MeasurementSerializer(list(qs[:n]), many=True).data)
+
+            def new():
+                return ORJSONRenderer().render(measurement_rows(list(qs.values(*MEASUREMENT_VALUES)[:n])))
+        else:
+            device = Device(id=0, code="bench-device")
+            now = timezone.now()
+            instances = [
+                Measurement(
+                    id=i, device=device, ts=now - timedelta(seconds=30 * i),
+                    temp_c=round(random.uniform(2, 8), 1), humidity=round(random.uniform(30, 60), 1),
+                    state="NORMAL",
+                )
+                for i in range(n)
+            ]
+            values = [{f: getattr(m, f) for f in MEASUREMENT_VALUES} for m in instances]
+
+            def old():
+                return JSONRenderer().render(MeasurementSerializer(instances, many=True).data)
+
+            def new():
+                # same projection as measurement_rows(), minus its one device lookup
+                rows = [
+                    {"id": r["id"], "deviceCode": device.code, "ts": r["ts"], "temp_c": r["temp_c"],
+                     "humidity": r["humidity"], "state": r["state"]}
+                    for r in values
+                ]
+                return ORJSONRenderer().render(rows)
+
+        old_ms = _median_ms(old, repeat)
+        new_ms = _median_ms(new, repeat)
+        same = old() == new()
+        self.stdout.write(f"[render] rows={n} source={'db' if opts['device'] else 'synthetic'} repeat={repeat}")
+        self.stdout.write(f"[render] serializer + JSONRenderer : {old_ms:9.1f} ms")
+        self.stdout.write(f"[render] values + ORJSONRenderer   : {new_ms:9.1f} ms")
+        self.stdout.write(f"[render] identical output: {same}")
+        self.stdout.write(self.style.SUCCESS(f"[render] speedup x{old_ms / new_ms:.1f}" if new_ms else "[render] done"))
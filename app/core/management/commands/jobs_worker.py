@@ -0,0 +1,61 @@
+# core/management/commands/jobs_worker.py
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.export_jobs import expire_export_jobs, max_concurrency, run_pending_export_jobs
+from core.imports import run_pending_import_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued bulk-data jobs: ExportJobs (POST /api/exports, up to EXPORT_JOB_CONCURRENCY "
+        "at once, resuming interrupted ones, deleting files past their expiry) and large CSV "
+        "ImportJobs (one at a time)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=float, default=5.0, help="seconds between queue checks")
+        parser.add_argument("--drain", action="store_true", help="process every pending job, expire files and exit")
+
+    def handle(self, *args, **opts):
+        log = lambda msg: self.stdout.write(msg)
+
+        def _loop(name, drain_queue):
+            while True:
+                try:
+                    close_old_connections()
+                    drain_queue(log=log)
+                except Exception as e:
+                    print(f"[{name}] error: {e}", flush=True)
+                if opts["drain"]:
+                    return
+                time.sleep(opts["poll"])
+
+        slots = max_concurrency()
+        threads = [
+            threading.Thread(target=_loop, args=("export", run_pending_export_jobs), daemon=True, name=f"export-{i}")
+            for i in range(slots)
+        ]
+        threads.append(threading.Thread(target=_loop, args=("import", run_pending_import_jobs), daemon=True,
+                                        name="import"))
+        self.stdout.write(f"[jobs] worker started, {slots} export slot(s), 1 import slot")
+        for t in threads:
+            t.start()
+
+        if opts["drain"]:
+            for t in threads:
+                t.join()
+            n = expire_export_jobs(log=log)
+            self.stdout.write(self.style.SUCCESS(f"[jobs] queues drained, {n} export file(s) expired"))
+            return
+
+        while True:
+            try:
+                close_old_connections()
+                expire_export_jobs(log=log)
+            except Exception as e:
+                print(f"[export] expiry error: {e}", flush=True)
+            time.sleep(60)
@@ -0,0 +1,94 @@
+# core/management/commands/measurement_storage_report.py
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from core.models import Device, Measurement
+
+TABLE = Measurement._meta.db_table
+
+
+def _mb(n) -> str:
+    return f"{(n or 0) / (1024 * 1024):.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Report core_measurement table/index sizes and time a device range scan. "
+        "Run once before and once after the compact-layout migration to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--device", help="device code for the range scan (default: newest device)")
+        parser.add_argument("--days", type=int, default=30, help="range scan window in days (default 30)")
+        parser.add_argument("--repeat", type=int, default=5, help="range scan repetitions (default 5)")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **opts):
+        alias = opts["database"]
+        conn = connections[alias]
+
+        if conn.vendor == "postgresql":
+            self._sizes(conn)
+        else:
+            self.stdout.write(self.style.WARNING(f"[storage] size report needs PostgreSQL (got {conn.vendor})"))
+
+        self._range_scan(alias, opts["device"], opts["days"], max(1, opts["repeat"]))
+
+    def _sizes(self, conn):
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT pg_relation_size(%s), pg_indexes_size(%s), pg_total_relation_size(%s), "
+                "(SELECT reltuples FROM pg_class WHERE oid = %s::regclass)",
+                [TABLE, TABLE, TABLE, TABLE],
+            )
+            heap, indexes, total, tuples = cur.fetchone()
+            cur.execute(
+                "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes "
+                "WHERE relname = %s ORDER BY indexrelname",
+                [TABLE],
+            )
+            per_index = cur.fetchall()
+            cur.execute(f"SELECT AVG(pg_column_size(t.*)) FROM (SELECT * FROM {TABLE} LIMIT 10000) t")
+            avg_row = cur.fetchone()[0]
+
+        tuples = max(tuples or 0, 0)
+        self.stdout.write(f"[storage] rows≈{int(tuples)}")
+        self.stdout.write(f"[storage] heap={_mb(heap)} indexes={_mb(indexes)} total={_mb(total)}")
+        if tuples:
+            self.stdout.write(f"[storage] heap bytes/row≈{heap / tuples:.1f} avg tuple={float(avg_row or 0):.1f} B")
+        for name, size in per_index:
+            self.stdout.write(f"[storage]   index {name}: {_mb(size)}")
+
+    def _range_scan(self, alias, code, days, repeat):
+        if code:
+            device = Device.objects.get(code=code)
+        else:
+            device = Device.objects.order_by("-id").first()
+            if device is None:
+                self.stdout.write(self.style.WARNING("[storage] no devices; skipping range scan"))
+                return
+
+        to = timezone.now()
+        frm = to - timedelta(days=days)
+        qs = (
+            Measurement.objects.using(alias)
+            .filter(device=device, ts__gte=frm, ts__lte=to)
+            .order_by("ts")
+            .values_list("ts", "temp_c", "humidity", "state")
+        )
+
+        timings, rows = [], 0
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            rows = len(list(qs))
+            timings.append((time.perf_counter() - t0) * 1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[storage] range scan {device.code} last {days}d: rows={rows} "
+            f"median={statistics.median(timings):.1f} ms min={min(timings):.1f} ms (n={repeat})"
+        ))
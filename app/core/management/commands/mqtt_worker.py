@@ -2,25 +2,36 @@
 import json, os, sys, time, threading
 from datetime import datetime, timezone as dt_timezone
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction, close_old_connections
 
 from paho.mqtt import client as mqtt
 
+from core import credentials, ingest, ratelimit
 from core.serializers import IngestMeasurementSerializer
 from core.alerts import on_violation, on_recovery
 from core.reminders import send_open_ticket_reminders
+from core.reclassify import run_pending_reclassify_jobs
+from core.live import prune as prune_live_events
+from core.models import Measurement
+from core.sharding import db_for_site
 
 MQTT_HOST = os.getenv("MQTT_HOST", "localhost")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
 MQTT_TOPIC = os.getenv("MQTT_TOPIC", "coldchain/+/telemetry")
 
 _reminder_started = False  # guard: ensure only one background loop
+_reclassify_started = False
+RECLASSIFY_POLL_S = int(os.getenv("RECLASSIFY_POLL_S", "15"))
+
+_last_signed = {}  # code -> ts of the newest signed reading this worker stored
 
 
 def _start_reminder_thread():
     """
-    Background loop that calls send_open_ticket_reminders() every 60s.
+    Background loop that calls send_open_ticket_reminders() (and prunes the
+    live-event log) every 60s.
     Runs inside this process (daemon thread), no Celery required.
     """
     def _loop():
@@ -29,6 +40,7 @@ def _start_reminder_thread():
                 # recycle stale DB connections in long-lived loops
                 close_old_connections()
                 send_open_ticket_reminders()
+                prune_live_events()
             except Exception as e:
                 print(f"[reminder] error: {e}", flush=True)
             time.sleep(60)
@@ -38,16 +50,36 @@ def _start_reminder_thread():
     return t
 
 
-def _normalize_ts_inplace(d: dict):
+def _start_reclassify_thread():
+    """
+    Background loop draining ReclassifyJob (threshold corrections).
+    Jobs are chunked + throttled, so ingest on this process keeps flowing.
+    """
+    def _loop():
+        while True:
+            try:
+                close_old_connections()
+                run_pending_reclassify_jobs()
+            except Exception as e:
+                print(f"[reclassify] error: {e}", flush=True)
+            time.sleep(RECLASSIFY_POLL_S)
+
+    t = threading.Thread(target=_loop, daemon=True, name="reclassify-thread")
+    t.start()
+    return t
+
+
+def _normalize_ts_inplace(d: dict, *, fill: bool = True):
     """
     Accept:
       - ISO8601 string
       - integer/float epoch seconds or milliseconds
-      - missing -> fill now (UTC)
+      - missing -> fill now (UTC), or None with fill=False
     Mutates d["ts"] into ISO 8601 (Z).
     """
+    now = datetime.now(dt_timezone.utc).isoformat() if fill else None
     if "ts" not in d or d["ts"] in (None, "", 0):
-        d["ts"] = datetime.now(dt_timezone.utc).isoformat()
+        d["ts"] = now
         return
 
     ts = d["ts"]
@@ -73,15 +105,49 @@ def _normalize_ts_inplace(d: dict):
             return
         except Exception:
             # fallback to now to avoid serializer errors
-            d["ts"] = datetime.now(dt_timezone.utc).isoformat()
+            d["ts"] = now
             return
 
 
+def _signed_ts_error(cred, ts) -> str | None:
+    """
+    Why a signed reading is refused as a possible replay, or None. The
+    signature covers its ts, so the ts must be there, within
+    MQTT_MAX_SKEW_S of now, newer than the device's last signed reading and
+    not stored yet.
+    """
+    if ts is None:
+        return "signed message without a valid ts"
+    skew = abs((ts - datetime.now(dt_timezone.utc)).total_seconds())
+    if skew > float(getattr(settings, "MQTT_MAX_SKEW_S", 300)):
+        return "ts outside the accepted window"
+    last = _last_signed.get(cred.code)
+    if last is not None and ts <= last:
+        return "ts not newer than the last signed reading"
+    if Measurement.objects.using(db_for_site(cred.site)).filter(device_id=cred.device_id, ts=ts).exists():
+        return "reading already stored"
+    return None
+
+
+def _temp_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ts_or_none(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class Command(BaseCommand):
     help = "MQTT consumer: subscribes to telemetry, ingests measurements, triggers alerts, runs reminders."
 
     def handle(self, *args, **options):
-        global _reminder_started
+        global _reminder_started, _reclassify_started
 
         print(f"[mqtt_worker] starting… host={MQTT_HOST} port={MQTT_PORT} topic={MQTT_TOPIC}", flush=True)
 
@@ -91,6 +157,11 @@ class Command(BaseCommand):
             _start_reminder_thread()
             _reminder_started = True
 
+        if not _reclassify_started:
+            print("[mqtt_worker] launching reclassify thread…", flush=True)
+            _start_reclassify_thread()
+            _reclassify_started = True
+
         # ----- set up MQTT client -----
         client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="coldchain-django-worker")
 
@@ -106,7 +177,34 @@ class Command(BaseCommand):
                 print(f"[mqtt_worker] message topic={msg.topic} payload={payload}", flush=True)
 
                 data = json.loads(payload)
-                _normalize_ts_inplace(data)
+
+                # device signature: checked in memory, before any DB work
+                signed, sig = credentials.split_signed_json(msg.payload)
+                data.pop("sig", None)
+                cred = None
+                if sig is not None:
+                    cred = credentials.verify_signature(str(data.get("deviceId", "")), signed, sig)
+                    if cred is None:
+                        print(f"[mqtt_worker] rejected: bad signature for {data.get('deviceId')!r}", flush=True)
+                        return
+                elif credentials.required():
+                    print(f"[mqtt_worker] rejected: unsigned message for {data.get('deviceId')!r}", flush=True)
+                    return
+                elif refused := ingest.device_error(str(data.get("deviceId", ""))):
+                    print(f"[mqtt_worker] rejected {data.get('deviceId')!r}: {refused}", flush=True)
+                    return
+
+                # a signed message keeps the ts it was signed with, or is refused
+                _normalize_ts_inplace(data, fill=cred is None)
+                if cred is not None and (replay := _signed_ts_error(cred, _ts_or_none(data["ts"]))):
+                    print(f"[mqtt_worker] rejected: {replay} for {cred.code!r}", flush=True)
+                    return
+
+                # flood protection: in memory too; violating readings always pass
+                if not ratelimit.admit(str(data.get("deviceId", "")), temp_c=_temp_or_none(data.get("tempC")),
+                                       ts=_ts_or_none(data.get("ts"))):
+                    print(f"[mqtt_worker] rate-limited {data.get('deviceId')!r}", flush=True)
+                    return
 
                 # Validate & save
                 ser = IngestMeasurementSerializer(data=data)
@@ -114,6 +212,8 @@ class Command(BaseCommand):
 
                 with transaction.atomic():
                     m = ser.save()
+                if cred is not None:
+                    _last_signed[cred.code] = m.ts
 
                 print(f"[mqtt_worker] ingested {m.device.code} {m.temp_c}C state={m.state}", flush=True)
 
@@ -129,6 +229,8 @@ class Command(BaseCommand):
 
             except Exception as e:
                 print(f"[mqtt_worker] error: {e}", flush=True)
+            finally:
+                ratelimit.maybe_flush()
 
         def on_disconnect(cli, userdata, disconnect_flags, reason_code, properties=None):
             rc_val = getattr(reason_code, "value", reason_code)
@@ -0,0 +1,48 @@
+# core/management/commands/reclassify_measurements.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from core.models import Device
+from core.reclassify import claim_job, enqueue_reclassify, run_reclassify_job, run_pending_reclassify_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Measurement.state from the device's current min_temp/max_temp. "
+        "Queues a job for the mqtt_worker, or runs it here with --now."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--device", help="device code (omit with --drain to process the queue)")
+        parser.add_argument("--from", dest="frm", help="ISO 8601 start (default: all history)")
+        parser.add_argument("--to", help="ISO 8601 end (default: now)")
+        parser.add_argument("--now", action="store_true", help="run in this process instead of queueing")
+        parser.add_argument("--drain", action="store_true", help="process every pending/interrupted job and exit")
+
+    def handle(self, *args, **opts):
+        log = lambda msg: self.stdout.write(msg)
+
+        if opts["drain"]:
+            n = run_pending_reclassify_jobs(log=log)
+            self.stdout.write(self.style.SUCCESS(f"[reclassify] processed {n} job(s)"))
+            return
+
+        if not opts["device"]:
+            raise CommandError("--device is required (or use --drain)")
+        try:
+            device = Device.objects.get(code=opts["device"])
+        except Device.DoesNotExist:
+            raise CommandError(f"device {opts['device']!r} not found")
+
+        frm = parse_datetime(opts["frm"]) if opts["frm"] else None
+        to = parse_datetime(opts["to"]) if opts["to"] else None
+        job = enqueue_reclassify(device, frm=frm, to=to, reason="manual")
+
+        if opts["now"]:
+            if not claim_job(job):
+                raise CommandError(f"job #{job.id} is already being run by a worker")
+            job = run_reclassify_job(job, log=log)
+            style = self.style.SUCCESS if job.status == "DONE" else self.style.ERROR
+            self.stdout.write(style(f"[reclassify] job #{job.id} {job.status}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"[reclassify] job #{job.id} queued"))
@@ -3,7 +3,8 @@ import requests
 from django.conf import settings
 from django.utils import timezone
 from django.core.management.base import BaseCommand
-from core.models import Ticket, Measurement
+from core import counters, live, watermarks
+from core.models import Ticket
 from core.utils import send_telegram_message
 
 API = "https://api.telegram.org/bot{token}/{method}"
@@ -16,6 +17,9 @@ def _ack_ticket(ticket_id: int, by: str) -> dict:
         t.acked_at = timezone.now()
         t.attempt_count = 0
         t.save()
+        counters.sync_tickets(t.device_id)
+        watermarks.touch(t.device_id, tickets=True)
+        live.publish_ticket(t, "acked")
         return {"ok": True, "ticketId": t.id, "acked_by": t.acked_by, "acked_at": t.acked_at}
     except Ticket.DoesNotExist:
         return {"ok": False, "error": f"OPEN ticket {ticket_id} not found"}
@@ -56,7 +60,7 @@ def _process_update(update):
         lines = ["📊 *Open tickets:*"]
         now_dt = timezone.now()
         for t in qs[:10]:
-            latest = Measurement.objects.filter(device=t.device).order_by("-ts").first()
+            latest = t.device.measurements.order_by("-ts").first()
             temp = f"{latest.temp_c:.1f}°C" if latest and latest.temp_c is not None else "—"
             hum  = f"{latest.humidity:.0f}%" if latest and latest.humidity is not None else "—"
             age_minutes = int((now_dt - t.opened_at).total_seconds() // 60)
@@ -74,7 +78,7 @@ def _process_update(update):
             res = _ack_ticket(int(parts[1]), sender_name)
             if res.get("ok"):
                 t = Ticket.objects.get(id=res["ticketId"])
-                latest = Measurement.objects.filter(device=t.device).order_by("-ts").first()
+                latest = t.device.measurements.order_by("-ts").first()
                 temp_txt = f"{latest.temp_c:.1f}°C" if latest and latest.temp_c is not None else "—"
                 send_telegram_message(
                     chat_id,
@@ -0,0 +1,255 @@
+# core/management/commands/udp_listener.py
+import asyncio
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+try:
+    import uvloop
+except ImportError:  # stock asyncio loop
+    uvloop = None
+
+from core import credentials, datagram, ratelimit
+from core.alerts import on_readings
+from core.ingest import store_valid
+from core.models import Measurement
+
+_TEMP_FIELD = Measurement._meta.get_field("temp_c")
+_HUM_FIELD = Measurement._meta.get_field("humidity")
+
+
+def _setting(name, default):
+    return type(default)(getattr(settings, name, default))
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, listener):
+        self.listener = listener
+
+    def connection_made(self, transport):
+        self.listener.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.listener.receive(data, addr)
+
+
+class Listener:
+    """
+    Verifies datagrams on the event loop (struct + HMAC, no DB), queues the
+    good ones and hands them to one DB thread in batches: every
+    UDP_FLUSH_MS, or sooner once UDP_BATCH_MAX are waiting. Acks go out
+    after the batch commits, so an acked reading is stored. Readings are
+    keyed by (device, ts): a retry, or a replayed datagram, is answered
+    "duplicate" whether its reading is still queued, was stored by an
+    earlier batch or is found in the database.
+    """
+
+    def __init__(self, *, log):
+        self.log = log
+        self.missed = False  # datagrams from codes not in the credential table since the last reload
+        self.batch_max = max(1, _setting("UDP_BATCH_MAX", 2000))
+        self.flush_s = _setting("UDP_FLUSH_MS", 200) / 1000
+        self.max_pending = _setting("UDP_MAX_PENDING", 50000)
+        self.max_skew = _setting("UDP_MAX_SKEW_S", 86400)
+        self.acks = _setting("UDP_ACK", True)
+        self.transport = None
+        self.pending = []
+        self.flushing = None
+        self.seen = {}  # code -> recent stored ts, to answer retries without a query
+        self.stats = collections.Counter()
+        self.db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="udp-db")
+
+    # ---- event loop side ----
+
+    def _key_for(self, code):
+        cred = credentials.lookup(code, load=False)
+        if cred is None:
+            self.missed = True
+            return None
+        return cred.key
+
+    def _ack(self, key, status, seq, ts, addr):
+        if self.acks and self.transport is not None:
+            self.transport.sendto(datagram.encode_ack(key, status, seq, ts), addr)
+
+    def receive(self, data, addr):
+        self.stats["received"] += 1
+        try:
+            code, ts, temp, hum, seq, wants_ack, key = datagram.decode_reading(data, self._key_for)
+        except datagram.DatagramError as e:
+            self.stats[str(e) if str(e) in ("bad signature", "unknown device") else "malformed"] += 1
+            return
+
+        # a signed ts is what makes a replay recognisable: a reading without one is refused
+        if (
+            ts == 0
+            or abs(ts - time.time()) > self.max_skew
+            or not _TEMP_FIELD.min_value <= temp <= _TEMP_FIELD.max_value
+            or (hum is not None and not _HUM_FIELD.min_value <= hum <= _HUM_FIELD.max_value)
+        ):
+            self.stats["rejected"] += 1
+            if wants_ack:
+                self._ack(key, datagram.ACK_REJECTED, seq, ts, addr)
+            return
+        if ts in self.seen.get(code, ()):
+            self.stats["duplicate"] += 1
+            if wants_ack:
+                self._ack(key, datagram.ACK_DUPLICATE, seq, ts, addr)
+            return
+        if not ratelimit.admit(code, temp_c=temp, ts=ts, load=False):
+            self.stats["limited"] += 1
+            if wants_ack:
+                self._ack(key, datagram.ACK_LIMITED, seq, ts, addr)
+            return
+        if len(self.pending) >= self.max_pending:
+            self.stats["dropped"] += 1  # DB behind: no ack, the sensor retries
+            return
+
+        self.pending.append((code, ts, temp, hum, seq, key, addr if wants_ack else None))
+        if len(self.pending) >= self.batch_max and self.flushing is None:
+            self.flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        try:
+            while self.pending:
+                batch, self.pending = self.pending[:self.batch_max], self.pending[self.batch_max:]
+                entries, keep = [], {}
+                for i, (code, ts, temp, hum, *_rest) in enumerate(batch):
+                    # a retry inside the same batch, or of a reading an earlier batch stored
+                    # while this one was queued
+                    if (code, ts) in keep or ts in self.seen.get(code, ()):
+                        continue
+                    keep[(code, ts)] = i
+                    entries.append((i, {
+                        "deviceId": code,
+                        "ts": datetime.fromtimestamp(ts, tz=dt_timezone.utc),
+                        "tempC": temp,
+                        "humidity": hum,
+                    }))
+                try:
+                    stored = (
+                        await asyncio.get_running_loop().run_in_executor(self.db, self._store, entries)
+                        if entries else {}
+                    )
+                except Exception as e:
+                    self.stats["failed"] += len(batch)
+                    self.log(f"[udp] batch of {len(batch)} failed: {e}")
+                    continue
+                self.stats["stored"] += len(stored)
+                self.stats["duplicate"] += len(batch) - len(stored)
+
+                for i, (code, ts, temp, hum, seq, key, addr) in enumerate(batch):
+                    if keep.get((code, ts)) == i:
+                        # stored now, or found already stored
+                        self.seen.setdefault(code, collections.deque(maxlen=64)).append(ts)
+                    if addr is not None:
+                        status = datagram.ACK_STORED if i in stored else datagram.ACK_DUPLICATE
+                        self._ack(key, status, seq, ts, addr)
+        finally:
+            self.flushing = None
+
+    async def run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_s)
+            if self.pending and self.flushing is None:
+                self.flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    async def run_credentials(self):
+        """Reload the credential table on the DB thread: every TTL, sooner after unknown codes."""
+        loop = asyncio.get_running_loop()
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(credentials.miss_reload())
+            if self.missed or time.monotonic() - last >= credentials.ttl():
+                self.missed = False
+                try:
+                    await loop.run_in_executor(self.db, self._refresh_credentials)
+                    last = time.monotonic()
+                except Exception as e:
+                    self.log(f"[udp] credential reload failed: {e}")
+
+    async def run_ratelimit_stats(self):
+        """Add the rate limiter's tallies to IngestRateStat on the DB thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(float(getattr(settings, "RATE_LIMIT_FLUSH_S", 30)))
+            try:
+                await loop.run_in_executor(self.db, self._flush_ratelimit)
+            except Exception as e:
+                self.log(f"[udp] rate limit stats flush failed: {e}")
+
+    async def run_stats(self, every: float):
+        while True:
+            await asyncio.sleep(every)
+            if self.stats:
+                self.log("[udp] " + " ".join(f"{k}={v}" for k, v in sorted(self.stats.items()))
+                         + f" pending={len(self.pending)}")
+                self.stats.clear()
+
+    # ---- DB thread ----
+
+    def _refresh_credentials(self):
+        close_old_connections()
+        credentials.refresh()
+
+    def _flush_ratelimit(self):
+        close_old_connections()
+        ratelimit.flush_stats()
+
+    def _store(self, entries):
+        """Same pipeline as mqtt_worker: readings, tickets, then the alert hooks once per device."""
+        close_old_connections()
+        stored, touched = store_valid(entries, skip_stored=True)
+        for device, states in touched.items():
+            try:
+                on_readings(device, states)
+            except Exception as e:
+                self.log(f"[udp] alert handling error for {device.code}: {e}")
+        return stored
+
+
+class Command(BaseCommand):
+    help = (
+        "UDP ingest for constrained sensors: signed one-reading datagrams (see core.datagram), "
+        "written in batches through the same ingest/alert pipeline as mqtt_worker, optional acks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default=getattr(settings, "UDP_INGEST_HOST", "0.0.0.0"))
+        parser.add_argument("--port", type=int, default=int(getattr(settings, "UDP_INGEST_PORT", 5684)))
+        parser.add_argument("--stats", type=float, default=60.0, help="seconds between counter log lines")
+
+    def handle(self, *args, **opts):
+        if not credentials.master_key():
+            raise CommandError("DEVICE_KEY_MASTER is not set")
+        log = lambda msg: print(msg, flush=True)
+        listener = Listener(log=log)
+
+        async def _main():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(listener.db, listener._refresh_credentials)
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _Protocol(listener), local_addr=(opts["host"], opts["port"])
+            )
+            log(f"[udp] listening on {opts['host']}:{opts['port']} "
+                f"(batch {listener.batch_max}, flush {int(listener.flush_s * 1000)} ms, "
+                f"acks {'on' if listener.acks else 'off'})")
+            try:
+                await asyncio.gather(
+                    listener.run_flusher(), listener.run_credentials(), listener.run_ratelimit_stats(),
+                    listener.run_stats(opts["stats"]),
+                )
+            finally:
+                transport.close()
+
+        if uvloop is not None:
+            uvloop.install()
+        try:
+            asyncio.run(_main())
+        except KeyboardInterrupt:
+            log("[udp] stopping…")
@@ -0,0 +1,16 @@
+# core/middleware.py
+from django.middleware.gzip import GZipMiddleware
+
+
+# Server-Sent Events: gzip buffers small writes, which would hold events back;
+# the rest are already compressed downloads
+SKIP_CONTENT_TYPES = ("text/event-stream", "application/gzip", "application/vnd.apache.parquet")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """gzip negotiated through Accept-Encoding (Django's GZipMiddleware), minus SKIP_CONTENT_TYPES."""
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith(SKIP_CONTENT_TYPES):
+            return response
+        return super().process_response(request, response)
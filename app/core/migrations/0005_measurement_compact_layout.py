@@ -0,0 +1,303 @@
+# Compact Measurement row layout:
+#   state    varchar(10) -> smallint code (NORMAL=0, SEVERE=1, CRITICAL=2)
+#   temp_c   float8      -> smallint (°C * 10)
+#   humidity float8      -> smallint (%  * 10)
+#
+# PostgreSQL: online copy into a new, column-ordered table in id chunks
+# (each chunk commits on its own, so ingest keeps running). Triggers log the
+# ids of rows written to the old table meanwhile; each chunk re-copies the
+# logged rows already copied, and the short locked section only applies what
+# the log gathered since, copies the tail and swaps tables. Interrupted runs
+# resume from the last copied id; a run interrupted after the swap only
+# finishes the constraint steps.
+# Other backends (SQLite dev DBs): values are converted in place, chunk by
+# chunk, with the last converted id kept in a progress table.
+
+import os
+import time
+
+import core.models.fields
+from django.db import migrations, transaction
+
+CHUNK = int(os.getenv("COMPACT_MIGRATION_CHUNK", "50000"))
+PAUSE_S = float(os.getenv("COMPACT_MIGRATION_PAUSE_S", "0.05"))
+
+OLD = "core_measurement"
+NEW = "core_measurement_compact"
+LOG = "core_measurement_compact_log"
+DELTA = "core_measurement_compact_delta"
+PROGRESS = "core_measurement_compact_progress"
+
+# Rows imported without a state (legacy CSV import) are classified from the
+# device thresholds, same rule as core.utils.classify_state (margin 5.0).
+STATE_SQL = """
+    CASE m.state
+        WHEN 'NORMAL' THEN 0
+        WHEN 'SEVERE' THEN 1
+        WHEN 'CRITICAL' THEN 2
+        ELSE CASE
+            WHEN m.temp_c < d.min_temp - 5 OR m.temp_c > d.max_temp + 5 THEN 2
+            WHEN m.temp_c < d.min_temp OR m.temp_c > d.max_temp THEN 1
+            ELSE 0
+        END
+    END
+"""
+
+
+def _scaled(col):
+    return f"LEAST(GREATEST(ROUND(m.{col} * 10), -32768), 32767)"
+
+
+def _copy_sql(where):
+    return f"""
+        INSERT INTO {NEW} (id, ts, device_id, state, temp_c, humidity)
+        SELECT m.id, m.ts, m.device_id, {STATE_SQL}, {_scaled("temp_c")}, {_scaled("humidity")}
+        FROM {OLD} m JOIN core_device d ON d.id = m.device_id
+        WHERE {where}
+    """
+
+
+COPY_SQL = _copy_sql("m.id > %s AND m.id <= %s")
+
+# Statement-level, so a batch insert logs its ids in one INSERT ... SELECT.
+LOG_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION {LOG}_fn() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO {LOG} (id) SELECT id FROM old_rows;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {LOG} (id) SELECT id FROM new_rows;
+        END IF;
+        RETURN NULL;
+    END $$
+"""
+LOG_TRIGGERS = {
+    "ins": "INSERT REFERENCING NEW TABLE AS new_rows",
+    "upd": "UPDATE REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "del": "DELETE REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def _scalar(cursor, sql, params=None):
+    cursor.execute(sql, params or [])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _is_compact(cur) -> bool:
+    """Whether core_measurement already has the compact layout (the swap happened)."""
+    return _scalar(cur, """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'state'
+    """, [OLD]) == "smallint"
+
+
+def _start_log(cur):
+    """
+    Log writes to the old table from here on. Without the triggers in place
+    a previous partial copy may have missed changes, so it starts over.
+    """
+    if _scalar(cur, "SELECT 1 FROM pg_trigger WHERE tgname = %s", [f"{LOG}_ins"]):
+        return
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {LOG} (id bigint NOT NULL)")
+    cur.execute(LOG_FUNCTION_SQL)
+    for suffix, event in LOG_TRIGGERS.items():
+        cur.execute(
+            f"CREATE TRIGGER {LOG}_{suffix} AFTER {event} ON {OLD} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {LOG}_fn()"
+        )
+    cur.execute(f"TRUNCATE {NEW}")
+
+
+def _apply_log(cur, last) -> int:
+    """
+    Consume the write log (in the caller's transaction): rows up to `last`
+    are copied again from their current version, deleted ones just go.
+    Later ids are left to the tail copy. Log rows of writers still in
+    flight are not visible yet and stay for the next call.
+    """
+    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {DELTA} (id bigint PRIMARY KEY) ON COMMIT DELETE ROWS")
+    cur.execute(f"""
+        WITH taken AS (DELETE FROM {LOG} RETURNING id)
+        INSERT INTO {DELTA} (id) SELECT DISTINCT id FROM taken WHERE id <= %s
+    """, [last])
+    if not max(cur.rowcount, 0):
+        return 0
+    cur.execute(f"DELETE FROM {NEW} c USING {DELTA} t WHERE c.id = t.id")
+    cur.execute(_copy_sql(f"m.id IN (SELECT id FROM {DELTA})"))
+    return max(cur.rowcount, 0)
+
+
+def _finish_postgres(conn, fk_name):
+    # Validation scans the table but only takes SHARE UPDATE EXCLUSIVE.
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE {OLD} VALIDATE CONSTRAINT {fk_name}")
+        cur.execute(f"ANALYZE {OLD}")
+    print("[migrate] compact layout in place", flush=True)
+
+
+def _forward_postgres(schema_editor):
+    conn = schema_editor.connection
+    alias = conn.alias
+    device_idx = schema_editor._create_index_name(OLD, ["device_id"], suffix="")
+    fk_name = schema_editor._create_index_name(OLD, ["device_id"], suffix="_fk_core_device_id")
+
+    with conn.cursor() as cur:
+        if _is_compact(cur):
+            print("[migrate] compact copy: tables already swapped, finishing constraints", flush=True)
+            _finish_postgres(conn, fk_name)
+            return
+
+    with transaction.atomic(using=alias), conn.cursor() as cur:
+        # 8-byte columns first, smallints last: no alignment padding
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {NEW} (
+                id bigint NOT NULL,
+                ts timestamp with time zone NOT NULL,
+                device_id bigint NOT NULL,
+                state smallint NOT NULL,
+                temp_c smallint NOT NULL,
+                humidity smallint NULL
+            )
+        """)
+        # the log replay deletes by id from the first chunk on
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {NEW}_pkey_idx ON {NEW} (id)")
+        _start_log(cur)
+
+    with conn.cursor() as cur:
+        last = _scalar(cur, f"SELECT COALESCE(MAX(id), 0) FROM {NEW}")
+        high = _scalar(cur, f"SELECT COALESCE(MAX(id), 0) FROM {OLD}")
+
+    print(f"[migrate] compact copy: resume after id={last}, target id={high}, chunk={CHUNK}", flush=True)
+    started = time.monotonic()
+    copied = 0
+    while True:
+        while last < high:
+            upper = min(last + CHUNK, high)
+            with transaction.atomic(using=alias), conn.cursor() as cur:
+                replayed = _apply_log(cur, last)
+                cur.execute(COPY_SQL, [last, upper])
+                copied += max(cur.rowcount, 0)
+            last = upper
+            elapsed = max(time.monotonic() - started, 1e-6)
+            print(
+                f"[migrate] compact copy: id<={last}/{high} rows={copied} replayed={replayed} "
+                f"({copied / elapsed:.0f} rows/s)",
+                flush=True,
+            )
+            if PAUSE_S:
+                time.sleep(PAUSE_S)
+        # rows inserted during the copy: another unlocked pass while they are many
+        with conn.cursor() as cur:
+            high = _scalar(cur, f"SELECT COALESCE(MAX(id), 0) FROM {OLD}")
+        if high - last <= CHUNK:
+            break
+
+    # Indexes are built before the swap so the locked section stays short.
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {NEW}_device_ts_idx ON {NEW} (device_id, ts)")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {NEW}_state_ts_idx ON {NEW} (state, ts)")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {NEW}_device_idx ON {NEW} (device_id)")
+    with transaction.atomic(using=alias), conn.cursor() as cur:
+        replayed = _apply_log(cur, last)
+    print(f"[migrate] compact copy: replayed={replayed} before locking", flush=True)
+
+    with transaction.atomic(using=alias), conn.cursor() as cur:
+        # Block writers (readers continue) while the writes logged since the
+        # last replay and the tail are copied.
+        cur.execute(f"LOCK TABLE {OLD} IN SHARE ROW EXCLUSIVE MODE")
+        replayed = _apply_log(cur, last)
+        cur.execute(COPY_SQL, [last, 2**63 - 1])
+        print(f"[migrate] compact copy: catch-up rows={max(cur.rowcount, 0)} replayed={replayed}", flush=True)
+
+        cur.execute(f"DROP TABLE {OLD}")
+        cur.execute(f"DROP TABLE {LOG}")
+        cur.execute(f"DROP FUNCTION {LOG}_fn()")
+        cur.execute(f"ALTER TABLE {NEW} RENAME TO {OLD}")
+        cur.execute(f"ALTER TABLE {OLD} ADD CONSTRAINT {OLD}_pkey PRIMARY KEY USING INDEX {NEW}_pkey_idx")
+        cur.execute(f"ALTER INDEX {NEW}_device_ts_idx RENAME TO core_measur_device__97ee8b_idx")
+        cur.execute(f"ALTER INDEX {NEW}_state_ts_idx RENAME TO core_measur_state_61745b_idx")
+        cur.execute(f"ALTER INDEX {NEW}_device_idx RENAME TO {device_idx}")
+        cur.execute(f"ALTER TABLE {OLD} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('{OLD}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {OLD}"
+        )
+        cur.execute(
+            f"ALTER TABLE {OLD} ADD CONSTRAINT {fk_name} FOREIGN KEY (device_id) "
+            f"REFERENCES core_device (id) DEFERRABLE INITIALLY DEFERRED NOT VALID"
+        )
+
+    _finish_postgres(conn, fk_name)
+
+
+def _forward_generic(schema_editor):
+    conn = schema_editor.connection
+    # Progress commits with each chunk: a re-run never scales a row twice.
+    with transaction.atomic(using=conn.alias), conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {PROGRESS} (last_id bigint NOT NULL, high bigint NOT NULL)")
+        cur.execute(f"SELECT last_id, high FROM {PROGRESS}")
+        row = cur.fetchone()
+        if row is None:
+            low = _scalar(cur, f"SELECT COALESCE(MIN(id), 0) FROM {OLD}")
+            high = _scalar(cur, f"SELECT COALESCE(MAX(id), 0) FROM {OLD}")
+            cur.execute(f"INSERT INTO {PROGRESS} (last_id, high) VALUES (%s, %s)", [low - 1, high])
+            last = low - 1
+        else:
+            last, high = row
+    while last < high:
+        upper = min(last + CHUNK, high)
+        with transaction.atomic(using=conn.alias), conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE {OLD} SET
+                    state = (SELECT {STATE_SQL} FROM {OLD} m JOIN core_device d ON d.id = m.device_id
+                             WHERE m.id = {OLD}.id),
+                    temp_c = ROUND(temp_c * 10),
+                    humidity = ROUND(humidity * 10)
+                WHERE id > %s AND id <= %s
+            """, [last, upper])
+            cur.execute(f"UPDATE {PROGRESS} SET last_id = %s", [upper])
+        last = upper
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE {PROGRESS}")
+
+
+def forward(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _forward_postgres(schema_editor)
+    else:
+        _forward_generic(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_device_max_temp_device_min_temp'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(forward, elidable=False),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='measurement',
+                    name='humidity',
+                    field=core.models.fields.ScaledFloatField(blank=True, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='measurement',
+                    name='state',
+                    field=core.models.fields.CompactStateField(choices=[('NORMAL', 'NORMAL'), ('SEVERE', 'SEVERE'), ('CRITICAL', 'CRITICAL')], codes={'CRITICAL': 2, 'NORMAL': 0, 'SEVERE': 1}),
+                ),
+                migrations.AlterField(
+                    model_name='measurement',
+                    name='temp_c',
+                    field=core.models.fields.ScaledFloatField(),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-19 10:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_measurement_compact_layout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReclassifyJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frm', models.DateTimeField(blank=True, null=True)),
+                ('to', models.DateTimeField(blank=True, null=True)),
+                ('reason', models.CharField(blank=True, default='manual', max_length=32)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('DONE', 'DONE'), ('FAILED', 'FAILED')], default='PENDING', max_length=10)),
+                ('cursor_ts', models.DateTimeField(blank=True, null=True)),
+                ('rows_total', models.BigIntegerField(default=0)),
+                ('rows_scanned', models.BigIntegerField(default=0)),
+                ('rows_changed', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reclassify_jobs', to='core.device')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_reclas_status_e40a05_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-19 10:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_reclassifyjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('n', models.IntegerField(default=0)),
+                ('temp_sum', models.FloatField(default=0.0)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('hum_n', models.IntegerField(default=0)),
+                ('hum_sum', models.FloatField(default=0.0)),
+                ('hum_min', models.FloatField(blank=True, null=True)),
+                ('hum_max', models.FloatField(blank=True, null=True)),
+                ('severe_n', models.IntegerField(default=0)),
+                ('critical_n', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket_start'), name='uniq_rollup_device_bucket')],
+            },
+        ),
+    ]
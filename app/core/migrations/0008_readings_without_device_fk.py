@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-19 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_measurementrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='measurement',
+            name='device',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='core.device'),
+        ),
+        migrations.AlterField(
+            model_name='measurementrollup',
+            name='device',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.device'),
+        ),
+    ]
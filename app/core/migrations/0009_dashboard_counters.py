@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_readings_without_device_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceDashboardState',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_state', serialize=False, to='core.device')),
+                ('site', models.CharField(blank=True, default='', max_length=128)),
+                ('last_state', models.CharField(blank=True, default='', max_length=10)),
+                ('last_ts', models.DateTimeField(blank=True, null=True)),
+                ('counted_state', models.CharField(blank=True, default='', max_length=10)),
+                ('open_severe', models.IntegerField(default=0)),
+                ('open_critical', models.IntegerField(default=0)),
+                ('unacked', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=128)),
+                ('name', models.CharField(max_length=64)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'name'), name='uniq_dashboard_counter')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeWatermark',
+            fields=[
+                ('scope', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_changewatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('reading', 'reading'), ('ticket', 'ticket')], max_length=16)),
+                ('device_id', models.BigIntegerField()),
+                ('site', models.CharField(blank=True, default='', max_length=128)),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
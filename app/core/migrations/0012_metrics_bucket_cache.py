@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_liveevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsCacheStat',
+            fields=[
+                ('bucket', models.CharField(max_length=8, primary_key=True, serialize=False)),
+                ('hits', models.BigIntegerField(default=0)),
+                ('misses', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MetricsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('n', models.IntegerField(default=0)),
+                ('temp_avg', models.FloatField(blank=True, null=True)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('hum_avg', models.FloatField(blank=True, null=True)),
+                ('hum_min', models.FloatField(blank=True, null=True)),
+                ('hum_max', models.FloatField(blank=True, null=True)),
+                ('stale', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('device', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket', 'bucket_start'), name='uniq_metrics_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricsBucketCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=8)),
+                ('covered_from', models.DateTimeField(blank=True, null=True)),
+                ('covered_to', models.DateTimeField(blank=True, null=True)),
+                ('device', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket'), name='uniq_metrics_bucket_coverage')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_metrics_bucket_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(blank=True, default='', max_length=128)),
+                ('frm', models.DateTimeField(blank=True, null=True)),
+                ('to', models.DateTimeField(blank=True, null=True)),
+                ('fmt', models.CharField(default='csv', max_length=10)),
+                ('compress', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('DONE', 'DONE'), ('FAILED', 'FAILED'), ('EXPIRED', 'EXPIRED')], default='PENDING', max_length=10)),
+                ('cursor_ts', models.DateTimeField(blank=True, null=True)),
+                ('cursor_id', models.BigIntegerField(blank=True, null=True)),
+                ('cursor_device_id', models.BigIntegerField(blank=True, null=True)),
+                ('rows_total', models.BigIntegerField(default=0)),
+                ('rows_written', models.BigIntegerField(default=0)),
+                ('bytes_written', models.BigIntegerField(default=0)),
+                ('path', models.CharField(blank=True, default='', max_length=255)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='core.device')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_export_status_2ad959_idx')],
+            },
+        ),
+    ]
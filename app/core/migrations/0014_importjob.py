@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(blank=True, default='', max_length=255)),
+                ('path', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('DONE', 'DONE'), ('FAILED', 'FAILED')], default='PENDING', max_length=10)),
+                ('stage', models.CharField(choices=[('queued', 'queued'), ('parse', 'parse'), ('merge', 'merge'), ('aggregates', 'aggregates'), ('done', 'done')], default='queued', max_length=16)),
+                ('bytes_total', models.BigIntegerField(default=0)),
+                ('bytes_read', models.BigIntegerField(default=0)),
+                ('rows_read', models.BigIntegerField(default=0)),
+                ('inserted', models.BigIntegerField(default=0)),
+                ('skipped_duplicates', models.BigIntegerField(default=0)),
+                ('error_count', models.BigIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('devices_total', models.IntegerField(default=0)),
+                ('devices_done', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_import_status_6f3c45_idx')],
+            },
+        ),
+    ]
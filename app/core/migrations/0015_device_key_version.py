@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='key_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
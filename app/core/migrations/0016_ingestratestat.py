@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_device_key_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRateStat',
+            fields=[
+                ('code', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('site', models.CharField(blank=True, default='', max_length=128)),
+                ('accepted', models.BigIntegerField(default=0)),
+                ('limited', models.BigIntegerField(default=0)),
+                ('bypassed', models.BigIntegerField(default=0)),
+                ('last_limited_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_ingestratestat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('n', models.IntegerField(default=0)),
+                ('arrhenius_sum', models.FloatField(default=0.0)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('observed_s', models.FloatField(default=0.0)),
+                ('out_of_range_s', models.FloatField(default=0.0)),
+                ('last_ts', models.DateTimeField(blank=True, null=True)),
+                ('last_out', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('device', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'day'), name='uniq_compliance_device_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_complianceday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Excursion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_ts', models.DateTimeField()),
+                ('end_ts', models.DateTimeField(blank=True, null=True)),
+                ('last_ts', models.DateTimeField()),
+                ('duration_s', models.FloatField(default=0.0)),
+                ('readings', models.IntegerField(default=0)),
+                ('peak_temp', models.FloatField()),
+                ('max_severity', models.CharField(max_length=10)),
+                ('device', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.device')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start_ts', 'id'], name='core_excurs_start_t_88e10b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'start_ts'), name='uniq_excursion_device_start')],
+            },
+        ),
+    ]
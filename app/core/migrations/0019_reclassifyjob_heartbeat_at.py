@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_excursion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reclassifyjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,3 +2,17 @@ from core.models.device import Device
 from core.models.measurement import Measurement
 from core.models.alertrule import AlertRule
 from core.models.ticket import Ticket
+from core.models.reclassifyjob import ReclassifyJob
+from core.models.measurementrollup import MeasurementRollup
+from core.models.dashboardcounter import DashboardCounter
+from core.models.devicedashboardstate import DeviceDashboardState
+from core.models.changewatermark import ChangeWatermark
+from core.models.liveevent import LiveEvent
+from core.models.metricsbucket import MetricsBucket
+from core.models.metricsbucketcoverage import MetricsBucketCoverage
+from core.models.metricscachestat import MetricsCacheStat
+from core.models.exportjob import ExportJob
+from core.models.importjob import ImportJob
+from core.models.ingestratestat import IngestRateStat
+from core.models.complianceday import ComplianceDay
+from core.models.excursion import Excursion
@@ -2,3 +2,17 @@ from .device import Device
 from .measurement import Measurement
 from .alertrule import AlertRule
 from .ticket import Ticket
+from .reclassifyjob import ReclassifyJob
+from .measurementrollup import MeasurementRollup
+from .dashboardcounter import DashboardCounter
+from .devicedashboardstate import DeviceDashboardState
+from .changewatermark import ChangeWatermark
+from .liveevent import LiveEvent
+from .metricsbucket import MetricsBucket
+from .metricsbucketcoverage import MetricsBucketCoverage
+from .metricscachestat import MetricsCacheStat
+from .exportjob import ExportJob
+from .importjob import ImportJob
+from .ingestratestat import IngestRateStat
+from .complianceday import ComplianceDay
+from .excursion import Excursion
@@ -0,0 +1,17 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ChangeWatermark(models.Model):
+    """
+    Monotonic change counter per scope ("tickets", "device:<id>", "*" for
+    changes to nothing more specific), bumped by ingest / ticket / device
+    writes and turned into ETag + Last-Modified by core.watermarks (which
+    derives "anything changed" from all rows).
+    """
+    scope = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.scope}@{self.version}"
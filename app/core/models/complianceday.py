@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ComplianceDay(models.Model):
+    """
+    One device's compliance figures for one UTC day, kept current at ingest
+    (core.compliance.add_readings) and rebuilt from raw data by
+    backfill_aggregates. Every column is a sum (or min/max), so months and
+    years are merged from days: Mean Kinetic Temperature from the running
+    Arrhenius sum, time out of range from the interval durations.
+    Sharded, next to the readings.
+    """
+    device = models.ForeignKey(
+        "core.Device", on_delete=models.CASCADE, related_name="+", db_constraint=False
+    )
+    day = models.DateField()
+
+    n = models.IntegerField(default=0)
+    arrhenius_sum = models.FloatField(default=0.0)  # sum of exp(-dH/R / T[K]) over the day's readings
+    temp_min = models.FloatField(null=True, blank=True)
+    temp_max = models.FloatField(null=True, blank=True)
+
+    # each reading holds until the next one (at most COMPLIANCE_MAX_GAP_S)
+    observed_s = models.FloatField(default=0.0)
+    out_of_range_s = models.FloatField(default=0.0)
+
+    # the day's newest reading: where ingest picks up the next interval
+    last_ts = models.DateTimeField(null=True, blank=True)
+    last_out = models.BooleanField(default=False)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["device", "day"], name="uniq_compliance_device_day"),
+        ]
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class DashboardCounter(models.Model):
+    """
+    Materialized dashboard count, fleet-wide (scope "*") or per site
+    (scope = Device.site). Maintained incrementally by core.counters.
+    Names: devices.<NORMAL|SEVERE|CRITICAL|UNKNOWN>, tickets.open.<SEVERE|CRITICAL>,
+    tickets.unacked.
+    """
+    scope = models.CharField(max_length=128)
+    name = models.CharField(max_length=64)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "name"], name="uniq_dashboard_counter"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.name}={self.value}"
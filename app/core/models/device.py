@@ -10,6 +10,9 @@ class Device(models.Model):
     min_temp = models.FloatField(default=5.0)
     max_temp = models.FloatField(default=25.0)
 
+    # ingest secret = HMAC(DEVICE_KEY_MASTER, "code|key_version"); bump to rotate (core.credentials)
+    key_version = models.PositiveIntegerField(default=1)
+
     created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
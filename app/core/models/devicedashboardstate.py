@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class DeviceDashboardState(models.Model):
+    """
+    What one device currently contributes to the DashboardCounter rows.
+    Changes are applied as (new - old) deltas under a lock on this row, so
+    counters stay exact without ever rescanning the fleet.
+    """
+    device = models.OneToOneField(
+        "core.Device", on_delete=models.CASCADE, primary_key=True, related_name="dashboard_state"
+    )
+    site = models.CharField(max_length=128, blank=True, default="")
+
+    last_state = models.CharField(max_length=10, blank=True, default="")
+    last_ts = models.DateTimeField(null=True, blank=True)
+    # state the device is counted under ("" = not counted, e.g. inactive)
+    counted_state = models.CharField(max_length=10, blank=True, default="")
+
+    open_severe = models.IntegerField(default=0)
+    open_critical = models.IntegerField(default=0)
+    unacked = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.device_id}:{self.counted_state or '-'}"
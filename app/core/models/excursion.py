@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class Excursion(models.Model):
+    """
+    One run of consecutive out-of-range (SEVERE/CRITICAL) readings of a
+    device: from its first violating reading to the first NORMAL reading
+    after it (`end_ts`, null while still out of range). Kept current at
+    ingest (core.excursions.add_readings) and rebuilt from raw data by
+    backfill_aggregates. Sharded, next to the readings.
+    """
+    device = models.ForeignKey(
+        "core.Device", on_delete=models.CASCADE, related_name="+", db_constraint=False
+    )
+    start_ts = models.DateTimeField()
+    end_ts = models.DateTimeField(null=True, blank=True)
+    last_ts = models.DateTimeField()  # newest violating reading
+    duration_s = models.FloatField(default=0.0)  # to end_ts, or to last_ts while open
+
+    readings = models.IntegerField(default=0)
+    peak_temp = models.FloatField()  # the reading farthest outside min_temp/max_temp
+    max_severity = models.CharField(max_length=10)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["device", "start_ts"], name="uniq_excursion_device_start"),
+        ]
+        indexes = [
+            models.Index(fields=["start_ts", "id"]),  # fleet feed
+        ]
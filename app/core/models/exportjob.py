@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class ExportJob(models.Model):
+    """
+    Background export of readings (one device, one site or the fleet) to a
+    file under EXPORT_DIR, for ranges too large for a request. Progress is
+    checkpointed per chunk as the last exported (ts, id, device_id) plus the
+    file offset, so an interrupted CSV/NDJSON job resumes where it stopped.
+    The file is removed once expires_at has passed (status EXPIRED).
+    """
+    STATUS_CHOICES = [
+        ("PENDING", "PENDING"),
+        ("RUNNING", "RUNNING"),
+        ("DONE", "DONE"),
+        ("FAILED", "FAILED"),
+        ("EXPIRED", "EXPIRED"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="export_jobs"
+    )
+    device = models.ForeignKey(
+        "core.Device", null=True, blank=True, on_delete=models.CASCADE, related_name="export_jobs"
+    )
+    site = models.CharField(max_length=128, blank=True, default="")
+    frm = models.DateTimeField(null=True, blank=True)
+    to = models.DateTimeField(null=True, blank=True)
+    fmt = models.CharField(max_length=10, default="csv")
+    compress = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+
+    cursor_ts = models.DateTimeField(null=True, blank=True)
+    cursor_id = models.BigIntegerField(null=True, blank=True)
+    cursor_device_id = models.BigIntegerField(null=True, blank=True)
+    rows_total = models.BigIntegerField(default=0)
+    rows_written = models.BigIntegerField(default=0)
+    bytes_written = models.BigIntegerField(default=0)
+    path = models.CharField(max_length=255, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # lease: a RUNNING job silent too long is reclaimed
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def progress(self) -> float:
+        if self.status == "DONE":
+            return 1.0
+        if not self.rows_total:
+            return 0.0
+        return min(1.0, self.rows_written / self.rows_total)
@@ -0,0 +1,136 @@
+import math
+
+from django.db import models
+from django.db.models import lookups
+
+SMALLINT_MIN = -32768
+SMALLINT_MAX = 32767
+
+
+class ScaledFloatField(models.FloatField):
+    """
+    Float on the Python side, stored as a scaled smallint (value * scale).
+    DHT11/DHT22 readings carry at most one decimal, so scale=10 is lossless
+    and halves/quarters the column width compared to float8.
+    """
+
+    def __init__(self, *args, scale: int = 10, **kwargs):
+        self.scale = scale
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.scale != 10:
+            kwargs["scale"] = self.scale
+        return name, path, args, kwargs
+
+    @property
+    def min_value(self) -> float:
+        return SMALLINT_MIN / self.scale
+
+    @property
+    def max_value(self) -> float:
+        return SMALLINT_MAX / self.scale
+
+    def db_type(self, connection):
+        return "smallint"
+
+    def scaled(self, value, rounding=round) -> int:
+        # round(.., 6) first: 2.05 * 10 is 20.499999999999996 in binary floating point
+        return int(rounding(round(float(value) * self.scale, 6)))
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return self.scaled(value)
+
+    def quantize(self, value):
+        """`value` as it will be stored and read back (on the 1/scale grid)."""
+        if value is None:
+            return None
+        return self.get_prep_value(value) / self.scale
+
+    def from_db_value(self, value, expression, connection):
+        # Also used for Avg/Sum/Min/Max over this column (output_field = self)
+        if value is None:
+            return None
+        return float(value) / self.scale
+
+
+# Comparisons against a bound off the 1/scale grid must not round it to the
+# nearest step: temp_c < 2.05 is "scaled < 21" (2.0 included), not "< 20".
+class _ScaledBound:
+    rounding = staticmethod(round)
+
+    def get_prep_lookup(self):
+        if self.rhs is None or hasattr(self.rhs, "resolve_expression"):
+            return super().get_prep_lookup()
+        return self.lhs.output_field.scaled(self.rhs, self.rounding)
+
+
+@ScaledFloatField.register_lookup
+class ScaledLessThan(_ScaledBound, lookups.LessThan):
+    rounding = staticmethod(math.ceil)
+
+
+@ScaledFloatField.register_lookup
+class ScaledLessThanOrEqual(_ScaledBound, lookups.LessThanOrEqual):
+    rounding = staticmethod(math.floor)
+
+
+@ScaledFloatField.register_lookup
+class ScaledGreaterThan(_ScaledBound, lookups.GreaterThan):
+    rounding = staticmethod(math.floor)
+
+
+@ScaledFloatField.register_lookup
+class ScaledGreaterThanOrEqual(_ScaledBound, lookups.GreaterThanOrEqual):
+    rounding = staticmethod(math.ceil)
+
+
+@ScaledFloatField.register_lookup
+class ScaledRange(lookups.Range):
+    def get_prep_lookup(self):
+        if any(v is None or hasattr(v, "resolve_expression") for v in self.rhs):
+            return super().get_prep_lookup()
+        field = self.lhs.output_field
+        low, high = self.rhs
+        return [field.scaled(low, math.ceil), field.scaled(high, math.floor)]
+
+
+class CompactStateField(models.CharField):
+    """
+    Choice label on the Python side ("NORMAL", ...), stored as a smallint code.
+    Filters like state="CRITICAL" / state__in=[...] keep working unchanged.
+    """
+
+    def __init__(self, *args, codes: dict | None = None, **kwargs):
+        self.codes = dict(codes or {})
+        self.labels = {v: k for k, v in self.codes.items()}
+        kwargs.setdefault("max_length", 10)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["codes"] = self.codes
+        if kwargs.get("max_length") == 10:
+            del kwargs["max_length"]
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        return "smallint"
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        value = self.to_python(value)
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f"Unknown state {value!r}")
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return self.labels.get(int(value), str(value))
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class ImportJob(models.Model):
+    """
+    One CSV upload of readings (device,timestamp,temp_c[,humidity]) and its
+    outcome: inserted / skipped rows and a per-line error report (the first
+    IMPORT_MAX_ERRORS lines; error_count has the full tally). Small files
+    run inside the request, large ones on the jobs worker (see core.imports).
+    """
+    STATUS_CHOICES = [
+        ("PENDING", "PENDING"),
+        ("RUNNING", "RUNNING"),
+        ("DONE", "DONE"),
+        ("FAILED", "FAILED"),
+    ]
+    STAGE_CHOICES = [
+        ("queued", "queued"),
+        ("parse", "parse"),        # reading the upload, routing rows per shard
+        ("merge", "merge"),        # staging + validation + insert, per shard
+        ("aggregates", "aggregates"),
+        ("done", "done"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="import_jobs"
+    )
+    filename = models.CharField(max_length=255, blank=True, default="")
+    path = models.CharField(max_length=255, blank=True, default="")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+    stage = models.CharField(max_length=16, choices=STAGE_CHOICES, default="queued")
+
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_read = models.BigIntegerField(default=0)
+    rows_read = models.BigIntegerField(default=0)
+    inserted = models.BigIntegerField(default=0)
+    skipped_duplicates = models.BigIntegerField(default=0)
+    error_count = models.BigIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # [{"line", "error", "row"}], capped
+    devices_total = models.IntegerField(default=0)
+    devices_done = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def progress(self) -> float:
+        # parse ~60% of the time, merge ~10%, aggregate refresh the rest
+        if self.status == "DONE":
+            return 1.0
+        if self.stage == "parse" and self.bytes_total:
+            return 0.6 * min(1.0, self.bytes_read / self.bytes_total)
+        if self.stage == "merge":
+            return 0.6
+        if self.stage == "aggregates":
+            return 0.7 + 0.3 * (self.devices_done / self.devices_total if self.devices_total else 1.0)
+        return 0.0
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class IngestRateStat(models.Model):
+    """
+    Cumulative ingest rate-limit tallies per device code (on default), for
+    the devices that hit their limit: flushed from each ingest process by
+    core.ratelimit and listed by GET /api/ingest/noisy-devices.
+    """
+    code = models.CharField(max_length=64, primary_key=True)
+    site = models.CharField(max_length=128, blank=True, default="")
+    accepted = models.BigIntegerField(default=0)
+    limited = models.BigIntegerField(default=0)     # dropped / thinned out by the limiter
+    bypassed = models.BigIntegerField(default=0)    # over the limit but out of range, so kept
+    last_limited_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.code}: {self.limited} limited"
@@ -0,0 +1,21 @@
+from django.db import models
+from django.utils import timezone
+
+
+class LiveEvent(models.Model):
+    """
+    Short-lived log of pushed events (new readings, ticket changes) behind
+    the SSE stream: the id is the SSE event id, so clients resume with
+    Last-Event-ID. Pruned after LIVE_EVENTS_RETENTION_MIN by core.live.
+    """
+    KIND_CHOICES = [("reading", "reading"), ("ticket", "ticket")]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    device_id = models.BigIntegerField()
+    site = models.CharField(max_length=128, blank=True, default="")
+    data = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind}#{self.id}"
@@ -1,16 +1,25 @@
 from django.db import models
 
+from .fields import CompactStateField, ScaledFloatField
+
+
 class Measurement(models.Model):
     STATE_CHOICES = [
         ("NORMAL", "NORMAL"),
         ("SEVERE", "SEVERE"),
         ("CRITICAL", "CRITICAL")
     ]
-    device = models.ForeignKey("core.Device", on_delete=models.CASCADE, related_name="measurements")
+    # smallint codes backing the state labels (never renumber, append only)
+    STATE_CODES = {"NORMAL": 0, "SEVERE": 1, "CRITICAL": 2}
+
+    # no DB-level FK: readings may live on a different database than devices (core.sharding)
+    device = models.ForeignKey(
+        "core.Device", on_delete=models.CASCADE, related_name="measurements", db_constraint=False
+    )
     ts = models.DateTimeField()
-    temp_c = models.FloatField()
-    humidity = models.FloatField(null=True, blank=True)
-    state = models.CharField(max_length=10, choices=STATE_CHOICES)
+    temp_c = ScaledFloatField(scale=10)
+    humidity = ScaledFloatField(scale=10, null=True, blank=True)
+    state = CompactStateField(choices=STATE_CHOICES, codes=STATE_CODES)
 
     class Meta:
         indexes = [
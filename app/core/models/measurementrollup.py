@@ -0,0 +1,34 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MeasurementRollup(models.Model):
+    """
+    Hourly per-device aggregate of Measurement rows. Kept current at ingest
+    (core.rollups.add_reading) and rebuilt from raw data by backfill_aggregates.
+    Averages are sum / count so buckets can be merged into day/week/month.
+    """
+    device = models.ForeignKey(
+        "core.Device", on_delete=models.CASCADE, related_name="rollups", db_constraint=False
+    )
+    bucket_start = models.DateTimeField()
+
+    n = models.IntegerField(default=0)
+    temp_sum = models.FloatField(default=0.0)
+    temp_min = models.FloatField(null=True, blank=True)
+    temp_max = models.FloatField(null=True, blank=True)
+
+    hum_n = models.IntegerField(default=0)
+    hum_sum = models.FloatField(default=0.0)
+    hum_min = models.FloatField(null=True, blank=True)
+    hum_max = models.FloatField(null=True, blank=True)
+
+    severe_n = models.IntegerField(default=0)
+    critical_n = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["device", "bucket_start"], name="uniq_rollup_device_bucket"),
+        ]
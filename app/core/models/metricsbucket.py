@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MetricsBucket(models.Model):
+    """
+    Cached aggregate of one completed chart bucket (minute/hour/day/week/
+    month) of one device, as served by device metrics. Lives next to the
+    readings (sharded); maintained by core.bucket_cache. Buckets without
+    readings have no row: MetricsBucketCoverage says which range is complete.
+    `stale` marks a bucket that late data landed in.
+    """
+    device = models.ForeignKey(
+        "core.Device", on_delete=models.CASCADE, related_name="+", db_constraint=False
+    )
+    bucket = models.CharField(max_length=8)
+    bucket_start = models.DateTimeField()
+
+    n = models.IntegerField(default=0)
+    temp_avg = models.FloatField(null=True, blank=True)
+    temp_min = models.FloatField(null=True, blank=True)
+    temp_max = models.FloatField(null=True, blank=True)
+    hum_avg = models.FloatField(null=True, blank=True)
+    hum_min = models.FloatField(null=True, blank=True)
+    hum_max = models.FloatField(null=True, blank=True)
+
+    stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["device", "bucket", "bucket_start"], name="uniq_metrics_bucket"),
+        ]
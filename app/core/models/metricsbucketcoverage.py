@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class MetricsBucketCoverage(models.Model):
+    """
+    [covered_from, covered_to) of completed buckets cached for one device
+    and bucket size; also the row locked while that cache is written.
+    """
+    device = models.ForeignKey(
+        "core.Device", on_delete=models.CASCADE, related_name="+", db_constraint=False
+    )
+    bucket = models.CharField(max_length=8)
+    covered_from = models.DateTimeField(null=True, blank=True)
+    covered_to = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["device", "bucket"], name="uniq_metrics_bucket_coverage"),
+        ]
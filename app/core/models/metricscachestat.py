@@ -0,0 +1,8 @@
+from django.db import models
+
+
+class MetricsCacheStat(models.Model):
+    """Cumulative bucket-cache hits / misses per bucket size (on default)."""
+    bucket = models.CharField(max_length=8, primary_key=True)
+    hits = models.BigIntegerField(default=0)
+    misses = models.BigIntegerField(default=0)
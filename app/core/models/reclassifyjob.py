@@ -0,0 +1,45 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ReclassifyJob(models.Model):
+    """
+    Background recomputation of Measurement.state for one device and time range
+    (e.g. after its min_temp/max_temp were corrected). Progress is checkpointed
+    per chunk in cursor_ts, so an interrupted job resumes where it stopped.
+    A worker owns a RUNNING job while it keeps heartbeat_at fresh.
+    """
+    STATUS_CHOICES = [
+        ("PENDING", "PENDING"),
+        ("RUNNING", "RUNNING"),
+        ("DONE", "DONE"),
+        ("FAILED", "FAILED"),
+    ]
+
+    device = models.ForeignKey("core.Device", on_delete=models.CASCADE, related_name="reclassify_jobs")
+    frm = models.DateTimeField(null=True, blank=True)
+    to = models.DateTimeField(null=True, blank=True)
+    reason = models.CharField(max_length=32, blank=True, default="manual")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+
+    cursor_ts = models.DateTimeField(null=True, blank=True)
+    rows_total = models.BigIntegerField(default=0)
+    rows_scanned = models.BigIntegerField(default=0)
+    rows_changed = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # lease: a RUNNING job silent too long is reclaimed
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def progress(self) -> float:
+        if self.status == "DONE":
+            return 1.0
+        if not self.rows_total:
+            return 0.0
+        return min(1.0, self.rows_scanned / self.rows_total)
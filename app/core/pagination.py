@@ -0,0 +1,156 @@
+# core/pagination.py
+"""
+Keyset (cursor) pagination over readings ordered by (ts, id).
+
+A cursor is the (ts, id) of a page edge plus a direction, base64 encoded so
+clients treat it as opaque. Each page is `WHERE (ts, id) > edge ORDER BY ts,
+id LIMIT size+1` on the (device, ts) index, so page 1000 costs the same as
+page 1. Several sources (one queryset per shard) are paged together by
+merging their individually limited results. Ids come from each shard's own
+sequence, so two shards can hold the same (ts, id): the cursor also names
+the shard of its edge row, and ties are ordered by shard alias. Other tables
+page the same way on their own (timestamp, id) pair, passed as `key`.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.sharding import fan_out
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+NEXT = "n"
+PREV = "p"
+
+
+def max_page_size() -> int:
+    return int(getattr(settings, "MEASUREMENTS_MAX_PAGE_SIZE", 1000))
+
+
+def page_size(request, default: int) -> int:
+    """`page_size` (or legacy `limit`) clamped to [1, MEASUREMENTS_MAX_PAGE_SIZE]."""
+    raw = request.GET.get("page_size") or request.GET.get("limit")
+    try:
+        size = int(raw) if raw else default
+    except ValueError:
+        raise ValidationError({"page_size": "Must be an integer."})
+    return max(1, min(size, max_page_size()))
+
+
+TS_ID = ("ts", "id")
+
+
+def _edge(row, key=TS_ID):
+    # model instance or values() dict
+    if isinstance(row, dict):
+        return row[key[0]], row[key[1]]
+    return getattr(row, key[0]), getattr(row, key[1])
+
+
+def encode_cursor(row, direction: str, key=TS_ID, shard: str = "") -> str:
+    ts, pk = _edge(row, key)
+    ts_us = (ts - _EPOCH) // timedelta(microseconds=1)
+    data = {"t": ts_us, "i": pk, "d": direction}
+    if shard:
+        data["s"] = shard
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value: str | None):
+    """(ts, id, direction, shard) or None; ValidationError on anything malformed."""
+    if not value:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        ts = _EPOCH + timedelta(microseconds=int(data["t"]))
+        direction = data["d"]
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return ts, int(data["i"]), direction, str(data.get("s", ""))
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+
+def _after(ts, pk, descending: bool, key=TS_ID, *, inclusive: bool = False) -> Q:
+    # (ts, id) > (ts0, id0) (>= when inclusive), spelled so the ts bound alone is an index range
+    t, i = key
+    if descending:
+        return Q(**{f"{t}__lte": ts}) & (Q(**{f"{t}__lt": ts}) | Q(**{f"{i}__lte" if inclusive else f"{i}__lt": pk}))
+    return Q(**{f"{t}__gte": ts}) & (Q(**{f"{t}__gt": ts}) | Q(**{f"{i}__gte" if inclusive else f"{i}__gt": pk}))
+
+
+def keyset_page(sources, *, size: int, cursor=None, descending: bool = False, fields=None, key=TS_ID):
+    """
+    Page through the union of `sources` ({alias: queryset}) in `key`
+    ((ts, id) by default) order; with `fields`, rows are .values(*fields)
+    dicts (must include the key). Returns (rows, next_cursor, prev_cursor).
+    """
+    forward = True
+    if cursor is not None:
+        ts, pk, direction, shard = cursor
+        forward = direction == NEXT
+    # a "previous" page is fetched walking backwards, then flipped
+    walk_desc = descending if forward else not descending
+    order = tuple(f"-{f}" for f in key) if walk_desc else key
+
+    def _fetch(alias):
+        qs = sources[alias]
+        if cursor is not None:
+            # the edge row's (ts, id) may recur on a shard that sorts after it
+            inclusive = bool(shard) and (alias < shard if walk_desc else alias > shard)
+            qs = qs.filter(_after(ts, pk, walk_desc, key, inclusive=inclusive))
+        qs = qs.order_by(*order)
+        if fields:
+            qs = qs.values(*fields)
+        return [(_edge(row, key) + (alias,), row) for row in qs[:size + 1]]
+
+    parts = fan_out(_fetch, list(sources))
+    merged = list(heapq.merge(*parts.values(), key=lambda tagged: tagged[0], reverse=walk_desc))[:size + 1]
+    more = len(merged) > size
+    tagged = merged[:size]
+    if not forward:
+        tagged.reverse()
+
+    if not tagged:
+        return [], None, None
+    rows = [row for _, row in tagged]
+    has_next = more if forward else True
+    has_prev = (cursor is not None) if forward else more
+    next_cursor = encode_cursor(rows[-1], NEXT, key, tagged[-1][0][2]) if has_next else None
+    prev_cursor = encode_cursor(rows[0], PREV, key, tagged[0][0][2]) if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def wants_envelope(request) -> bool:
+    # legacy `?limit=` callers keep getting a bare list (clamped, cursors in Link)
+    return "page_size" in request.GET
+
+
+def _page_url(request, cursor):
+    return replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+
+
+def paginated_response(request, data, next_cursor, prev_cursor) -> Response:
+    next_url = _page_url(request, next_cursor) if next_cursor else None
+    prev_url = _page_url(request, prev_cursor) if prev_cursor else None
+
+    if wants_envelope(request):
+        return Response({"next": next_url, "previous": prev_url, "results": data})
+
+    resp = Response(data)
+    links = []
+    if next_url:
+        links.append(f'<{next_url}>; rel="next"')
+    if prev_url:
+        links.append(f'<{prev_url}>; rel="prev"')
+    if links:
+        resp["Link"] = ", ".join(links)
+    return resp
@@ -0,0 +1,170 @@
+# core/ratelimit.py
+"""
+Ingest flood protection: token buckets per device and per site, kept in
+memory and checked before any DB work (HTTP ingest, mqtt_worker,
+udp_listener).
+
+A device may send RATE_LIMIT_DEVICE_PER_MIN readings a minute with bursts
+up to RATE_LIMIT_DEVICE_BURST, a site RATE_LIMIT_SITE_PER_MIN /
+RATE_LIMIT_SITE_BURST across its devices. Past that, RATE_LIMIT_POLICY
+decides: "drop" refuses the reading; "downsample" still keeps one reading
+per device every RATE_LIMIT_DOWNSAMPLE_S of reading time, so a gateway's
+backlog thins out instead of vanishing. A reading outside the device's
+thresholds is always admitted: alarms are never rate-limited away.
+
+Site and thresholds come from the in-memory device table in
+core.credentials. Buckets are per process, so N ingest processes admit up
+to N times the limit in aggregate. Tallies of the devices that hit a limit
+are added to IngestRateStat every RATE_LIMIT_FLUSH_S (flush_stats()),
+which backs the admin noisy-device list.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from core import credentials
+from core.models import Device, IngestRateStat
+from core.utils import classify_state
+
+_DEFAULT_MIN = Device._meta.get_field("min_temp").default
+_DEFAULT_MAX = Device._meta.get_field("max_temp").default
+_MAX_KEYS = 100_000
+
+_lock = threading.Lock()
+_buckets = OrderedDict()  # ("d", code) / ("s", site) -> [tokens, monotonic of last update], least recent first
+_last_kept = {}  # code -> reading ts (epoch s) of the last reading downsampling kept
+_tally = {}      # code -> [site, accepted, limited, bypassed, last limited (epoch s)]
+_flushed_at = [time.monotonic()]
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "RATE_LIMIT_ENABLED", True))
+
+
+def limits() -> dict:
+    return {
+        "device_per_min": float(getattr(settings, "RATE_LIMIT_DEVICE_PER_MIN", 30)),
+        "device_burst": float(getattr(settings, "RATE_LIMIT_DEVICE_BURST", 60)),
+        "site_per_min": float(getattr(settings, "RATE_LIMIT_SITE_PER_MIN", 3000)),
+        "site_burst": float(getattr(settings, "RATE_LIMIT_SITE_BURST", 6000)),
+        "policy": str(getattr(settings, "RATE_LIMIT_POLICY", "downsample")),
+        "downsample_s": float(getattr(settings, "RATE_LIMIT_DOWNSAMPLE_S", 60)),
+    }
+
+
+def _refill(key, per_min: float, burst: float, now: float) -> list:
+    b = _buckets.get(key)
+    if b is None:
+        b = _buckets[key] = [burst, now]
+        while len(_buckets) > _MAX_KEYS:
+            # evict the longest idle bucket (refilled to full by now, most likely)
+            (kind, name), _ = _buckets.popitem(last=False)
+            if kind == "d":
+                _last_kept.pop(name, None)
+    else:
+        _buckets.move_to_end(key)
+    b[0] = min(burst, b[0] + (now - b[1]) * per_min / 60)
+    b[1] = now
+    return b
+
+
+def admit(code: str, *, temp_c=None, ts=None, load: bool = True) -> bool:
+    """
+    Whether to ingest this reading of `code` (`ts` a datetime or epoch
+    seconds). load=False never queries (see credentials.lookup).
+    """
+    if not enabled():
+        return True
+    cred = credentials.lookup(code, load=load)
+    site = cred.site if cred else ""
+    violating = temp_c is not None and classify_state(
+        temp_c,
+        min_temp=cred.min_temp if cred else _DEFAULT_MIN,
+        max_temp=cred.max_temp if cred else _DEFAULT_MAX,
+    ) != "NORMAL"
+    if isinstance(ts, datetime):
+        ts = ts.timestamp()
+    cfg = limits()
+    now = time.monotonic()
+
+    with _lock:
+        # both buckets must have a token before either is spent
+        buckets = [_refill(("d", code), cfg["device_per_min"], cfg["device_burst"], now)]
+        if site:
+            buckets.append(_refill(("s", site), cfg["site_per_min"], cfg["site_burst"], now))
+        ok = all(b[0] >= 1 for b in buckets)
+        if ok:
+            for b in buckets:
+                b[0] -= 1
+        if not ok and cfg["policy"] == "downsample" and ts is not None:
+            last = _last_kept.get(code)
+            if last is None or abs(ts - last) >= cfg["downsample_s"]:
+                _last_kept[code] = ts
+                ok = True
+
+        t = _tally.get(code)
+        if t is None:
+            t = _tally[code] = [site, 0, 0, 0, None]
+        if ok or violating:
+            t[1] += 1
+            if not ok:
+                t[3] += 1
+            return True
+        t[2] += 1
+        t[4] = time.time()
+        return False
+
+
+def flush_stats() -> int:
+    """Add the tallies of devices that hit a limit to IngestRateStat; returns how many devices."""
+    with _lock:
+        tally = dict(_tally)
+        _tally.clear()
+        _flushed_at[0] = time.monotonic()
+    noisy = 0
+    for code, (site, accepted, limited, bypassed, last) in sorted(tally.items()):
+        if not (limited or bypassed):
+            continue
+        noisy += 1
+        updates = {"site": site, "accepted": F("accepted") + accepted, "limited": F("limited") + limited,
+                   "bypassed": F("bypassed") + bypassed}
+        if last is not None:
+            updates["last_limited_at"] = datetime.fromtimestamp(last, tz=dt_timezone.utc)
+        if not IngestRateStat.objects.filter(code=code).update(**updates):
+            IngestRateStat.objects.get_or_create(code=code)
+            IngestRateStat.objects.filter(code=code).update(**updates)
+    return noisy
+
+
+def maybe_flush():
+    """flush_stats() once RATE_LIMIT_FLUSH_S has passed (for synchronous ingest paths)."""
+    if time.monotonic() - _flushed_at[0] >= float(getattr(settings, "RATE_LIMIT_FLUSH_S", 30)):
+        try:
+            flush_stats()
+        except Exception as e:
+            print(f"[ratelimit] stats flush failed: {e}", flush=True)
+
+
+def noisy_devices(*, hours: float = 24, limit: int = 100) -> list:
+    """
+    Devices limited within the last `hours`, most limited first. The counts
+    are cumulative (IngestRateStat keeps totals, not per-window tallies).
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    rows = IngestRateStat.objects.filter(last_limited_at__gte=since).order_by("-limited", "code")[:limit]
+    return [
+        {
+            "code": r.code,
+            "site": r.site,
+            "accepted_total": r.accepted,
+            "limited_total": r.limited,
+            "bypassed_total": r.bypassed,
+            "last_limited_at": r.last_limited_at,
+        }
+        for r in rows
+    ]
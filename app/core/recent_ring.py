@@ -0,0 +1,303 @@
+# core/recent_ring.py
+"""
+Recent-readings ring buffer shared between the ingest processes (mqtt_worker,
+HTTP ingest) and the web workers on the same host, in an mmap'd file.
+
+Layout (little endian, fixed at creation):
+    header  64 B   magic, version, nslots, depth, record size, slot size
+    slot × nslots  seq u64 | device_id i64 | count u32 | warm u8 | pad
+                   + depth × record (newest first)
+    record  24 B   id i64 | ts (epoch µs) i64 | temp×10 i16 | hum×10 i16 | state u8 | pad
+
+Slots are found by open addressing on device_id. Writers serialize on an
+flock; readers never lock: each slot is a seqlock (seq odd while a write is
+in progress), so a reader copies the slot and retries if seq moved. A slot is
+"warm" once it was seeded from the DB, i.e. it holds the device's true last
+`depth` readings; anything else (cold, not resident, limit > depth) falls back
+to the DB.
+"""
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev boxes: ring disabled
+    fcntl = None
+
+from core.models import Measurement
+
+MAGIC = b"CCRING01"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sIIIII")
+HEADER_SIZE = 64
+_SEQ = struct.Struct("<Q")
+_SLOT_HEAD = struct.Struct("<QqIB")
+SLOT_HEAD_SIZE = 32
+_REC = struct.Struct("<qqhhB3x")
+
+MAX_PROBE = 32
+READ_RETRIES = 8
+NULL_X10 = -32768
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_STATE_CODES = Measurement.STATE_CODES
+_STATE_LABELS = {v: k for k, v in _STATE_CODES.items()}
+_TEMP_FIELD = Measurement._meta.get_field("temp_c")
+_HUM_FIELD = Measurement._meta.get_field("humidity")
+
+
+def _ts_us(ts) -> int:
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+class RecentRing:
+    def __init__(self, path: str, nslots: int, depth: int):
+        self.path = path
+        self.nslots = nslots
+        self.depth = depth
+        self.slot_size = SLOT_HEAD_SIZE + depth * _REC.size
+        self.size = HEADER_SIZE + nslots * self.slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o660)
+        with self._locked():
+            if os.fstat(self._fd).st_size != self.size or not self._header_ok():
+                self._format()
+        self._mm = mmap.mmap(self._fd, self.size)
+
+    # ---------- setup ----------
+    def _header_ok(self) -> bool:
+        raw = os.pread(self._fd, _HEADER.size, 0)
+        if len(raw) < _HEADER.size:
+            return False
+        return _HEADER.unpack(raw) == (MAGIC, VERSION, self.nslots, self.depth, _REC.size, self.slot_size)
+
+    def _format(self):
+        os.ftruncate(self._fd, 0)
+        os.ftruncate(self._fd, self.size)  # zero-filled: every slot empty, seq 0
+        header = _HEADER.pack(MAGIC, VERSION, self.nslots, self.depth, _REC.size, self.slot_size)
+        os.pwrite(self._fd, header.ljust(HEADER_SIZE, b"\0"), 0)
+
+    def _locked(self):
+        fd = self._fd
+
+        class _Lock:
+            def __enter__(self_):
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            def __exit__(self_, *exc):
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+        return _Lock()
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.slot_size
+
+    def _probe(self, device_id: int):
+        start = device_id % self.nslots
+        for i in range(min(MAX_PROBE, self.nslots)):
+            yield (start + i) % self.nslots
+
+    # ---------- lock-free read side ----------
+    def _read_slot(self, slot: int):
+        off = self._offset(slot)
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            s1 = _SEQ.unpack_from(mm, off)[0]
+            if s1 & 1:
+                continue
+            raw = mm[off:off + self.slot_size]
+            if _SEQ.unpack_from(mm, off)[0] == s1:
+                return raw
+        return None  # writer kept us out; caller falls back to the DB
+
+    def _find(self, device_id: int):
+        for slot in self._probe(device_id):
+            raw = self._read_slot(slot)
+            if raw is None:
+                return None, None
+            _, dev, _, _ = _SLOT_HEAD.unpack_from(raw, 0)
+            if dev == device_id:
+                return slot, raw
+            if dev == 0:
+                return None, None
+        return None, None
+
+    def read(self, device_id: int, limit: int):
+        """Newest-first rows [(id, ts, temp_c, humidity, state)] or None if not servable."""
+        if limit > self.depth:
+            return None
+        _, raw = self._find(device_id)
+        if raw is None:
+            return None
+        _, _, count, warm = _SLOT_HEAD.unpack_from(raw, 0)
+        if not warm:
+            return None
+        rows = []
+        for i in range(min(count, limit)):
+            mid, ts_us, t, h, st = _REC.unpack_from(raw, SLOT_HEAD_SIZE + i * _REC.size)
+            rows.append((
+                mid,
+                _EPOCH + timedelta(microseconds=ts_us),
+                t / _TEMP_FIELD.scale,
+                None if h == NULL_X10 else h / _HUM_FIELD.scale,
+                _STATE_LABELS.get(st, str(st)),
+            ))
+        return rows
+
+    # ---------- flock-serialized write side ----------
+    def _write_slot(self, slot: int, device_id: int, records, warm: bool):
+        off = self._offset(slot)
+        mm = self._mm
+        seq = _SEQ.unpack_from(mm, off)[0]
+        body = bytearray(self.slot_size - _SEQ.size)
+        struct.pack_into("<qIB", body, 0, device_id, len(records), 1 if warm else 0)
+        base = SLOT_HEAD_SIZE - _SEQ.size
+        for i, rec in enumerate(records):
+            _REC.pack_into(body, base + i * _REC.size, *rec)
+        _SEQ.pack_into(mm, off, seq + 1)          # odd: write in progress
+        mm[off + _SEQ.size:off + self.slot_size] = bytes(body)
+        _SEQ.pack_into(mm, off, seq + 2)          # even: consistent again
+
+    def _records(self, raw):
+        _, _, count, _ = _SLOT_HEAD.unpack_from(raw, 0)
+        return [_REC.unpack_from(raw, SLOT_HEAD_SIZE + i * _REC.size) for i in range(count)]
+
+    def publish(self, device_id: int, new_records, seed):
+        """
+        Merge records (id, ts_us, temp×10, hum×10, state) into the device slot.
+        `seed()` returns the device's last `depth` records from the DB and is
+        only called when the slot is new or cold.
+        """
+        with self._locked():
+            target = None
+            for slot in self._probe(device_id):
+                raw = self._mm[self._offset(slot):self._offset(slot) + self.slot_size]
+                _, dev, _, warm = _SLOT_HEAD.unpack_from(raw, 0)
+                if dev == device_id:
+                    target = (slot, self._records(raw) if warm else None)
+                    break
+                if dev == 0:
+                    target = (slot, None)
+                    break
+            if target is None:
+                return False  # probe window full: device stays DB-only
+
+            slot, current = target
+            if current is None:
+                current = list(seed())
+            by_id = {r[0]: r for r in current}
+            for r in new_records:
+                by_id[r[0]] = r
+            merged = sorted(by_id.values(), key=lambda r: (r[1], r[0]), reverse=True)[:self.depth]
+            self._write_slot(slot, device_id, merged, warm=True)
+            return True
+
+    def invalidate(self, device_id: int):
+        """Mark the device cold (next publish reseeds from the DB)."""
+        with self._locked():
+            for slot in self._probe(device_id):
+                raw = self._mm[self._offset(slot):self._offset(slot) + self.slot_size]
+                _, dev, _, _ = _SLOT_HEAD.unpack_from(raw, 0)
+                if dev == device_id:
+                    self._write_slot(slot, device_id, [], warm=False)
+                    return
+                if dev == 0:
+                    return
+
+
+# ---------- process-wide singleton ----------
+_ring = None
+_ring_pid = None
+_ring_lock = threading.Lock()
+
+
+def get_ring():
+    global _ring, _ring_pid
+    path = getattr(settings, "RECENT_RING_PATH", "")
+    if not path or fcntl is None:
+        return None
+    if _ring is not None and _ring_pid == os.getpid():
+        return _ring
+    with _ring_lock:
+        if _ring is None or _ring_pid != os.getpid():
+            try:
+                _ring = RecentRing(
+                    path,
+                    int(getattr(settings, "RECENT_RING_SLOTS", 2048)),
+                    int(getattr(settings, "RECENT_RING_DEPTH", 100)),
+                )
+                _ring_pid = os.getpid()
+            except OSError as e:
+                print(f"[recent_ring] disabled: {e}", flush=True)
+                return None
+    return _ring
+
+
+def _to_record(mid, ts, temp_c, humidity, state):
+    return (
+        mid,
+        _ts_us(ts),
+        _TEMP_FIELD.get_prep_value(temp_c),
+        NULL_X10 if humidity is None else _HUM_FIELD.get_prep_value(humidity),
+        _STATE_CODES.get(state, 0),
+    )
+
+
+def publish(m: Measurement):
+    """Push a committed reading into the ring (no-op when disabled). Never raises."""
+    publish_many([m])
+
+
+def publish_many(readings):
+    """Push committed readings into the ring, one slot update per device. Never raises."""
+    ring = get_ring()
+    if ring is None:
+        return
+    by_device = {}
+    for m in readings:
+        by_device.setdefault(m.device_id, []).append(m)
+    for device_id, ms in by_device.items():
+        try:
+            def seed(device_id=device_id, using=ms[0]._state.db):
+                rows = (
+                    Measurement.objects.using(using).filter(device_id=device_id)
+                    .order_by("-ts", "-id")
+                    .values_list("id", "ts", "temp_c", "humidity", "state")[:ring.depth]
+                )
+                return [_to_record(*r) for r in rows]
+
+            ring.publish(device_id, [_to_record(m.id, m.ts, m.temp_c, m.humidity, m.state) for m in ms], seed)
+        except Exception as e:
+            print(f"[recent_ring] publish error: {e}", flush=True)
+
+
+def invalidate(device_id: int):
+    ring = get_ring()
+    if ring is None:
+        return
+    try:
+        ring.invalidate(device_id)
+    except Exception as e:
+        print(f"[recent_ring] invalidate error: {e}", flush=True)
+
+
+def recent(device, limit: int):
+    """
+    Newest-first unsaved Measurement instances for device from the ring, or
+    None when the device is not resident / the ring cannot answer.
+    """
+    ring = get_ring()
+    if ring is None:
+        return None
+    rows = ring.read(device.id, limit)
+    if rows is None:
+        return None
+    return [
+        Measurement(id=mid, device=device, ts=ts, temp_c=t, humidity=h, state=st)
+        for mid, ts, t, h, st in rows
+    ]
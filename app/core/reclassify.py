@@ -0,0 +1,205 @@
+# core/reclassify.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Measurement, ReclassifyJob
+from core.utils import classify_state_rules
+from core import counters, recent_ring, watermarks
+from core.aggregates import refresh_aggregates
+from core.sharding import db_for_device
+
+
+def _log(msg: str):
+    print(msg, flush=True)
+
+
+def _chunk_rows() -> int:
+    return max(1, int(getattr(settings, "RECLASSIFY_CHUNK_ROWS", 5000)))
+
+
+def _chunk_pause() -> float:
+    return float(getattr(settings, "RECLASSIFY_CHUNK_PAUSE_S", 0.2))
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=float(getattr(settings, "RECLASSIFY_JOB_STALE_S", 300)))
+
+
+class _Superseded(Exception):
+    """The job's lease went stale and another worker took it over."""
+
+
+def enqueue_reclassify(device, *, frm=None, to=None, reason: str = "manual") -> ReclassifyJob:
+    """
+    Queue a state recomputation for device in [frm, to] (open ends = all history).
+    A still-pending job for the same device and range is reused instead of duplicated.
+    """
+    pending = ReclassifyJob.objects.filter(device=device, status="PENDING", frm=frm, to=to).first()
+    if pending:
+        return pending
+    job = ReclassifyJob.objects.create(device=device, frm=frm, to=to, reason=reason)
+    _log(f"[reclassify] queued job #{job.id} {device.code} frm={frm} to={to} reason={reason}")
+    return job
+
+
+def _window(job, after):
+    qs = Measurement.objects.using(db_for_device(job.device)).filter(device_id=job.device_id)
+    if after is not None:
+        qs = qs.filter(ts__gt=after)
+    elif job.frm is not None:
+        qs = qs.filter(ts__gte=job.frm)
+    if job.to is not None:
+        qs = qs.filter(ts__lte=job.to)
+    return qs
+
+
+def _next_chunk_end(job, after):
+    """ts of the CHUNK-th row after the cursor (None = the rest fits in one chunk)."""
+    size = _chunk_rows()
+    ends = list(_window(job, after).order_by("ts").values_list("ts", flat=True)[size - 1:size])
+    return ends[0] if ends else None
+
+
+def run_reclassify_job(job: ReclassifyJob, *, log=_log) -> ReclassifyJob:
+    """
+    Recompute state chunk by chunk with set-based UPDATEs (only rows whose
+    state actually changes are written). Each chunk commits together with
+    the job checkpoint, and the loop sleeps between chunks so ingest keeps
+    the upper hand on the table. `job` must have been claimed (claim_job()).
+    """
+    device = job.device
+    rules = classify_state_rules(min_temp=device.min_temp, max_temp=device.max_temp)
+
+    if job.started_at is None:
+        job.started_at = timezone.now()
+        job.rows_total = _window(job, job.cursor_ts).count() + job.rows_scanned
+        job.save(update_fields=["started_at", "rows_total"])
+
+    try:
+        while True:
+            end = _next_chunk_end(job, job.cursor_ts)
+            # readings and the checkpoint may sit on different databases
+            with transaction.atomic(), transaction.atomic(using=db_for_device(job.device)):
+                window = _window(job, job.cursor_ts)
+                if end is not None:
+                    window = window.filter(ts__lte=end)
+                scanned = window.count()
+                changed = 0
+                for state, rule in rules:
+                    changed += window.filter(rule).exclude(state=state).update(state=state)
+
+                job.rows_scanned += scanned
+                job.rows_changed += changed
+                if end is not None:
+                    job.cursor_ts = end
+                # the checkpoint renews the lease; if another worker took the job over, roll the chunk back
+                now = timezone.now()
+                if not ReclassifyJob.objects.filter(
+                    id=job.id, status="RUNNING", heartbeat_at=job.heartbeat_at
+                ).update(
+                    cursor_ts=job.cursor_ts, rows_scanned=job.rows_scanned, rows_changed=job.rows_changed,
+                    heartbeat_at=now,
+                ):
+                    raise _Superseded()
+                job.heartbeat_at = now
+
+            log(
+                f"[reclassify] job #{job.id} {device.code} "
+                f"{job.rows_scanned}/{job.rows_total} scanned, {job.rows_changed} changed "
+                f"({job.progress:.0%})"
+            )
+            if end is None:
+                break
+            time.sleep(_chunk_pause())
+
+        # severe/critical counts etc. were derived from the old states
+        if job.rows_changed:
+            refresh_aggregates(job.device_id, job.frm, job.to)
+            recent_ring.invalidate(job.device_id)
+            counters.sync_device(job.device_id, refresh_last=True)
+            watermarks.touch(job.device_id)
+    except _Superseded:
+        log(f"[reclassify] job #{job.id} taken over by another worker, stopping")
+        job.refresh_from_db()
+        return job
+    except Exception as e:
+        job.status = "FAILED"
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        log(f"[reclassify] job #{job.id} failed: {e}")
+        return job
+
+    job.status = "DONE"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+    log(f"[reclassify] job #{job.id} done: {job.rows_changed} rows reclassified")
+    return job
+
+
+def claim_job(job: ReclassifyJob) -> bool:
+    """
+    Take `job` for this worker: a PENDING one, or a RUNNING one whose worker
+    stopped heartbeating (it resumes from the checkpoint). The conditional
+    UPDATE on (id, status, heartbeat_at) makes the claim exclusive.
+    """
+    if job.status == "RUNNING":
+        if job.heartbeat_at is not None and job.heartbeat_at >= timezone.now() - _stale_after():
+            return False
+    elif job.status != "PENDING":
+        return False
+    claimed = ReclassifyJob.objects.filter(id=job.id, status=job.status, heartbeat_at=job.heartbeat_at).update(
+        status="RUNNING", heartbeat_at=timezone.now()
+    )
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def _claim_next():
+    # Interrupted RUNNING jobs first (resume), then the oldest PENDING one.
+    stale = timezone.now() - _stale_after()
+    for qs in (
+        ReclassifyJob.objects.filter(Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True), status="RUNNING"),
+        ReclassifyJob.objects.filter(status="PENDING"),
+    ):
+        job = qs.order_by("created_at").first()
+        if job is not None and claim_job(job):
+            return job
+    return None
+
+
+def run_pending_reclassify_jobs(*, log=_log) -> int:
+    """Drain the queue; returns how many jobs were processed."""
+    done = 0
+    while True:
+        job = _claim_next()
+        if job is None:
+            return done
+        run_reclassify_job(job, log=log)
+        done += 1
+
+
+def job_as_dict(job: ReclassifyJob) -> dict:
+    return {
+        "id": job.id,
+        "device": job.device.code,
+        "from": job.frm,
+        "to": job.to,
+        "reason": job.reason,
+        "status": job.status,
+        "progress": round(job.progress, 4),
+        "rows_total": job.rows_total,
+        "rows_scanned": job.rows_scanned,
+        "rows_changed": job.rows_changed,
+        "cursor_ts": job.cursor_ts,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -3,6 +3,7 @@ from django.utils import timezone
 from datetime import timedelta
 from core.models import Ticket
 from core.notify import telegram_send
+from core import watermarks
 
 def send_open_ticket_reminders():
     now = timezone.now()
@@ -15,3 +16,4 @@ def send_open_ticket_reminders():
             t.last_notified_at = now
             t.attempt_count = (t.attempt_count or 0) + 1
             t.save(update_fields=["last_notified_at","attempt_count"])
+            watermarks.touch(t.device_id, tickets=True)
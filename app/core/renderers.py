@@ -0,0 +1,57 @@
+# core/renderers.py
+"""
+Default API renderer: orjson instead of json + DRF's encoder.
+
+orjson serializes datetimes, dates, UUIDs and dataclasses natively (and
+~10x faster), so views can hand it values() rows holding raw datetimes.
+OPT_UTC_Z keeps DRF's "2025-11-04T18:40:00Z" style for UTC timestamps.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import orjson
+from rest_framework.renderers import BaseRenderer
+
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj):
+    # whatever orjson can't do natively, the way DRF's JSONEncoder does it
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, timedelta):
+        return str(obj.total_seconds())
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "__iter__") and not isinstance(obj, (str, bytes)):
+        return list(obj)
+    return str(obj)  # lazy translation strings, ...
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None  # orjson always emits UTF-8
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=_default, option=_OPTIONS)
+
+
+class ColumnarJSONRenderer(ORJSONRenderer):
+    """
+    Selected by `?format=columnar`. Same JSON encoding; series views check
+    wants_columnar() and shape their payload as parallel arrays.
+    """
+    format = "columnar"
+
+
+def wants_columnar(request) -> bool:
+    return getattr(getattr(request, "accepted_renderer", None), "format", None) == "columnar"
+
+
+def epoch_ms(ts) -> int:
+    return int(ts.timestamp() * 1000)
@@ -0,0 +1,153 @@
+# core/rollups.py
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from core.models import Measurement, MeasurementRollup
+
+# pg_advisory_xact_lock(namespace, device_id): ingest takes it shared, a
+# rebuild takes it exclusive, so a rebuild never overwrites a concurrent
+# increment and always sees every committed reading of its slice.
+_LOCK_NAMESPACE = 0x524F4C4C  # "ROLL"
+
+_TABLE = MeasurementRollup._meta.db_table
+
+
+def _lock_device(device_id: int, *, using: str, shared: bool):
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return
+    fn = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {fn}(%s, %s)", [_LOCK_NAMESPACE, int(device_id) & 0x7FFFFFFF])
+
+
+def hour_floor(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _least(col):
+    return (
+        f"CASE WHEN EXCLUDED.{col} IS NULL THEN {_TABLE}.{col} "
+        f"WHEN {_TABLE}.{col} IS NULL OR EXCLUDED.{col} < {_TABLE}.{col} THEN EXCLUDED.{col} "
+        f"ELSE {_TABLE}.{col} END"
+    )
+
+
+def _greatest(col):
+    return (
+        f"CASE WHEN EXCLUDED.{col} IS NULL THEN {_TABLE}.{col} "
+        f"WHEN {_TABLE}.{col} IS NULL OR EXCLUDED.{col} > {_TABLE}.{col} THEN EXCLUDED.{col} "
+        f"ELSE {_TABLE}.{col} END"
+    )
+
+
+_UPSERT_SQL = f"""
+    INSERT INTO {_TABLE} (device_id, bucket_start, n, temp_sum, temp_min, temp_max,
+                          hum_n, hum_sum, hum_min, hum_max, severe_n, critical_n, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (device_id, bucket_start) DO UPDATE SET
+        n = {_TABLE}.n + EXCLUDED.n,
+        temp_sum = {_TABLE}.temp_sum + EXCLUDED.temp_sum,
+        temp_min = {_least("temp_min")},
+        temp_max = {_greatest("temp_max")},
+        hum_n = {_TABLE}.hum_n + EXCLUDED.hum_n,
+        hum_sum = {_TABLE}.hum_sum + EXCLUDED.hum_sum,
+        hum_min = {_least("hum_min")},
+        hum_max = {_greatest("hum_max")},
+        severe_n = {_TABLE}.severe_n + EXCLUDED.severe_n,
+        critical_n = {_TABLE}.critical_n + EXCLUDED.critical_n,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def lock_for_ingest(device_id: int, *, using: str = "default"):
+    """Call inside the ingest transaction, before inserting the reading."""
+    _lock_device(device_id, using=using, shared=True)
+
+
+def add_reading(m: Measurement, *, using: str = "default"):
+    """Fold one freshly inserted reading into its hourly bucket (same transaction)."""
+    add_readings([m], using=using)
+
+
+def add_readings(readings, *, using: str = "default"):
+    """Fold freshly inserted readings into their hourly buckets: one upsert per (device, hour)."""
+    buckets = {}
+    for m in readings:
+        key = (m.device_id, hour_floor(m.ts))
+        n, t_sum, t_min, t_max, h_n, h_sum, h_min, h_max, severe, critical = buckets.get(
+            key, (0, 0.0, None, None, 0, 0.0, None, None, 0, 0)
+        )
+        hum = m.humidity
+        buckets[key] = (
+            n + 1, t_sum + m.temp_c,
+            m.temp_c if t_min is None else min(t_min, m.temp_c),
+            m.temp_c if t_max is None else max(t_max, m.temp_c),
+            h_n + (hum is not None), h_sum + (hum or 0.0),
+            h_min if hum is None else (hum if h_min is None else min(h_min, hum)),
+            h_max if hum is None else (hum if h_max is None else max(h_max, hum)),
+            severe + (m.state == "SEVERE"), critical + (m.state == "CRITICAL"),
+        )
+    now = timezone.now()
+    with connections[using].cursor() as cur:
+        cur.executemany(_UPSERT_SQL, [[device_id, start, *agg, now] for (device_id, start), agg in buckets.items()])
+
+
+def rebuild_rollups(device_id: int, frm, to, *, using: str = "default") -> int:
+    """
+    Recompute the hourly buckets covering [frm, to) for one device from raw
+    rows. Returns the number of raw rows aggregated.
+    """
+    lo = hour_floor(frm)
+    hi = hour_floor(to)
+    if hi < to:
+        hi += timedelta(hours=1)
+
+    with transaction.atomic(using=using):
+        _lock_device(device_id, using=using, shared=False)
+        rows = list(
+            Measurement.objects.using(using)
+            .filter(device_id=device_id, ts__gte=lo, ts__lt=hi)
+            .annotate(bucket=TruncHour("ts"))
+            .values("bucket")
+            .order_by("bucket")
+            .annotate(
+                n=Count("id"),
+                temp_sum=Sum("temp_c"),
+                temp_min=Min("temp_c"),
+                temp_max=Max("temp_c"),
+                hum_n=Count("humidity"),
+                hum_sum=Sum("humidity"),
+                hum_min=Min("humidity"),
+                hum_max=Max("humidity"),
+                severe_n=Count("id", filter=Q(state="SEVERE")),
+                critical_n=Count("id", filter=Q(state="CRITICAL")),
+            )
+        )
+        MeasurementRollup.objects.using(using).filter(
+            device_id=device_id, bucket_start__gte=lo, bucket_start__lt=hi
+        ).delete()
+        now = timezone.now()
+        MeasurementRollup.objects.using(using).bulk_create([
+            MeasurementRollup(
+                device_id=device_id,
+                bucket_start=r["bucket"],
+                n=r["n"],
+                temp_sum=r["temp_sum"] or 0.0,
+                temp_min=r["temp_min"],
+                temp_max=r["temp_max"],
+                hum_n=r["hum_n"],
+                hum_sum=r["hum_sum"] or 0.0,
+                hum_min=r["hum_min"],
+                hum_max=r["hum_max"],
+                severe_n=r["severe_n"],
+                critical_n=r["critical_n"],
+                updated_at=now,
+            )
+            for r in rows
+        ], batch_size=1000)
+    return sum(r["n"] for r in rows)
@@ -5,7 +5,9 @@ This lets other modules safely do:  from app.core.serializers import <Serializer
 """
 
 # Core measurement serializers
-from .measurement_serializer import MeasurementSerializer, IngestMeasurementSerializer
+from .measurement_serializer import (
+    MeasurementSerializer, IngestMeasurementSerializer, MEASUREMENT_VALUES, measurement_rows,
+)
 
 # Device serializers (support both naming styles)
 try:
@@ -42,6 +44,8 @@ __all__ = [
     # Measurements
     "MeasurementSerializer",
     "IngestMeasurementSerializer",
+    "MEASUREMENT_VALUES",
+    "measurement_rows",
 
     # Devices
     "DeviceCreateSerializer",
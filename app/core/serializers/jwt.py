@@ -1,11 +1,21 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
+from core.authentication import token_claims
 
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 class TokenObtainPairWithUserSerializer(TokenObtainPairSerializer):
     username_field = "email"  
 
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in token_claims(user).items():
+            token[claim] = value
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
 
@@ -15,3 +25,21 @@ class TokenObtainPairWithUserSerializer(TokenObtainPairSerializer):
             "is_staff": self.user.is_staff,
         }
         return data
+
+
+class TokenRefreshWithClaimsSerializer(TokenRefreshSerializer):
+    """Refresh re-reads the user, so new access tokens carry current claims (and inactive users get none)."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)  # also rejects inactive users
+        refresh = self.token_class(attrs["refresh"])
+        user = get_user_model().objects.filter(
+            **{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None:
+            raise InvalidToken("User no longer exists")
+        access = refresh.access_token
+        for claim, value in token_claims(user).items():
+            access[claim] = value
+        data["access"] = str(access)
+        return data
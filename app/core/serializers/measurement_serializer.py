@@ -1,9 +1,8 @@
 from rest_framework import serializers
-from django.utils import timezone
-from django.conf import settings
 
-from core.models import Measurement, Device, Ticket
-from core.utils import notify_role, classify_state
+from core.models import Measurement, Device
+from core.services.measurements import MeasurementService
+from core.services.tickets import TicketService
 
 
 class MeasurementSerializer(serializers.ModelSerializer):
@@ -14,11 +13,42 @@ class MeasurementSerializer(serializers.ModelSerializer):
         fields = ("id", "deviceCode", "ts", "temp_c", "humidity", "state")
 
 
+# columns behind measurement_rows(): fetch readings with .values(*MEASUREMENT_VALUES)
+MEASUREMENT_VALUES = ("id", "device_id", "ts", "temp_c", "humidity", "state")
+
+
+def measurement_rows(rows) -> list:
+    """
+    MeasurementSerializer's output for a list of values() rows, without
+    per-row field objects: device codes come from one query and `ts` stays a
+    datetime for the renderer (core.renderers) to encode.
+    """
+    codes = dict(Device.objects.filter(id__in={r["device_id"] for r in rows}).values_list("id", "code"))
+    return [
+        {
+            "id": r["id"],
+            "deviceCode": codes.get(r["device_id"]),
+            "ts": r["ts"],
+            "temp_c": r["temp_c"],
+            "humidity": r["humidity"],
+            "state": r["state"],
+        }
+        for r in rows
+    ]
+
+
+_TEMP_FIELD = Measurement._meta.get_field("temp_c")
+_HUM_FIELD = Measurement._meta.get_field("humidity")
+
+
 class IngestMeasurementSerializer(serializers.Serializer):
     deviceId = serializers.CharField(max_length=64)
     ts = serializers.DateTimeField()
-    tempC = serializers.FloatField()
-    humidity = serializers.FloatField(required=False, allow_null=True)
+    # bounds follow the compact smallint storage (value * 10)
+    tempC = serializers.FloatField(min_value=_TEMP_FIELD.min_value, max_value=_TEMP_FIELD.max_value)
+    humidity = serializers.FloatField(
+        required=False, allow_null=True, min_value=_HUM_FIELD.min_value, max_value=_HUM_FIELD.max_value
+    )
 
     def create(self, validated_data):
         code = validated_data["deviceId"]
@@ -27,47 +57,9 @@ class IngestMeasurementSerializer(serializers.Serializer):
         hum = validated_data.get("humidity")
         ts = validated_data["ts"]
 
-        state = classify_state(
-            temp,
-            min_temp=device.min_temp,
-            max_temp=device.max_temp,
-        )
-
-        m = Measurement.objects.create(
-            device=device, ts=ts, temp_c=temp, humidity=hum, state=state
-        )
-
-        if state == "NORMAL":
-            Ticket.objects.filter(device=device, status="OPEN").update(
-                status="CLOSED", closed_at=timezone.now(), attempt_count=0
-            )
-        else:
-            t, created = Ticket.objects.get_or_create(
-                device=device,
-                status="OPEN",
-                defaults={"severity": ("CRITICAL" if state == "CRITICAL" else "SEVERE")},
-            )
-            if created:
-                t.last_notified_role_index = 0
-                t.attempt_count = 1
-                t.save()
-                notify_role(t.last_notified_role_index, t)
-            else:
-                if state == "CRITICAL" and t.severity != "CRITICAL":
-                    t.severity = "CRITICAL"
-                if t.acked_at is None:
-                    t.attempt_count += 1
-                    roles = getattr(settings, "ESCALATION_ROLES", [])
-                    if t.attempt_count >= 4 and roles:
-                        max_idx = max(0, len(roles) - 1)
-                        new_idx = min(t.last_notified_role_index + 1, max_idx)
-                        if new_idx != t.last_notified_role_index:
-                            t.last_notified_role_index = new_idx
-                            t.attempt_count = 0
-                            t.save()
-                            notify_role(t.last_notified_role_index, t)
-                        else:
-                            t.attempt_count = 0
-                t.save()
+        # record() classifies the value as stored
+        m = MeasurementService.record(device=device, ts=ts, temp_c=temp, humidity=hum)
+
+        TicketService.on_reading_states(device, [m.state])
 
         return m
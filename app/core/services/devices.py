@@ -1,6 +1,12 @@
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery
 from django.utils import timezone
 from django.http import Http404
-from core.models import Device
+from rest_framework.exceptions import ValidationError
+from core import counters, credentials, recent_ring, watermarks
+from core.models import Device, Measurement
+from core.reclassify import enqueue_reclassify
+from core.sharding import db_for_device, db_for_site, devices_by_db, fan_out, sharded_models
 
 # Map public API keys -> real model fields
 _FIELD_ALIASES = {
@@ -20,10 +26,27 @@ def _device_field_names():
 
 _DEVICE_FIELDS = _device_field_names()
 
+_UNSET = object()
+
+# thresholds={"min": .., "max": ..} (or min_temp/max_temp) -> model fields
+_THRESHOLD_ALIASES = {
+    "min": "min_temp",
+    "max": "max_temp",
+    "min_temp": "min_temp",
+    "max_temp": "max_temp",
+}
+
+_THRESHOLD_FIELDS = ("min_temp", "max_temp")
+
 def _apply_aliases(data: dict) -> dict:
     """Map external keys (name/location/active) to real model fields (label/site/is_active)."""
     mapped = {}
     for k, v in data.items():
+        if k == "thresholds" and isinstance(v, dict):
+            for tk, tv in v.items():
+                if tk in _THRESHOLD_ALIASES:
+                    mapped[_THRESHOLD_ALIASES[tk]] = tv
+            continue
         real = _FIELD_ALIASES.get(k, k)   # e.g. 'location' -> 'site'
         mapped[real] = v
     return mapped
@@ -58,12 +81,57 @@ class DeviceService:
             return None, {"detail": "Device code already exists."}
 
         dev = Device.objects.create(**payload)
+        counters.sync_device(dev.id)
+        watermarks.touch(dev.id)
+        credentials.invalidate()
         return dev, None
 
     @staticmethod
-    def detail_as_dict(device):
-        # latest reading if you have related name "measurements"
-        latest = device.measurements.order_by("-ts").first() if hasattr(device, "measurements") else None
+    def credentials_as_dict(device) -> dict:
+        return {"code": device.code, "key_version": device.key_version, "key": credentials.api_key(device)}
+
+    @staticmethod
+    def rotate_key(device):
+        """New ingest key: the old one stops working (other processes: within DEVICE_CREDENTIALS_TTL_S)."""
+        Device.objects.filter(pk=device.pk).update(key_version=F("key_version") + 1)
+        device.refresh_from_db(fields=["key_version"])
+        credentials.invalidate()
+        return device
+
+    @staticmethod
+    def latest_readings(devices) -> dict:
+        """{device_id: latest Measurement or None}: ring first, then one query per shard, in parallel."""
+        out, missing = {}, []
+        for d in devices:
+            cached = recent_ring.recent(d, 1)
+            if cached is None:
+                missing.append(d)
+            else:
+                out[d.id] = cached[0] if cached else None
+
+        groups = devices_by_db(missing)
+
+        def _latest_on(alias):
+            newest = (
+                Measurement.objects.using(alias)
+                .filter(device_id=OuterRef("device_id"))
+                .order_by("-ts", "-id")
+                .values("id")[:1]
+            )
+            return list(
+                Measurement.objects.using(alias)
+                .filter(device_id__in=[d.id for d in groups[alias]], id=Subquery(newest))
+            )
+
+        for rows in fan_out(_latest_on, groups).values():
+            for m in rows:
+                out[m.device_id] = m
+        return out
+
+    @staticmethod
+    def detail_as_dict(device, latest=_UNSET):
+        if latest is _UNSET:
+            latest = DeviceService.latest_readings([device]).get(device.id)
 
         return {
             "code": device.code,
@@ -80,6 +148,14 @@ class DeviceService:
     def update_device(device, data: dict):
         # map aliases and update only real fields
         data = _apply_aliases(data)
+        before = {f: getattr(device, f) for f in _THRESHOLD_FIELDS}
+
+        # a new site may map to another database; existing readings would be stranded
+        if "site" in data and db_for_site(data["site"]) != db_for_device(device):
+            if device.measurements.exists():
+                raise ValidationError(
+                    {"location": "This site is stored on another database; move the device's readings first."}
+                )
         changed = False
         for k, v in data.items():
             if k in _DEVICE_FIELDS:
@@ -87,22 +163,53 @@ class DeviceService:
                 changed = True
         if changed:
             device.save()
+            counters.sync_device(device.id)
+            watermarks.touch(device.id)
+            credentials.invalidate()
+
+        # history was classified with the old thresholds -> recompute it
+        if any(getattr(device, f) != before[f] for f in _THRESHOLD_FIELDS):
+            if getattr(settings, "RECLASSIFY_ON_THRESHOLD_CHANGE", True):
+                enqueue_reclassify(device, reason="thresholds")
         return device
 
     @staticmethod
     def deactivate_or_delete(device, hard=False):
         if hard:
+            device_id = device.id
+            # readings may live on a shard, where the cascade from core_device can't reach
+            using = db_for_device(device)
+            for model in sharded_models():
+                model.objects.using(using).filter(device_id=device_id).delete()
+            counters.forget_device(device_id)
+            watermarks.touch(device_id)
             device.delete()
+            recent_ring.invalidate(device_id)
+            credentials.invalidate()
             return True
         if "is_active" in _DEVICE_FIELDS and getattr(device, "is_active", True):
             device.is_active = False
             device.save(update_fields=["is_active"])
+            counters.sync_device(device.id)
+            watermarks.touch(device.id)
+            credentials.invalidate()
         return True
 
     @staticmethod
     def list_with_latest():
         items = []
-        for d in Device.objects.filter(is_active=True):
-            items.append(DeviceService.detail_as_dict(d))
+        devices = list(Device.objects.filter(is_active=True))
+        latest = DeviceService.latest_readings(devices)
+        for d in devices:
+            items.append(DeviceService.detail_as_dict(d, latest=latest.get(d.id)))
         # (optionally sort by code or latest ts)
         return items
+
+    @staticmethod
+    def dashboard_summary(site: str | None = None):
+        """Fleet (or one site's) counters plus a per-site breakdown; reads only counter rows."""
+        if site is not None:
+            return {"site": site, **counters.snapshot(site)}
+        scopes = counters.snapshot_all()
+        fleet = scopes.pop(counters.FLEET)
+        return {**fleet, "sites": dict(sorted(scopes.items()))}
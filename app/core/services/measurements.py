@@ -1,5 +1,16 @@
+import heapq
+
+from django.db import transaction
 from django.db.models import Avg, Min, Max
 from core.models import Measurement, Device
+from core import bucket_cache, compliance, counters, excursions, live, recent_ring, rollups, watermarks
+from core.pagination import NEXT, encode_cursor, keyset_page
+from core.sharding import db_for_device, devices_by_db, fan_out, shard_aliases
+from core.utils import classify_state
+
+_TEMP_FIELD = Measurement._meta.get_field("temp_c")
+_HUM_FIELD = Measurement._meta.get_field("humidity")
+
 
 class MeasurementService:
     @staticmethod
@@ -7,9 +18,68 @@ class MeasurementService:
         """Serializer already validated. Use its create() to persist and return Measurement."""
         return serializer.save()
 
+    @staticmethod
+    def record(*, device: Device, ts, temp_c: float, humidity=None, state: str | None = None):
+        """
+        Insert one reading and fold it into the derived aggregates in the same
+        transaction. Every ingest path (HTTP, MQTT, import) goes through here.
+        Values are put on the stored grid first, so the state, the aggregates
+        and the returned Measurement all see what is stored.
+        """
+        temp_c, humidity = _TEMP_FIELD.quantize(temp_c), _HUM_FIELD.quantize(humidity)
+        if state is None:
+            state = classify_state(temp_c, min_temp=device.min_temp, max_temp=device.max_temp)
+        using = db_for_device(device)
+        with transaction.atomic(using=using):
+            rollups.lock_for_ingest(device.id, using=using)
+            m = Measurement.objects.using(using).create(
+                device=device, ts=ts, temp_c=temp_c, humidity=humidity, state=state
+            )
+            rollups.add_reading(m, using=using)
+            compliance.add_readings([m], using=using)
+            excursions.add_readings([m], using=using)
+            transaction.on_commit(lambda: recent_ring.publish(m), using=using)
+        bucket_cache.note_reading(device.id, ts, using=using)
+        counters.note_reading(device, state, ts)
+        watermarks.touch(device.id)
+        live.publish_reading(m)
+        return m
+
+    @staticmethod
+    def record_batch(*, device: Device, readings) -> list:
+        """
+        record() for many readings of one device: `readings` are dicts with
+        ts, temp_c, humidity and (optionally) state. One transaction, one
+        INSERT, one rollup upsert per hour touched, and each derived-state
+        hook called once for the whole batch. Returns the Measurements.
+        """
+        using = db_for_device(device)
+        rows = [
+            Measurement(device=device, ts=r["ts"], temp_c=_TEMP_FIELD.quantize(r["temp_c"]),
+                        humidity=_HUM_FIELD.quantize(r.get("humidity")), state=r.get("state"))
+            for r in readings
+        ]
+        for m in rows:
+            m.state = m.state or classify_state(m.temp_c, min_temp=device.min_temp, max_temp=device.max_temp)
+        if not rows:
+            return rows
+        with transaction.atomic(using=using):
+            rollups.lock_for_ingest(device.id, using=using)
+            rows = Measurement.objects.using(using).bulk_create(rows)
+            rollups.add_readings(rows, using=using)
+            compliance.add_readings(rows, using=using)
+            excursions.add_readings(rows, using=using)
+            transaction.on_commit(lambda: recent_ring.publish_many(rows), using=using)
+        bucket_cache.note_readings(device.id, [m.ts for m in rows], using=using)
+        newest = max(rows, key=lambda m: m.ts)
+        counters.note_reading(device, newest.state, newest.ts)
+        watermarks.touch(device.id)
+        live.publish_readings(rows)
+        return rows
+
     @staticmethod
     def series(*, device: Device, frm=None, to=None):
-        qs = Measurement.objects.filter(device=device)
+        qs = Measurement.objects.using(db_for_device(device)).filter(device=device)
         if frm:
             qs = qs.filter(ts__gte=frm)
         if to:
@@ -26,8 +96,94 @@ class MeasurementService:
 
     @staticmethod
     def recent_for_device(device: Device, *, limit: int = 100):
-        return Measurement.objects.filter(device=device).order_by("-ts")[:limit]
+        # served from the shared ring when the device is resident there
+        cached = recent_ring.recent(device, limit)
+        if cached is not None:
+            return cached
+        return Measurement.objects.using(db_for_device(device)).filter(device=device).order_by("-ts")[:limit]
 
     @staticmethod
-    def recent_all(*, limit: int = 100):
-        return Measurement.objects.all().order_by("-ts")[:limit]
+    def recent_all(*, limit: int = 100, fields=("id", "device_id", "ts", "temp_c", "humidity", "state")):
+        """Newest readings across every site (values() dicts): top `limit` per shard, merged."""
+        per_shard = fan_out(
+            lambda alias: list(Measurement.objects.using(alias).order_by("-ts", "-id").values(*fields)[:limit])
+        )
+        merged = heapq.merge(*per_shard.values(), key=lambda r: (r["ts"], r["id"]), reverse=True)
+        return list(merged)[:limit]
+
+    @staticmethod
+    def page(*, device: Device | None = None, frm=None, to=None, size: int, cursor=None, descending: bool = False,
+             fields=None):
+        """
+        One keyset page of readings in (ts, id) order (newest first when
+        descending), for one device or across every site; with `fields`, rows
+        are values() dicts of those columns instead of instances.
+        Returns (rows, next_cursor, prev_cursor).
+        """
+        if device is not None:
+            if descending and cursor is None and frm is None and to is None:
+                # first "recent" page straight from the shared ring
+                cached = recent_ring.recent(device, size + 1)
+                if cached is not None:
+                    if fields:
+                        cached = [{f: getattr(m, f) for f in fields} for m in cached]
+                    rows = cached[:size]
+                    more = len(cached) > size
+                    return rows, (encode_cursor(rows[-1], NEXT) if more else None), None
+            using = db_for_device(device)
+            sources = {using: Measurement.objects.using(using).filter(device=device)}
+        else:
+            sources = {alias: Measurement.objects.using(alias).all() for alias in shard_aliases()}
+
+        for alias, qs in sources.items():
+            if frm:
+                qs = qs.filter(ts__gte=frm)
+            if to:
+                qs = qs.filter(ts__lte=to)
+            sources[alias] = qs
+        return keyset_page(sources, size=size, cursor=cursor, descending=descending, fields=fields)
+
+    SERIES_METRICS = {
+        "temp": Avg("temp_c"),
+        "temp_min": Min("temp_c"),
+        "temp_max": Max("temp_c"),
+        "humidity": Avg("humidity"),
+    }
+
+    @staticmethod
+    def aligned_series(devices, *, frm, to, trunc, metric: str = "temp") -> dict:
+        """
+        One bucketed value per (device, bucket), pivoted onto a shared time
+        axis: {"t": [bucket...], "series": {code: [value|None, ...]}}.
+        A single grouped query per shard, run in parallel.
+        """
+        groups = devices_by_db(devices)
+        expr = MeasurementService.SERIES_METRICS[metric]
+
+        def _grouped(alias):
+            return list(
+                Measurement.objects.using(alias)
+                .filter(device_id__in=[d.id for d in groups[alias]], ts__gte=frm, ts__lte=to)
+                .annotate(bucket_ts=trunc("ts"))
+                .values("device_id", "bucket_ts")
+                .order_by()
+                .annotate(value=expr)
+                .values_list("device_id", "bucket_ts", "value")
+            )
+
+        cells = {}
+        for rows in fan_out(_grouped, groups).values():
+            for device_id, bucket_ts, value in rows:
+                cells[(device_id, bucket_ts)] = value
+
+        axis = sorted({b for _, b in cells})
+        return {
+            "t": axis,
+            "series": {
+                d.code: [
+                    None if cells.get((d.id, b)) is None else round(cells[(d.id, b)], 2)
+                    for b in axis
+                ]
+                for d in devices
+            },
+        }
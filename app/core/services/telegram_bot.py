@@ -1,7 +1,7 @@
 import json
 from django.utils import timezone
 from django.conf import settings
-from core.models import Ticket, Measurement
+from core.models import Ticket
 from core.utils import send_telegram_message  # you already have this
 
 class TelegramBotService:
@@ -47,7 +47,7 @@ class TelegramBotService:
         lines = ["📊 *Open tickets:*"]
         now_dt = timezone.now()
         for t in qs[:10]:
-            latest = Measurement.objects.filter(device=t.device).order_by("-ts").first()
+            latest = t.device.measurements.order_by("-ts").first()
             temp = f"{latest.temp_c:.1f}°C" if latest and latest.temp_c is not None else "—"
             hum = f"{latest.humidity:.0f}%" if latest and latest.humidity is not None else "—"
             age = int((now_dt - t.opened_at).total_seconds() // 60)
@@ -63,7 +63,7 @@ class TelegramBotService:
     def reply_ack(chat_id, res, sender_name):
         if res.get("ok"):
             t = Ticket.objects.get(id=res["ticketId"])
-            latest = Measurement.objects.filter(device=t.device).order_by("-ts").first()
+            latest = t.device.measurements.order_by("-ts").first()
             temp_txt = f"{latest.temp_c:.1f}°C" if latest and latest.temp_c is not None else "—"
             TelegramBotService.send_md(
                 chat_id,
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.utils import timezone
+from core import counters, live, watermarks
 from core.models import Ticket
+from core.utils import notify_role
 
 class TicketService:
     @staticmethod
@@ -34,6 +37,9 @@ class TicketService:
         t.acked_at = timezone.now()
         t.attempt_count = 0
         t.save()
+        counters.sync_tickets(t.device_id)
+        watermarks.touch(t.device_id, tickets=True)
+        live.publish_ticket(t, "acked")
         return {"ok": True, "ticketId": t.id, "acked_by": t.acked_by, "acked_at": t.acked_at}
     @staticmethod
     def get_one_as_dict(ticket_id: int):
@@ -79,4 +85,84 @@ class TicketService:
             t.resolved_at = timezone.now()
             t.state = "RESOLVED"
             t.save(update_fields=["resolution", "resolved_at", "state"])
+        counters.sync_tickets(t.device_id)
+        watermarks.touch(t.device_id, tickets=True)
+        live.publish_ticket(t, "resolved")
         return {"ok": True, "ticket_id": t.id, "resolution": resolution}
+
+    @staticmethod
+    def on_reading_states(device, states):
+        """
+        Ingest-side ticket handling for a device's new readings, states in
+        time order. Each run of consecutive NORMAL / violating states is
+        applied once, with the same outcome as feeding them one by one: a
+        NORMAL run closes the open ticket; a violating run opens one (or
+        escalates it to CRITICAL) and advances the unacked attempt count,
+        stepping up the notified role every 4 attempts.
+        """
+        run = []
+        for state in list(states) + [None]:
+            if run and (state is None or (state == "NORMAL") != (run[0] == "NORMAL")):
+                if run[0] == "NORMAL":
+                    TicketService._close_on_normal(device)
+                else:
+                    TicketService._note_violations(device, run)
+                run = []
+            if state is not None:
+                run.append(state)
+
+    @staticmethod
+    def _close_on_normal(device):
+        closing = list(Ticket.objects.filter(device=device, status="OPEN").values_list("id", flat=True))
+        closed = Ticket.objects.filter(id__in=closing).update(
+            status="CLOSED", closed_at=timezone.now(), attempt_count=0
+        )
+        if closed:
+            counters.sync_tickets(device.id)
+            watermarks.touch(device.id, tickets=True)
+            for t in Ticket.objects.filter(id__in=closing).select_related("device"):
+                live.publish_ticket(t, "closed")
+
+    @staticmethod
+    def _note_violations(device, states):
+        t, created = Ticket.objects.get_or_create(
+            device=device,
+            status="OPEN",
+            defaults={"severity": ("CRITICAL" if states[0] == "CRITICAL" else "SEVERE")},
+        )
+        if created:
+            t.last_notified_role_index = 0
+            t.attempt_count = 1
+            t.save()
+            counters.sync_tickets(device.id)
+            watermarks.touch(device.id, tickets=True)
+            live.publish_ticket(t, "opened")
+            notify_role(t.last_notified_role_index, t)
+            states = states[1:]
+            if not states:
+                return
+
+        escalated = False
+        roles = getattr(settings, "ESCALATION_ROLES", [])
+        for state in states:
+            if state == "CRITICAL" and t.severity != "CRITICAL":
+                t.severity = "CRITICAL"
+                escalated = True
+            if t.acked_at is None:
+                t.attempt_count += 1
+                if t.attempt_count >= 4 and roles:
+                    max_idx = max(0, len(roles) - 1)
+                    new_idx = min(t.last_notified_role_index + 1, max_idx)
+                    if new_idx != t.last_notified_role_index:
+                        t.last_notified_role_index = new_idx
+                        t.attempt_count = 0
+                        t.save()
+                        notify_role(t.last_notified_role_index, t)
+                    else:
+                        t.attempt_count = 0
+        t.save()
+        if escalated:
+            counters.sync_tickets(device.id)
+            live.publish_ticket(t, "escalated")
+        # attempt/role bookkeeping shows in the open-ticket list too
+        watermarks.touch(device.id, tickets=True)
@@ -0,0 +1,121 @@
+# core/sharding.py
+"""
+Per-site placement of measurement data across databases.
+
+Measurement and the tables derived from it (SHARDED_MODELS) live on the
+database chosen for the device's site (settings.MEASUREMENT_SITE_SHARDS,
+unmapped sites -> MEASUREMENT_DEFAULT_SHARD); everything else stays on
+"default". Readings carry no FK constraint to core_device for that reason.
+
+The router can only place a query when Django passes an instance hint
+(save(), device.measurements, ...). Plain `Measurement.objects.filter(..)`
+has no hint and would hit "default", so code that reads readings picks the
+database explicitly with `.using(db_for_device(device))`, or `fan_out()`
+for queries spanning every site.
+
+Every database gets the full core schema (`migrate --database <alias>`),
+so migrations stay linear; metadata tables on shards are simply unused.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.models import Device
+
+SHARDED_MODELS = {
+    "measurement", "measurementrollup", "metricsbucket", "metricsbucketcoverage", "complianceday", "excursion",
+}
+
+
+def _is_sharded(model) -> bool:
+    return model._meta.app_label == "core" and model._meta.model_name in SHARDED_MODELS
+
+
+def sharded_models():
+    from django.apps import apps
+    return [m for m in apps.get_app_config("core").get_models() if _is_sharded(m)]
+
+
+def db_for_site(site: str) -> str:
+    site_map = getattr(settings, "MEASUREMENT_SITE_SHARDS", {}) or {}
+    alias = site_map.get(site or "") or getattr(settings, "MEASUREMENT_DEFAULT_SHARD", DEFAULT_DB_ALIAS)
+    if alias not in settings.DATABASES:
+        raise ImproperlyConfigured(f"Measurement shard {alias!r} (site {site!r}) is not in DATABASES")
+    return alias
+
+
+def db_for_device(device) -> str:
+    """Database holding the readings of a Device (instance or id)."""
+    if isinstance(device, Device):
+        return db_for_site(device.site)
+    site = Device.objects.using(DEFAULT_DB_ALIAS).filter(id=device).values_list("site", flat=True).first()
+    return db_for_site(site or "")
+
+
+def shard_aliases() -> list:
+    """Every database that may hold readings, "default" first."""
+    site_map = getattr(settings, "MEASUREMENT_SITE_SHARDS", {}) or {}
+    aliases = {getattr(settings, "MEASUREMENT_DEFAULT_SHARD", DEFAULT_DB_ALIAS), *site_map.values()}
+    return sorted(aliases, key=lambda a: (a != DEFAULT_DB_ALIAS, a))
+
+
+def devices_by_db(devices) -> dict:
+    """{alias: [device, ...]} for an iterable of Device instances."""
+    out = {}
+    for d in devices:
+        out.setdefault(db_for_device(d), []).append(d)
+    return out
+
+
+def _run_on(fn, alias):
+    try:
+        return fn(alias)
+    finally:
+        # connections are per thread; don't leak one per fan-out call
+        connections[alias].close()
+
+
+def fan_out(fn, aliases=None) -> dict:
+    """
+    Run fn(alias) against each shard in parallel and return {alias: result}.
+    A single shard runs inline, on the caller's connection.
+    """
+    aliases = list(aliases if aliases is not None else shard_aliases())
+    if len(aliases) <= 1:
+        return {a: fn(a) for a in aliases}
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        futures = {a: pool.submit(_run_on, fn, a) for a in aliases}
+        return {a: f.result() for a, f in futures.items()}
+
+
+class MeasurementRouter:
+    """Readings follow their device's site; every other model stays on default."""
+
+    def _route(self, model, **hints):
+        if not _is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+        if isinstance(instance, Device):
+            return db_for_site(instance.site)
+        device = instance._state.fields_cache.get("device")
+        if device is not None:
+            return db_for_site(device.site)
+        if getattr(instance, "device_id", None):
+            return db_for_device(instance.device_id)
+        return instance._state.db
+
+    db_for_read = _route
+    db_for_write = _route
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # reading (shard) -> device (default) is the one cross-database relation
+        if _is_sharded(type(obj1)) or _is_sharded(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
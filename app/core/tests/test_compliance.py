@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase, override_settings
+
+from core import compliance
+from core.models import ComplianceDay, Device, Measurement
+from core.utils import classify_state
+
+_START = datetime(2025, 3, 1, 20, 0, tzinfo=dt_timezone.utc)
+# minutes from _START: a 110 min and a 6 h gap (capped), intervals across
+# two UTC midnights, a reading exactly at midnight, out-of-range runs
+_OFFSETS = [0, 15, 30, 90, 200, 235, 250, 260, 600, 610, 655, 1440 + 220, 1440 + 240, 1440 + 245, 1440 + 300]
+_TEMPS = [5.0, 5.5, 9.5, 14.2, 4.0, 1.5, -4.0, 6.0, 6.1, 7.9, 8.0, 5.2, 12.5, 5.0, 4.4]
+
+
+@override_settings(COMPLIANCE_MAX_GAP_S=3600)
+class IncrementalMatchesRebuildTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(code="C1", min_temp=2.0, max_temp=8.0)
+        self.readings = [
+            (_START + timedelta(minutes=m), t, classify_state(t, min_temp=2.0, max_temp=8.0))
+            for m, t in zip(_OFFSETS, _TEMPS)
+        ]
+
+    def feed(self, readings, batch=1):
+        for i in range(0, len(readings), batch):
+            rows = [Measurement.objects.create(device=self.device, ts=ts, temp_c=t, state=s)
+                    for ts, t, s in readings[i:i + batch]]
+            compliance.add_readings(rows)
+
+    def days(self):
+        return [
+            (r.day, r.n, float(f"{r.arrhenius_sum:.9e}"), r.temp_min, r.temp_max, round(r.observed_s, 6),
+             round(r.out_of_range_s, 6), r.last_ts, r.last_out)
+            for r in ComplianceDay.objects.filter(device_id=self.device.id).order_by("day")
+        ]
+
+    def assertMatchesRebuild(self):
+        incremental = self.days()
+        counted = compliance.rebuild_compliance(
+            self.device.id, _START, self.readings[-1][0] + timedelta(seconds=1)
+        )
+        self.assertEqual(counted, len(self.readings))
+        self.assertEqual(incremental, self.days())
+        return incremental
+
+    def test_in_order(self):
+        self.feed(self.readings)
+        days = self.assertMatchesRebuild()
+        self.assertEqual([d[0].day for d in days], [1, 2, 3])
+        self.assertEqual(sum(d[1] for d in days), len(self.readings))
+
+    def test_in_order_batches(self):
+        self.feed(self.readings, batch=4)
+        self.assertMatchesRebuild()
+
+    def test_late_readings(self):
+        self.feed(self.readings[::-1])
+        self.assertMatchesRebuild()
+
+    def test_shuffled_batches(self):
+        readings = list(self.readings)
+        random.Random(5).shuffle(readings)
+        self.feed(readings, batch=3)
+        self.assertMatchesRebuild()
+
+    def test_midnight_split_and_gap_cap(self):
+        self.feed(self.readings)
+        first, second, _ = self.assertMatchesRebuild()
+        # day 1 holds 15, 15, 60, 60 (110 capped), 35 and the 5 minutes of 23:55 -> 00:10 before midnight
+        self.assertEqual(first[5], (15 + 15 + 60 + 60 + 35 + 5) * 60)
+        self.assertEqual(first[6], (60 + 60 + 5) * 60)  # 9.5, 14.2 (capped) and 1.5 are out of range
+        self.assertEqual(second[0].day, 2)
+        self.assertEqual(first[1], 6)
+        self.assertEqual(first[7], _START + timedelta(minutes=235))
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import credentials
+from core.models import Device, Measurement
+
+
+def _reading(code, **extra):
+    return {"deviceId": code, "ts": timezone.now().isoformat(), "tempC": 5.0, **extra}
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class DeviceAuthTests(TestCase):
+    def setUp(self):
+        Device.objects.create(code="K1")
+        user = get_user_model().objects.create_user(email="u@example.com", username="u", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        credentials.invalidate()
+        self.addCleanup(credentials.invalidate)
+
+    def test_required_by_default_once_keys_exist(self):
+        with self.settings(DEVICE_KEY_MASTER="k"):
+            del settings.DEVICE_AUTH_REQUIRED
+            self.assertTrue(credentials.required())
+        with self.settings(DEVICE_KEY_MASTER=""):
+            del settings.DEVICE_AUTH_REQUIRED
+            self.assertFalse(credentials.required())
+
+    @override_settings(DEVICE_KEY_MASTER="k", DEVICE_AUTH_REQUIRED=False)
+    def test_no_auto_created_devices_once_keys_exist(self):
+        r = self.client.post("/api/measurements/ingest", _reading("NEW1"), format="json")
+        self.assertEqual(r.status_code, 403)
+        r = self.client.post("/api/measurements/ingest/batch", [_reading("NEW2"), _reading("K1")], format="json")
+        self.assertEqual(r.status_code, 207)
+        self.assertEqual([x["status"] for x in r.data["results"]], ["invalid", "created"])
+        self.assertFalse(Device.objects.filter(code__startswith="NEW").exists())
+
+    @override_settings(DEVICE_KEY_MASTER="k")
+    def test_device_key_covers_its_own_device(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Device K1:{credentials.api_key(Device.objects.get(code='K1'))}")
+        self.assertEqual(client.post("/api/measurements/ingest", _reading("K1"), format="json").status_code, 201)
+        Device.objects.create(code="K2")
+        credentials.invalidate()
+        self.assertEqual(client.post("/api/measurements/ingest", _reading("K2"), format="json").status_code, 403)
+        self.assertEqual(Measurement.objects.count(), 1)
+
+    @override_settings(DEVICE_KEY_MASTER="", DEVICE_AUTH_REQUIRED=False)
+    def test_unknown_devices_are_created_without_keys(self):
+        r = self.client.post("/api/measurements/ingest", _reading("NEW3"), format="json")
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(Device.objects.filter(code="NEW3").exists())
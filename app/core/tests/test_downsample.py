@@ -0,0 +1,94 @@
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from core.downsample import downsample_params, downsample_rows, lttb, minmax
+
+
+def _lttb_reference(x, y, n):
+    """Textbook LTTB, one bucket at a time (same bucket boundaries)."""
+    size = len(x)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    out, a = [0], 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    return out + [size - 1]
+
+
+class LttbTests(SimpleTestCase):
+    def test_matches_the_reference(self):
+        rng = np.random.default_rng(7)
+        for size, n in ((1000, 50), (997, 13), (120, 119), (64, 3)):
+            x = np.cumsum(rng.uniform(1, 60, size))
+            y = np.sin(x / 500) * 10 + rng.normal(0, 1, size)
+            self.assertEqual(lttb(x, y, n).tolist(), _lttb_reference(x, y, n), (size, n))
+
+    def test_small_inputs(self):
+        self.assertEqual(lttb([1, 2, 3], [1, 2, 3], 10).tolist(), [0, 1, 2])
+        self.assertEqual(lttb(range(10), range(10), 2).tolist(), [0, 9])
+
+    def test_gaps_never_win_a_bucket(self):
+        x = np.arange(100, dtype=float)
+        y = np.zeros(100)
+        y[1:99:2] = np.nan
+        y[50] = 40.0
+        kept = lttb(x, y, 10)
+        self.assertTrue(all(not np.isnan(y[i]) for i in kept))
+        self.assertIn(50, kept.tolist())
+
+
+class MinmaxTests(SimpleTestCase):
+    def test_keeps_every_bucket_extreme(self):
+        rng = np.random.default_rng(3)
+        y = rng.normal(5, 2, 1000)
+        y[437] = 40.0   # a short excursion
+        y[812] = -30.0
+        kept = minmax(y, y, 20)
+        self.assertLessEqual(len(kept), 20)
+        self.assertEqual(kept.tolist(), sorted(set(kept.tolist())))
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertIn(437, kept.tolist())
+        self.assertIn(812, kept.tolist())
+        edges = np.linspace(1, 999, 10).astype(np.int64)
+        for lo, hi in zip(edges, edges[1:]):
+            bucket = range(lo, hi)
+            self.assertIn(lo + int(np.argmin(y[lo:hi])), kept.tolist(), bucket)
+            self.assertIn(lo + int(np.argmax(y[lo:hi])), kept.tolist(), bucket)
+
+    def test_low_and_high_series(self):
+        low = np.full(100, 5.0)
+        high = np.full(100, 6.0)
+        low[30], high[70] = 1.0, 9.0
+        kept = minmax(low, high, 4).tolist()
+        self.assertIn(30, kept)
+        self.assertIn(70, kept)
+
+
+class ParamsTests(SimpleTestCase):
+    @override_settings(METRICS_MAX_POINTS=500)
+    def test_params(self):
+        self.assertEqual(downsample_params({}), (500, "lttb"))
+        self.assertEqual(downsample_params({"points": "100", "downsample": "MINMAX"}), (100, "minmax"))
+        self.assertEqual(downsample_params({"points": "99999"}), (500, "lttb"))
+        self.assertEqual(downsample_params({"points": "1"}), (4, "lttb"))
+        self.assertEqual(downsample_params({"points": "x", "downsample": "avg"}), (500, "lttb"))
+
+    def test_rows(self):
+        rows = [{"t": i, "v": None if i == 5 else float(i % 7)} for i in range(50)]
+        pick = dict(x=lambda r: r["t"], y=lambda r: r["v"], y_low=lambda r: r["v"], y_high=lambda r: r["v"])
+        self.assertEqual(downsample_rows(rows[:10], 10, "lttb", **pick), rows[:10])
+        kept = downsample_rows(rows, 10, "lttb", **pick)
+        self.assertEqual(len(kept), 10)
+        self.assertEqual((kept[0], kept[-1]), (rows[0], rows[-1]))
+        self.assertNotIn(rows[5], kept)
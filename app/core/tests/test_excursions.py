@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Device
+
+
+class ExcursionBoundsTests(TestCase):
+    databases = {"default", "lab"}
+
+    def setUp(self):
+        Device.objects.create(code="X1")
+        user = get_user_model().objects.create_user(email="u@example.com", username="u", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_bad_bounds_are_rejected(self):
+        for url in ("/api/devices/X1/excursions", "/api/excursions"):
+            for params in ({"from": "2025-01-01T25:00:00Z"}, {"to": "soon"}):
+                r = self.client.get(url, params)
+                self.assertEqual(r.status_code, 400, (url, params))
+                self.assertIn(next(iter(params)), r.data)
+
+    def test_valid_bounds(self):
+        r = self.client.get("/api/devices/X1/excursions", {"from": "2025-01-01T00:00:00Z", "page_size": 10})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["results"], [])
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import export_jobs
+from core.models import Device, ExportJob
+
+
+class ExportRequestTests(TestCase):
+    def setUp(self):
+        Device.objects.create(code="E1")
+        user = get_user_model().objects.create_user(email="u@example.com", username="u", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_bad_bounds_are_rejected(self):
+        for body in ({"from": "last week"}, {"to": "2025-02-30T00:00:00Z"}):
+            r = self.client.post("/api/exports", {"device": "E1", **body}, format="json")
+            self.assertEqual(r.status_code, 400, body)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_valid_bounds_queue_a_job(self):
+        r = self.client.post("/api/exports", {"device": "E1", "from": "2025-01-01T00:00:00Z"}, format="json")
+        self.assertEqual(r.status_code, 202)
+        self.assertEqual(ExportJob.objects.get().frm.year, 2025)
+
+
+@override_settings(EXPORT_JOB_CONCURRENCY=2)
+class ExportClaimTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.jobs = [ExportJob.objects.create(created_at=now + timedelta(seconds=i)) for i in range(3)]
+
+    def test_claims_stop_at_the_bound(self):
+        self.assertEqual(export_jobs._claim_next(), self.jobs[0])
+        self.assertEqual(export_jobs._claim_next(), self.jobs[1])
+        self.assertIsNone(export_jobs._claim_next())
+        self.assertEqual(ExportJob.objects.filter(status="RUNNING").count(), 2)
+
+    def test_stale_job_is_resumed_first(self):
+        export_jobs._claim_next()
+        export_jobs._claim_next()
+        ExportJob.objects.filter(id=self.jobs[1].id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(export_jobs._claim_next(), self.jobs[1])
+        self.assertIsNone(export_jobs._claim_next())
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+
+from core.models import Device, Measurement
+from core.services.measurements import MeasurementService
+from core.utils import classify_state, classify_state_rules
+
+T0 = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ScaledFloatFieldTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(code="F1", min_temp=2.05, max_temp=7.95)
+        for i, temp in enumerate((2.0, 2.1, 7.9, 8.0)):
+            Measurement.objects.create(device=self.device, ts=T0 + timedelta(minutes=i), temp_c=temp, state="NORMAL")
+
+    def temps(self, **lookup):
+        qs = Measurement.objects.filter(device=self.device, **lookup)
+        return sorted(qs.values_list("temp_c", flat=True))
+
+    def test_bounds_off_the_grid(self):
+        self.assertEqual(self.temps(temp_c__lt=2.05), [2.0])
+        self.assertEqual(self.temps(temp_c__lte=2.05), [2.0])
+        self.assertEqual(self.temps(temp_c__gt=7.95), [8.0])
+        self.assertEqual(self.temps(temp_c__gte=7.95), [8.0])
+        self.assertEqual(self.temps(temp_c__range=(2.05, 7.95)), [2.1, 7.9])
+
+    def test_bounds_on_the_grid(self):
+        self.assertEqual(self.temps(temp_c__lt=2.1), [2.0])
+        self.assertEqual(self.temps(temp_c__lte=2.1), [2.0, 2.1])
+        self.assertEqual(self.temps(temp_c__gt=7.9), [8.0])
+        self.assertEqual(self.temps(temp_c__gte=7.9), [7.9, 8.0])
+
+    def test_rules_agree_with_classify_state(self):
+        rules = classify_state_rules(min_temp=self.device.min_temp, max_temp=self.device.max_temp)
+        qs = Measurement.objects.filter(device=self.device)
+        for m in qs:
+            expected = classify_state(m.temp_c, min_temp=self.device.min_temp, max_temp=self.device.max_temp)
+            matching = [state for state, rule in rules if qs.filter(rule, id=m.id).exists()]
+            self.assertEqual(matching, [expected], m.temp_c)
+
+    def test_record_uses_the_stored_value(self):
+        device = Device.objects.create(code="F2", min_temp=2.0, max_temp=8.0)
+        m = MeasurementService.record(device=device, ts=T0, temp_c=1.96, humidity=50.04)
+        self.assertEqual((m.temp_c, m.humidity, m.state), (2.0, 50.0, "NORMAL"))
+        stored = Measurement.objects.get(id=m.id)
+        self.assertEqual((stored.temp_c, stored.state), (2.0, "NORMAL"))
+
+        rows = MeasurementService.record_batch(device=device, readings=[{"ts": T0 + timedelta(minutes=1), "temp_c": 8.04}])
+        self.assertEqual((rows[0].temp_c, rows[0].state), (8.0, "NORMAL"))
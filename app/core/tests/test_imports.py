@@ -0,0 +1,83 @@
+import os
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TransactionTestCase, override_settings
+
+from core import imports
+from core.models import Device, ImportJob, Measurement
+
+T0 = datetime(2026, 2, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+CSV = """device,timestamp,temp_c,humidity
+F1,2026-02-01T08:00:00Z,5.0,40
+F1,2026-02-01T08:01:00Z,30.04,
+F1,2026-02-01T08:01:00Z,6.0,
+F1,2026-02-01T08:02:00,4.5,
+L1,2026-02-01T08:00:00Z,-21.0,55
+NOPE,2026-02-01T08:00:00Z,5.0,
+F1,yesterday,5.0,
+F1,2026-02-01T08:03:00Z,warm,
+F1,2026-02-01T08:04:00Z,1e12,
+F1,2026-02-01T08:05:00Z,5.0,damp
+F1,2026-02-01T08:06:00Z,5.0,
+L1,2026-02-01T08:00:00Z,-20.0,
+"""
+
+
+@override_settings(IMPORT_MAX_ERRORS=1000)
+class GenericMergeTests(TransactionTestCase):
+    # rows go to the shard of their device's site, each merged in its own transaction
+    databases = {"default", "lab"}
+
+    def setUp(self):
+        self.f1 = Device.objects.create(code="F1", site="HQ", min_temp=2.0, max_temp=8.0)
+        self.l1 = Device.objects.create(code="L1", site="LAB", min_temp=-25.0, max_temp=-15.0)
+        Measurement.objects.create(device=self.f1, ts=datetime(2026, 2, 1, 8, 6, tzinfo=dt_timezone.utc),
+                                   temp_c=5.0, state="NORMAL")
+
+    def run_csv(self, text):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        job = ImportJob.objects.create(path=path, bytes_total=len(text))
+        return imports.run_import_job(job, log=lambda msg: None)
+
+    def test_accounting(self):
+        job = self.run_csv(CSV)
+        self.assertEqual(job.status, "DONE", job.error)
+        self.assertEqual(job.rows_read, 12)
+        self.assertEqual(job.error_count, 5)
+        self.assertEqual(
+            [(e["line"], e["error"]) for e in job.errors],
+            [(7, "Unknown device"), (8, "Invalid timestamp"), (9, "Invalid temp_c"), (10, "Invalid temp_c"),
+             (11, "Invalid humidity")],
+        )
+        # line 4 repeats line 3's (device, ts), line 13 line 6's, and line 12 is already stored
+        self.assertEqual((job.inserted, job.skipped_duplicates), (4, 3))
+        self.assertFalse(os.path.exists(job.path))
+
+        stored = {((m.ts - T0).total_seconds() // 60, m.temp_c, m.humidity, m.state)
+                  for m in Measurement.objects.filter(device_id=self.f1.id)}
+        self.assertEqual(stored, {
+            (0, 5.0, 40.0, "NORMAL"), (1, 30.0, None, "CRITICAL"), (2, 4.5, None, "NORMAL"), (6, 5.0, None, "NORMAL"),
+        })
+        lab = list(Measurement.objects.using("lab").filter(device_id=self.l1.id).values_list("temp_c", "state"))
+        self.assertEqual(lab, [(-21.0, "NORMAL")])
+
+    def test_rerun_only_skips(self):
+        self.run_csv(CSV)
+        job = self.run_csv(CSV)
+        self.assertEqual((job.inserted, job.skipped_duplicates, job.error_count), (0, 7, 5))
+
+    @override_settings(IMPORT_MAX_ERRORS=2)
+    def test_error_report_is_capped(self):
+        job = self.run_csv(CSV)
+        self.assertEqual(job.error_count, 5)
+        self.assertEqual([e["line"] for e in job.errors], [7, 8])
+
+    def test_bad_header_fails_cleanly(self):
+        job = self.run_csv("code,timestamp,temp_c\nF1,2026-02-01T09:00:00Z,5.0\n")
+        self.assertEqual(job.status, "FAILED")
+        self.assertIn("device", job.error)
+        self.assertEqual(Measurement.objects.count(), 1)
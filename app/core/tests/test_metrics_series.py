@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Device
+from core.services.measurements import MeasurementService
+
+
+class MetricsSeriesTests(TestCase):
+    def setUp(self):
+        Device.objects.create(code="S1")
+        user = get_user_model().objects.create_user(email="u@example.com", username="u", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def get(self, **params):
+        return self.client.get("/api/metrics/series", {"devices": "S1", "range": "day", **params})
+
+    def test_unknown_metric_is_rejected(self):
+        r = self.get(metric="pressure")
+        self.assertEqual(r.status_code, 400)
+        for name in MeasurementService.SERIES_METRICS:
+            self.assertIn(name, r.data["detail"])
+
+    def test_known_metrics(self):
+        for name in MeasurementService.SERIES_METRICS:
+            r = self.get(metric=name.upper())
+            self.assertEqual(r.status_code, 200, name)
+            self.assertEqual(r.data["agg"]["metric"], name)
+        self.assertEqual(self.get().data["agg"]["metric"], "temp")
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase, override_settings
+
+from core import credentials
+from core.management.commands import mqtt_worker
+from core.models import Device, Measurement
+
+
+@override_settings(DEVICE_KEY_MASTER="mqtt-test-master", MQTT_MAX_SKEW_S=300)
+class SignedTsTests(TestCase):
+    def setUp(self):
+        mqtt_worker._last_signed.clear()
+        self.device = Device.objects.create(code="M1")
+        credentials.refresh()
+        self.cred = credentials.lookup("M1")
+        self.now = datetime.now(dt_timezone.utc).replace(microsecond=0)
+
+    def test_ts_is_required(self):
+        for payload in ({}, {"ts": ""}, {"ts": 0}, {"ts": "soon"}):
+            data = dict(payload)
+            mqtt_worker._normalize_ts_inplace(data, fill=False)
+            self.assertIsNone(data["ts"], payload)
+            self.assertIn("without a valid ts", mqtt_worker._signed_ts_error(self.cred, None))
+        data = {}
+        mqtt_worker._normalize_ts_inplace(data)  # unsigned messages still default to now
+        self.assertIsNotNone(mqtt_worker._ts_or_none(data["ts"]))
+
+    def test_skew_window(self):
+        self.assertIsNone(mqtt_worker._signed_ts_error(self.cred, self.now - timedelta(seconds=299)))
+        for ts in (self.now - timedelta(seconds=301), self.now + timedelta(seconds=301)):
+            self.assertIn("window", mqtt_worker._signed_ts_error(self.cred, ts))
+
+    def test_replays(self):
+        Measurement.objects.create(device=self.device, ts=self.now - timedelta(seconds=60), temp_c=5.0,
+                                   state="NORMAL")
+        self.assertIn("already stored", mqtt_worker._signed_ts_error(self.cred, self.now - timedelta(seconds=60)))
+
+        mqtt_worker._last_signed["M1"] = self.now - timedelta(seconds=30)
+        for ts in (self.now - timedelta(seconds=30), self.now - timedelta(seconds=45)):
+            self.assertIn("not newer", mqtt_worker._signed_ts_error(self.cred, ts))
+        self.assertIsNone(mqtt_worker._signed_ts_error(self.cred, self.now))
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TransactionTestCase
+from rest_framework.exceptions import ValidationError
+
+from core.models import Device, Measurement
+from core.pagination import NEXT, decode_cursor, encode_cursor, keyset_page
+
+T0 = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class KeysetPageTests(TransactionTestCase):
+    # fan_out() reads each shard from its own thread: the rows must be committed
+    databases = {"default", "lab"}
+
+    def setUp(self):
+        here = Device.objects.create(code="P1", site="HQ")
+        lab = Device.objects.create(code="P2", site="LAB")
+        rows = {"default": [], "lab": []}
+        for i in range(23):
+            # interleaved across the shards, with ts ties inside each shard (broken by id)
+            ts = T0 + timedelta(minutes=i // 2)
+            alias, device = ("default", here) if i % 3 else ("lab", lab)
+            # ids as each shard's own sequence hands them out
+            rows[alias].append(Measurement(id=len(rows[alias]) + 1, device=device, ts=ts, temp_c=5.0, state="NORMAL"))
+        for alias, batch in rows.items():
+            Measurement.objects.using(alias).bulk_create(batch)
+        self.sources = {alias: Measurement.objects.using(alias).all() for alias in ("default", "lab")}
+        self.expected = sorted(
+            (m.ts, m.id, alias) for alias, qs in self.sources.items() for m in qs
+        )
+
+    def walk(self, *, size=5, descending=False):
+        seen, pages, cursor = [], [], None
+        while True:
+            rows, next_cursor, prev_cursor = keyset_page(
+                self.sources, size=size, cursor=decode_cursor(cursor), descending=descending, fields=("ts", "id"),
+            )
+            pages.append((rows, prev_cursor))
+            seen += [(r["ts"], r["id"]) for r in rows]
+            if not next_cursor:
+                return seen, pages
+            cursor = next_cursor
+
+    def test_forward_pages_cover_every_row_once_in_order(self):
+        seen, pages = self.walk()
+        self.assertEqual(seen, [(ts, pk) for ts, pk, _ in self.expected])
+        self.assertEqual([len(rows) for rows, _ in pages], [5, 5, 5, 5, 3])
+        self.assertIsNone(pages[0][1])
+
+    def test_same_ts_and_id_on_two_shards(self):
+        # each shard numbers its own rows: a page edge can fall between equal (ts, id) keys
+        keys = [(ts, pk) for ts, pk, _ in self.expected]
+        self.assertLess(len(set(keys)), len(keys))
+        for size in (1, 2, 3):
+            self.assertEqual(self.walk(size=size)[0], keys, size)
+            self.assertEqual(self.walk(size=size, descending=True)[0], keys[::-1], size)
+
+    def test_descending(self):
+        seen, _ = self.walk(descending=True)
+        self.assertEqual(seen, [(ts, pk) for ts, pk, _ in reversed(self.expected)])
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        for size in (1, 5):
+            _, pages = self.walk(size=size)
+            for (before, _), (_, prev_cursor) in zip(pages, pages[1:]):
+                rows, _, _ = keyset_page(
+                    self.sources, size=size, cursor=decode_cursor(prev_cursor), fields=("ts", "id"),
+                )
+                self.assertEqual(rows, before)
+
+    def test_cursor_round_trip_and_garbage(self):
+        ts = T0 + timedelta(microseconds=123)
+        self.assertEqual(decode_cursor(encode_cursor({"ts": ts, "id": 7}, NEXT)), (ts, 7, NEXT, ""))
+        self.assertEqual(decode_cursor(encode_cursor({"ts": ts, "id": 7}, NEXT, shard="lab")), (ts, 7, NEXT, "lab"))
+        with self.assertRaises(ValidationError):
+            decode_cursor("not-a-cursor")
@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core import credentials, ratelimit
+from core.credentials import Credential
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True, RATE_LIMIT_POLICY="drop", RATE_LIMIT_DOWNSAMPLE_S=60,
+    RATE_LIMIT_DEVICE_PER_MIN=60, RATE_LIMIT_DEVICE_BURST=3,
+    RATE_LIMIT_SITE_PER_MIN=60, RATE_LIMIT_SITE_BURST=4,
+)
+class AdmitTests(SimpleTestCase):
+    def setUp(self):
+        for state in (ratelimit._buckets, ratelimit._last_kept, ratelimit._tally):
+            state.clear()
+        self.now = 1000.0
+        self.creds = {
+            code: Credential(i, code, 1, b"", "S1", 2.0, 8.0) for i, code in enumerate(("A", "B"), 1)
+        }
+        self.creds["C"] = Credential(3, "C", 1, b"", "", 2.0, 8.0)
+        for patcher in (
+            mock.patch.object(ratelimit.time, "monotonic", side_effect=lambda: self.now),
+            mock.patch.object(credentials, "lookup", side_effect=lambda code, load=True: self.creds.get(code)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def admit(self, code, n=1, **kw):
+        return [ratelimit.admit(code, temp_c=5.0, **kw) for _ in range(n)]
+
+    def tokens(self, kind, name):
+        return ratelimit._buckets[(kind, name)][0]
+
+    def test_device_bucket_refills_with_time(self):
+        self.assertEqual(self.admit("C", 4), [True, True, True, False])
+        self.now += 1.0  # one token a second
+        self.assertEqual(self.admit("C", 2), [True, False])
+        self.now += 0.5
+        self.assertEqual(self.admit("C"), [False])
+        self.now += 60
+        self.assertEqual(self.tokens("d", "C"), 0.5)
+        self.assertEqual(self.admit("C", 4), [True, True, True, False])  # capped at the burst
+
+    def test_site_bucket_is_shared(self):
+        self.assertEqual(self.admit("A", 3), [True] * 3)
+        self.assertEqual(self.admit("B", 2), [True, False])
+        self.now += 1.0
+        self.assertEqual(self.admit("B"), [True])
+
+    def test_a_refused_reading_spends_no_token(self):
+        self.admit("A", 3)
+        self.admit("B")
+        site, device_b = self.tokens("s", "S1"), self.tokens("d", "B")
+        self.assertEqual(self.admit("B"), [False])  # site empty: B's own bucket keeps its tokens
+        self.assertEqual(self.tokens("d", "B"), device_b)
+        self.now += 2.0
+        self.admit("A", 3)
+        self.assertEqual(self.tokens("d", "A"), 0)
+        site = self.tokens("s", "S1")
+        self.assertEqual(self.admit("A"), [False])  # device empty: the site keeps its tokens
+        self.assertEqual(self.tokens("s", "S1"), site)
+
+    @override_settings(RATE_LIMIT_POLICY="downsample")
+    def test_downsample_keeps_one_reading_per_interval(self):
+        self.admit("C", 3, ts=0)
+        kept = [ts for ts in range(0, 300, 10) if ratelimit.admit("C", temp_c=5.0, ts=ts)]
+        self.assertEqual(kept, [0, 60, 120, 180, 240])
+        self.assertEqual(self.admit("C"), [False])  # no reading time, nothing to thin by
+
+    def test_alarms_bypass_the_limit(self):
+        self.admit("C", 3)
+        self.assertFalse(ratelimit.admit("C", temp_c=5.0))
+        self.assertTrue(ratelimit.admit("C", temp_c=30.0))
+        self.assertEqual(ratelimit._tally["C"][1:4], [4, 1, 1])  # accepted, limited, bypassed
+
+    @override_settings(RATE_LIMIT_POLICY="downsample")
+    def test_least_recent_bucket_is_evicted(self):
+        with mock.patch.object(ratelimit, "_MAX_KEYS", 2):
+            self.admit("C", 4, ts=0)
+            self.creds["D"] = self.creds["E"] = None
+            self.admit("D")
+            self.admit("C")
+            self.admit("E")
+        self.assertEqual(list(ratelimit._buckets), [("d", "C"), ("d", "E")])
+        self.assertIn("C", ratelimit._last_kept)
+        with mock.patch.object(ratelimit, "_MAX_KEYS", 1):
+            self.admit("D")
+        self.assertEqual(list(ratelimit._buckets), [("d", "D")])
+        self.assertNotIn("C", ratelimit._last_kept)
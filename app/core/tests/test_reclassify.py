@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import reclassify
+from core.models import Device, ReclassifyJob
+
+
+class ReclassifyRequestTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(code="R1")
+        admin = get_user_model().objects.create_user(email="admin@example.com", username="admin", password="x",
+                                                     is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def post(self, body):
+        return self.client.post("/api/devices/R1/reclassify", body, format="json")
+
+    def test_bad_bounds_are_rejected(self):
+        for body in ({"from": "yesterday"}, {"to": "2025-13-01T00:00:00Z"}):
+            r = self.post(body)
+            self.assertEqual(r.status_code, 400, body)
+        self.assertFalse(ReclassifyJob.objects.exists())
+
+    def test_valid_bounds_queue_a_job(self):
+        r = self.post({"from": "2025-01-01T00:00:00Z", "to": "2025-02-01T00:00:00Z"})
+        self.assertEqual(r.status_code, 202)
+        job = ReclassifyJob.objects.get()
+        self.assertEqual((job.frm.month, job.to.month), (1, 2))
+
+
+class ReclassifyClaimTests(TestCase):
+    def setUp(self):
+        self.job = ReclassifyJob.objects.create(device=Device.objects.create(code="R2"))
+
+    def test_one_claim_wins(self):
+        other = ReclassifyJob.objects.get(id=self.job.id)
+        self.assertTrue(reclassify.claim_job(self.job))
+        self.assertFalse(reclassify.claim_job(other))
+        self.assertIsNone(reclassify._claim_next())
+
+    def test_stale_job_is_taken_over(self):
+        self.assertTrue(reclassify.claim_job(self.job))
+        ReclassifyJob.objects.filter(id=self.job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(reclassify._claim_next(), self.job)
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from django.test import TransactionTestCase, override_settings
+
+from core import credentials, datagram
+from core.management.commands.udp_listener import Listener
+from core.models import Device, Measurement
+
+
+class _Transport:
+    def __init__(self):
+        self.acks = []
+
+    def sendto(self, data, addr):
+        self.acks.append(data[1])  # status byte
+
+
+@override_settings(DEVICE_KEY_MASTER="udp-test-master", RATE_LIMIT_ENABLED=False, UDP_ACK=True, UDP_BATCH_MAX=2000)
+class ListenerReplayTests(TransactionTestCase):
+    # batches are written from the listener's own DB thread
+    databases = {"default"}
+
+    def setUp(self):
+        Device.objects.create(code="U1", min_temp=2.0, max_temp=8.0)
+        credentials.refresh()
+        self.key = credentials.lookup("U1").key
+        self.ts = int(time.time()) - 30
+
+    def listener(self):
+        listener = Listener(log=lambda msg: None)
+        listener.transport = _Transport()
+        self.addCleanup(listener.db.shutdown)
+        return listener
+
+    def send(self, listener, *, ts=None, seq=1):
+        ts = self.ts if ts is None else ts
+        listener.receive(datagram.encode_reading("U1", self.key, ts=ts, temp_c=5.0, seq=seq, ack=True), ("sensor", 1))
+
+    def test_reading_without_ts_is_rejected(self):
+        listener = self.listener()
+        self.send(listener, ts=0)
+        self.assertEqual(listener.pending, [])
+        self.assertEqual(listener.transport.acks, [datagram.ACK_REJECTED])
+
+    def test_retry_in_the_same_batch(self):
+        listener = self.listener()
+        self.send(listener)
+        self.send(listener)
+        asyncio.run(listener.flush())
+        self.assertEqual(listener.transport.acks, [datagram.ACK_STORED, datagram.ACK_DUPLICATE])
+        self.assertEqual(Measurement.objects.count(), 1)
+
+    @override_settings(UDP_BATCH_MAX=1)
+    def test_retry_queued_behind_its_original(self):
+        listener = self.listener()
+        written = []
+        store = listener._store
+        listener._store = lambda entries: written.append(len(entries)) or store(entries)
+
+        async def _run():
+            self.send(listener)  # a full batch: starts a flush
+            self.send(listener, seq=2)  # the retry waits for the next batch
+            self.send(listener, ts=self.ts + 60, seq=3)
+            await listener.flushing
+
+        asyncio.run(_run())
+        self.assertEqual(listener.transport.acks, [datagram.ACK_STORED, datagram.ACK_DUPLICATE, datagram.ACK_STORED])
+        self.assertEqual(written, [1, 1])  # the retry never reached the database
+        self.assertEqual(Measurement.objects.count(), 2)
+
+        self.send(listener)  # answered from memory, never queued
+        self.assertEqual(listener.pending, [])
+        self.assertEqual(listener.transport.acks[-1], datagram.ACK_DUPLICATE)
+
+    def test_replay_after_restart(self):
+        first = self.listener()
+        self.send(first)
+        asyncio.run(first.flush())
+
+        second = self.listener()
+        self.send(second)
+        asyncio.run(second.flush())
+        self.assertEqual(second.transport.acks, [datagram.ACK_DUPLICATE])
+        self.assertEqual(Measurement.objects.count(), 1)
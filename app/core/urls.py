@@ -4,15 +4,29 @@ from . import views_users
 from . import views_measurements
 from . import views_tickets
 from . import views_devices
+from . import views_stream
+from . import views_exports
+from . import views_excursions
 
 urlpatterns = [
     # ----------------------------------
     # Measurements & Devices (main data)
     # ----------------------------------
     path("measurements/ingest", views.ingest_measurement, name="ingest_measurement"),
+    path("measurements/ingest/batch", views.ingest_measurement_batch, name="ingest_measurement_batch"),
     path("measurements/recent", views.measurements_recent, name="measurements_recent"),
+    path("stream", views_stream.live_stream, name="live_stream"),  # SSE (ASGI only)
     path("devices", views_devices.devices_list_create, name="devices_list_create"),   # GET + POST
     path("devices/<str:code>/metrics", views_devices.device_metrics, name="device_metrics"),
+    path("metrics/series", views_devices.metrics_series, name="metrics_series"),
+    path("metrics/cache", views_devices.metrics_cache_stats, name="metrics_cache_stats"),
+    path("ingest/noisy-devices", views_devices.ingest_noisy_devices, name="ingest_noisy_devices"),
+    path("devices/<str:code>/reclassify", views_devices.device_reclassify, name="device_reclassify"),
+    path("devices/<str:code>/credentials", views_devices.device_credentials, name="device_credentials"),
+    path("devices/<str:code>/compliance", views_devices.device_compliance, name="device_compliance"),
+    path("devices/<str:code>/compliance.<str:fmt>", views_devices.device_compliance, name="device_compliance_export"),
+    path("devices/<str:code>/excursions", views_excursions.device_excursions, name="device_excursions"),
+    path("excursions", views_excursions.excursions_feed, name="excursions_feed"),
     path("devices/<str:code>", views_devices.devices_detail_update_delete, name="devices_detail_update_delete"),  # GET/PUT/PATCH/DELETE
 
     # ----------------------------------
@@ -43,8 +57,15 @@ urlpatterns = [
 
     # Measurements range/export (if you added them)
     path("measurements/range", views_measurements.measurements_range, name="measurements_range"),
-    path("measurements/export.csv", views_measurements.measurements_export_csv, name="measurements_export_csv"),
+    path("measurements/export.csv", views_measurements.measurements_export, name="measurements_export_csv"),
+    path("measurements/export.<str:fmt>", views_measurements.measurements_export, name="measurements_export"),
     path("measurements/import.csv", views_measurements.measurements_import_csv),
+    path("measurements/imports", views_measurements.measurements_imports, name="measurements_imports"),
+    path("measurements/imports/<int:job_id>", views_measurements.measurements_imports, name="measurements_import_detail"),
+    path("exports", views_exports.exports_list_create, name="exports_list_create"),            # GET, POST
+    path("exports/<int:job_id>", views_exports.export_detail, name="export_detail"),
+    path("exports/<int:job_id>/download", views_exports.export_download, name="export_download"),
     # Dashboard stats (if you added it)
     path("dashboard/devices-stats", views.dashboard_devices_stats, name="dashboard_devices_stats"),
+    path("dashboard/summary", views.dashboard_summary, name="dashboard_summary"),
 ]
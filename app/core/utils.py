@@ -1,6 +1,9 @@
 import os
 import requests
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
 
 def classify_state(
     temp_c: float,
@@ -18,6 +21,44 @@ def classify_state(
     return "NORMAL"
 
 
+def classify_state_rules(
+    *,
+    min_temp: float,
+    max_temp: float,
+    margin: float = 5.0,
+    field: str = "temp_c",
+):
+    """
+    Set-based twin of classify_state(): one Q filter per state, mutually
+    exclusive, for chunked UPDATEs over Measurement rows.
+    """
+    lo_crit, hi_crit = min_temp - margin, max_temp + margin
+    return [
+        ("CRITICAL", Q(**{f"{field}__lt": lo_crit}) | Q(**{f"{field}__gt": hi_crit})),
+        ("SEVERE", Q(**{f"{field}__gte": lo_crit, f"{field}__lt": min_temp})
+                   | Q(**{f"{field}__gt": max_temp, f"{field}__lte": hi_crit})),
+        ("NORMAL", Q(**{f"{field}__gte": min_temp, f"{field}__lte": max_temp})),
+    ]
+
+
+def datetime_param(data, name: str):
+    """
+    Optional ISO 8601 datetime from request data / query params: None when
+    absent, a 400 (ValidationError) when present but not a valid datetime,
+    so a typo never silently widens the range to "no bound".
+    """
+    raw = data.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        value = parse_datetime(str(raw))
+    except ValueError:  # well-formed but out of range, e.g. month 13
+        value = None
+    if value is None:
+        raise ValidationError({name: "Must be an ISO 8601 datetime."})
+    return value
+
+
 def _role_chat_map():
     """
     ROLE_CHAT_IDS env format:
@@ -1,11 +1,10 @@
 # app/core/views.py
 
-from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -15,12 +14,16 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 # ✅ CORRECT SERIALIZER IMPORTS (NO DUPLICATES)
 from core.serializers.jwt import TokenObtainPairWithUserSerializer
 from core.serializers.auth import LoginUserSerializer
-from core.serializers import IngestMeasurementSerializer, MeasurementSerializer
+from core.serializers import IngestMeasurementSerializer, MEASUREMENT_VALUES, MeasurementSerializer, measurement_rows
 
+from core import ingest, ratelimit
+from core.authentication import INGEST_AUTHENTICATION
 from core.services.measurements import MeasurementService
+from core.pagination import decode_cursor, page_size, paginated_response
 from core.services.tickets import TicketService
 from core.services.devices import DeviceService
 from core.services.telegram_bot import TelegramBotService
+from core.watermarks import conditional, device_param_scope, global_scope, tickets_scope
 
 
 # ----------------------------
@@ -28,24 +31,61 @@ from core.services.telegram_bot import TelegramBotService
 # ----------------------------
 
 @api_view(["POST"])
+@authentication_classes(INGEST_AUTHENTICATION)
 @permission_classes([IsAuthenticated])
 def ingest_measurement(request):
     ser = IngestMeasurementSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
+    refused = ingest.device_error(ser.validated_data["deviceId"], request.auth)
+    if refused:
+        return Response({"detail": refused}, status=status.HTTP_403_FORBIDDEN)
+    data = ser.validated_data
+    if not ratelimit.admit(data["deviceId"], temp_c=data["tempC"], ts=data["ts"]):
+        ratelimit.maybe_flush()
+        return Response({"detail": "Ingest rate limit exceeded for this device."},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS)
     m = MeasurementService.ingest_from_serializer(ser)
+    ratelimit.maybe_flush()
     return Response(MeasurementSerializer(m).data, status=status.HTTP_201_CREATED)
 
 
-@api_view(["GET"])
+@api_view(["POST"])
+@authentication_classes(INGEST_AUTHENTICATION)
 @permission_classes([IsAuthenticated])
-def device_metrics(request, code):
-    device = DeviceService.get_by_code_or_404(code)
-    frm = parse_datetime(request.GET.get("from")) if request.GET.get("from") else None
-    to = parse_datetime(request.GET.get("to")) if request.GET.get("to") else None
-    qs = MeasurementService.series(device=device, frm=frm, to=to)
-    agg = MeasurementService.aggregate(qs)
+def ingest_measurement_batch(request):
+    """
+    Gateway batch: a JSON array or NDJSON body (Content-Type
+    application/x-ndjson) of ingest items, optionally gzip-compressed
+    (Content-Encoding: gzip). Answers 201 when every item was stored, 207
+    with per-item status when some were invalid or rate-limited, 400 when
+    none were stored and some were invalid, 429 when all were rate-limited.
+    """
+    content_type = (request.content_type or "").split(";")[0].strip().lower()
+    gzipped = (
+        request.headers.get("Content-Encoding", "").strip().lower() in ("gzip", "x-gzip")
+        or content_type in ingest.GZIP_TYPES
+    )
+    try:
+        body = ingest.read_body(request.stream, gzipped=gzipped)
+        items = ingest.parse_items(body, ndjson=content_type in ingest.NDJSON_TYPES)
+    except ingest.BatchError as e:
+        return Response({"detail": str(e)}, status=e.status)
+
+    results = ingest.ingest_batch(items, auth=request.auth)
+    ratelimit.maybe_flush()
+    created = sum(1 for r in results if r["status"] == "created")
+    limited = sum(1 for r in results if r["status"] == "limited")
+    if created == len(results):
+        code = status.HTTP_201_CREATED
+    elif created:
+        code = status.HTTP_207_MULTI_STATUS
+    elif limited == len(results):
+        code = status.HTTP_429_TOO_MANY_REQUESTS
+    else:
+        code = status.HTTP_400_BAD_REQUEST
     return Response(
-        {"series": MeasurementSerializer(qs, many=True).data, "agg": agg}
+        {"created": created, "invalid": len(results) - created - limited, "limited": limited, "results": results},
+        status=code,
     )
 
 
@@ -57,27 +97,29 @@ def devices_list(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(device_param_scope)
 def measurements_recent(request):
     code = request.GET.get("device")
-    limit = int(request.GET.get("limit") or 100)
-
-    if code:
-        device = DeviceService.get_by_code_or_404(code)
-        qs = MeasurementService.recent_for_device(device, limit=limit)
-    else:
-        qs = MeasurementService.recent_all(limit=limit)
+    size = page_size(request, default=100)
+    cursor = decode_cursor(request.GET.get("cursor"))
 
-    return Response(MeasurementSerializer(qs, many=True).data)
+    device = DeviceService.get_by_code_or_404(code) if code else None
+    rows, next_cursor, prev_cursor = MeasurementService.page(
+        device=device, size=size, cursor=cursor, descending=True, fields=MEASUREMENT_VALUES
+    )
+    return paginated_response(request, measurement_rows(rows), next_cursor, prev_cursor)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(global_scope)
 def dashboard_summary(request):
-    return Response(DeviceService.dashboard_summary())
+    return Response(DeviceService.dashboard_summary(site=request.GET.get("site")))
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(tickets_scope)
 def tickets_open(request):
     roles = getattr(settings, "ESCALATION_ROLES", [])
     return Response(TicketService.list_open_as_dict(roles=roles))
@@ -177,24 +219,20 @@ class LoginView(TokenObtainPairView):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(global_scope)
 def dashboard_devices_stats(request):
     """
-    GET /api/dashboard/devices-stats
+    GET /api/dashboard/devices-stats[?site=..]
     Returns counts by last known state: NORMAL / WARNING / CRITICAL / UNKNOWN
+    (served from the materialized counters; SEVERE is reported as WARNING)
     """
-    items = DeviceService.list_with_latest()
+    devices = DeviceService.dashboard_summary(site=request.GET.get("site"))["devices"]
 
     counts = {
-        "NORMAL": 0,
-        "WARNING": 0,
-        "CRITICAL": 0,
-        "UNKNOWN": 0,
+        "NORMAL": devices["NORMAL"],
+        "WARNING": devices["SEVERE"],
+        "CRITICAL": devices["CRITICAL"],
+        "UNKNOWN": devices["UNKNOWN"],
     }
 
-    for d in items:
-        state = d.get("last_state") or "UNKNOWN"
-        if state not in counts:
-            state = "UNKNOWN"
-        counts[state] += 1
-
     return Response(counts)
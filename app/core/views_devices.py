@@ -1,3 +1,7 @@
+import csv
+import io
+
+from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
@@ -5,17 +9,24 @@ from rest_framework import status
 
 from .services.devices import DeviceService
 from .serializers.devices import DeviceCreateSerializer, DeviceUpdateSerializer
+from .models import Device
 # app/core/views.py (adjust device_metrics)
-from django.utils.dateparse import parse_datetime
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models.functions import TruncMinute, TruncHour, TruncDay, TruncWeek, TruncMonth
-from django.db.models import Avg, Min, Max
 from .services.measurements import MeasurementService
+from .downsample import downsample_params, downsample_rows
+from .reclassify import enqueue_reclassify, job_as_dict
+from .watermarks import conditional, device_code_scope, global_scope
+from . import bucket_cache, compliance, credentials, ratelimit
+from .renderers import epoch_ms, wants_columnar
+from .utils import datetime_param
 
 
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
+@conditional(global_scope)
 def devices_list_create(request):
     """
     GET  /api/devices               -> list all devices with latest reading
@@ -39,6 +50,7 @@ def devices_list_create(request):
 
 @api_view(["GET", "PUT", "PATCH", "DELETE"])
 @permission_classes([IsAuthenticated])
+@conditional(device_code_scope)
 def devices_detail_update_delete(request, code: str):
     """
     GET    /api/devices/{code}       -> get one
@@ -67,6 +79,45 @@ def devices_detail_update_delete(request, code: str):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def device_reclassify(request, code: str):
+    """
+    GET  /api/devices/{code}/reclassify   -> recent re-classification jobs + progress
+    POST /api/devices/{code}/reclassify   -> queue one (admin only), body: {"from": ISO, "to": ISO}
+    """
+    device = DeviceService.get_by_code_or_404(code)
+
+    if request.method == "GET":
+        jobs = device.reclassify_jobs.select_related("device").order_by("-created_at")[:20]
+        return Response([job_as_dict(j) for j in jobs])
+
+    if not request.user.is_staff:
+        return Response({"detail": "Only admins can reclassify measurements."}, status=403)
+
+    frm, to = datetime_param(request.data, "from"), datetime_param(request.data, "to")
+    job = enqueue_reclassify(device, frm=frm, to=to, reason="manual")
+    return Response(job_as_dict(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def device_credentials(request, code: str):
+    """
+    GET  /api/devices/{code}/credentials  -> the device's ingest key, for provisioning (admin only)
+    POST /api/devices/{code}/credentials  -> rotate it: new key, the old one stops working (admin only)
+    """
+    if not request.user.is_staff:
+        return Response({"detail": "Only admins can manage device credentials."}, status=403)
+    if not credentials.master_key():
+        return Response({"detail": "DEVICE_KEY_MASTER is not configured."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    device = DeviceService.get_by_code_or_404(code)
+    if request.method == "POST":
+        device = DeviceService.rotate_key(device)
+    return Response(DeviceService.credentials_as_dict(device))
+
+
 
 
 
@@ -129,8 +180,19 @@ def _resolve_range_and_bucket(req):
     return frm, to, bucket
 
 
+def _sliding_window(request, *args, **kwargs):
+    # range presets end at "now": the payload changes each minute even without new data
+    if request.GET.get("from") and request.GET.get("to"):
+        return ""
+    return timezone.now().strftime("%Y%m%d%H%M")
+
+
+SERIES_KEYS = ("temp", "temp_min", "temp_max", "humidity", "hum_min", "hum_max")
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(device_code_scope, extra=_sliding_window)
 def device_metrics(request, code):
     """
     KPI & time series for a device.
@@ -138,28 +200,23 @@ def device_metrics(request, code):
       - ?from=ISO&to=ISO
       - or ?range=day|week|month|year
       - optional ?bucket=minute|hour|day|week|month
+      - optional ?points=N&downsample=lttb|minmax
+      - optional ?format=columnar -> {"t": [epoch ms..], "temp": [..], ..., "agg": {..}}
     Returns bucketed series with avg/min/max per bucket.
     """
     device = DeviceService.get_by_code_or_404(code)
     frm, to, bucket = _resolve_range_and_bucket(request)
+    points, method = downsample_params(request.GET)
 
-    # Raw queryset in range
-    qs = MeasurementService.series(device=device, frm=frm, to=to)
-
-    # Aggregate by bucket using PostgreSQL date_trunc via ORM
-    trunc = BUCKET_MAP[bucket]("ts")
-    agg = (
-        qs.annotate(bucket_ts=trunc)
-          .values("bucket_ts")
-          .order_by("bucket_ts")
-          .annotate(
-              temp_avg=Avg("temp_c"),
-              temp_min=Min("temp_c"),
-              temp_max=Max("temp_c"),
-              hum_avg=Avg("humidity"),
-              hum_min=Min("humidity"),
-              hum_max=Max("humidity"),
-          )
+    # completed buckets come from the bucket cache; only the open one is computed
+    rows, cache_stats = bucket_cache.bucket_rows(device, frm, to, bucket)
+    source_points = len(rows)
+    rows = downsample_rows(
+        rows, points, method,
+        x=lambda r: r["bucket_ts"].timestamp(),
+        y=lambda r: r["temp_avg"],
+        y_low=lambda r: r["temp_min"],
+        y_high=lambda r: r["temp_max"],
     )
 
     # Build series payload
@@ -173,7 +230,7 @@ def device_metrics(request, code):
             "hum_min": r["hum_min"],
             "hum_max": r["hum_max"],
         }
-        for r in agg
+        for r in rows
     ]
 
     # Quick global agg (last window)
@@ -182,6 +239,138 @@ def device_metrics(request, code):
         "to": to.isoformat(),
         "points": len(series),
         "bucket": bucket,
+        "source_points": source_points,
+        "downsample": method if len(series) < source_points else None,
+        "cache": cache_stats,
     }
 
+    if wants_columnar(request):
+        body = {"t": [epoch_ms(r["bucket_ts"]) for r in rows]}
+        for key in SERIES_KEYS:
+            body[key] = [p[key] for p in series]
+        body["agg"] = global_agg
+        return Response(body)
+
     return Response({"series": series, "agg": global_agg})
+
+
+# GET /api/metrics/cache  (admin)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def metrics_cache_stats(request):
+    """Cumulative bucket-cache hits / misses of device metrics, per bucket size."""
+    if not request.user.is_staff:
+        return Response({"detail": "Admin only."}, status=status.HTTP_403_FORBIDDEN)
+    return Response(bucket_cache.stats())
+
+
+def _day_param(value):
+    if not value:
+        return None
+    dt = parse_datetime(value)
+    return dt.date() if dt else parse_date(value)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@conditional(device_code_scope)
+def device_compliance(request, code: str, fmt: str = "json"):
+    """
+    GET /api/devices/{code}/compliance[.csv]?period=day|month&from=YYYY-MM-DD&to=YYYY-MM-DD
+    Mean Kinetic Temperature and time out of range per UTC day or month,
+    merged from the per-day compliance rows (never from raw readings).
+    """
+    device = DeviceService.get_by_code_or_404(code)
+    period = request.GET.get("period", "day")
+    if period not in compliance.PERIODS:
+        return Response({"detail": f"period must be one of {', '.join(compliance.PERIODS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    frm, to = _day_param(request.GET.get("from")), _day_param(request.GET.get("to"))
+    report = compliance.report(device, period=period, frm=frm, to=to)
+    if fmt != "csv":
+        return Response(report)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(compliance.COLUMNS)
+    for row in report["results"] + [report["total"]]:
+        writer.writerow(["" if row[c] is None else row[c] for c in compliance.COLUMNS])
+    response = HttpResponse(buf.getvalue(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="compliance_{device.code}_{period}.csv"'
+    return response
+
+
+# GET /api/ingest/noisy-devices?hours=24  (admin)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def ingest_noisy_devices(request):
+    """Devices the ingest rate limit held back within the last `hours`, most limited first."""
+    if not request.user.is_staff:
+        return Response({"detail": "Admin only."}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        hours = min(max(float(request.GET.get("hours", 24)), 0), 24 * 90)
+    except ValueError:
+        return Response({"detail": "hours must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        "enabled": ratelimit.enabled(),
+        "limits": ratelimit.limits(),
+        "hours": hours,
+        "devices": ratelimit.noisy_devices(hours=hours),
+    })
+
+
+MAX_SERIES_DEVICES = 100
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@conditional(global_scope, extra=_sliding_window)
+def metrics_series(request):
+    """
+    GET /api/metrics/series?devices=a,b,c | ?site=ARZAK
+        [&from=ISO&to=ISO | &range=day|week|month|year] [&bucket=..] [&metric=temp|temp_min|temp_max|humidity]
+    Time-aligned matrix for fleet comparison charts: one shared "t" axis and
+    one value column per device (null where a device has no reading).
+    ?format=columnar sends "t" as epoch milliseconds.
+    """
+    codes = [c.strip() for c in (request.GET.get("devices") or "").split(",") if c.strip()]
+    site = request.GET.get("site")
+    if not codes and not site:
+        return Response({"detail": "Pass devices=<code,...> or site=<site>."}, status=status.HTTP_400_BAD_REQUEST)
+
+    devices = Device.objects.filter(is_active=True)
+    if codes:
+        devices = devices.filter(code__in=codes)
+    if site:
+        devices = devices.filter(site=site)
+    devices = list(devices.order_by("code"))
+
+    missing = sorted(set(codes) - {d.code for d in devices})
+    if missing:
+        return Response({"detail": f"Unknown devices: {', '.join(missing)}"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(devices) > MAX_SERIES_DEVICES:
+        return Response({"detail": f"At most {MAX_SERIES_DEVICES} devices per request."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if codes:
+        order = {c: i for i, c in enumerate(codes)}
+        devices.sort(key=lambda d: order[d.code])
+
+    metric = (request.GET.get("metric") or "temp").lower()
+    if metric not in MeasurementService.SERIES_METRICS:
+        return Response({"detail": f"metric must be one of {', '.join(MeasurementService.SERIES_METRICS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    frm, to, bucket = _resolve_range_and_bucket(request)
+
+    data = MeasurementService.aligned_series(devices, frm=frm, to=to, trunc=BUCKET_MAP[bucket], metric=metric)
+    return Response({
+        "t": [epoch_ms(b) if wants_columnar(request) else b.isoformat() for b in data["t"]],
+        "devices": [d.code for d in devices],
+        "series": data["series"],
+        "agg": {
+            "from": frm.isoformat(),
+            "to": to.isoformat(),
+            "points": len(data["t"]),
+            "bucket": bucket,
+            "metric": metric,
+        },
+    })
@@ -0,0 +1,49 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core import excursions
+from core.pagination import decode_cursor, keyset_page, page_size, paginated_response
+from core.watermarks import conditional, device_code_scope, global_scope
+from .services.devices import DeviceService
+from .utils import datetime_param
+
+
+def _page(request, *, device=None, site=None):
+    severity = request.GET.get("severity")
+    if severity and severity not in ("SEVERE", "CRITICAL"):
+        return Response({"detail": "severity must be SEVERE or CRITICAL."}, status=status.HTTP_400_BAD_REQUEST)
+    frm, to = datetime_param(request.GET, "from"), datetime_param(request.GET, "to")
+    sources = excursions.sources(
+        device=device, site=site, frm=frm, to=to, severity=severity,
+        open_only=request.GET.get("open") in ("1", "true", "True"),
+    )
+    rows, next_cursor, prev_cursor = keyset_page(
+        sources, size=page_size(request, default=100), cursor=decode_cursor(request.GET.get("cursor")),
+        descending=True, fields=excursions.EXCURSION_VALUES, key=excursions.KEY,
+    )
+    return paginated_response(request, excursions.excursion_rows(rows), next_cursor, prev_cursor)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@conditional(device_code_scope)
+def device_excursions(request, code: str):
+    """
+    GET /api/devices/{code}/excursions[?from=ISO&to=ISO&severity=CRITICAL&open=1&page_size=N&cursor=..]
+    The device's out-of-range episodes overlapping [from, to], newest first.
+    """
+    return _page(request, device=DeviceService.get_by_code_or_404(code))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@conditional(global_scope)
+def excursions_feed(request):
+    """
+    GET /api/excursions[?site=ARZAK&from=ISO&to=ISO&severity=CRITICAL&open=1&page_size=N&cursor=..]
+    Fleet-wide (or one site's) excursions, newest first, keyset-paged over
+    every shard's excursion index: NORMAL readings are never read.
+    """
+    return _page(request, site=request.GET.get("site"))
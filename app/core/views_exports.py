@@ -0,0 +1,68 @@
+import os
+
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core import exports
+from core.models import ExportJob
+from .export_jobs import enqueue_export, job_as_dict, job_content_type, job_filename
+from .services.devices import DeviceService
+from .utils import datetime_param
+
+
+def _visible_jobs(user):
+    qs = ExportJob.objects.select_related("device")
+    return qs if user.is_staff else qs.filter(user_id=user.id)  # claims users are not model instances
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def exports_list_create(request):
+    """
+    GET  /api/exports   -> your recent export jobs (admins: everyone's)
+    POST /api/exports   -> queue one, body: {"device"|"site", "from", "to", "format", "compress": "gzip"}
+    """
+    if request.method == "GET":
+        jobs = _visible_jobs(request.user).order_by("-created_at")[:50]
+        return Response([job_as_dict(j) for j in jobs])
+
+    fmt = request.data.get("format") or "csv"
+    if fmt not in exports.FORMATS:
+        return Response({"format": f"One of {', '.join(exports.FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+    if not exports.available(fmt):
+        return Response({"detail": f"{fmt} export needs pyarrow."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    code = request.data.get("device")
+    device = DeviceService.get_by_code_or_404(code) if code else None
+    frm, to = datetime_param(request.data, "from"), datetime_param(request.data, "to")
+    job = enqueue_export(
+        user=request.user, device=device, site="" if device else (request.data.get("site") or ""),
+        frm=frm, to=to, fmt=fmt, compress=request.data.get("compress") == "gzip",
+    )
+    return Response(job_as_dict(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_detail(request, job_id: int):
+    """GET /api/exports/{id} -> status + progress (poll until "DONE", then follow "download")"""
+    job = get_object_or_404(_visible_jobs(request.user), id=job_id)
+    return Response(job_as_dict(job))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_download(request, job_id: int):
+    """GET /api/exports/{id}/download -> the finished file"""
+    job = get_object_or_404(_visible_jobs(request.user), id=job_id)
+    if job.status == "EXPIRED":
+        return Response({"detail": "Export file has expired."}, status=status.HTTP_410_GONE)
+    if job.status != "DONE" or not os.path.exists(job.path):
+        return Response({"detail": f"Export is {job.status.lower()}."}, status=status.HTTP_409_CONFLICT)
+    return FileResponse(
+        open(job.path, "rb"), as_attachment=True, filename=job_filename(job), content_type=job_content_type(job)
+    )
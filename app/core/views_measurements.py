@@ -1,19 +1,19 @@
-import csv
-from io import TextIOWrapper
+from django.shortcuts import get_object_or_404
 from django.utils.dateparse import parse_datetime
-from django.db import transaction
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 
-from core.models import Measurement
+from core.models import ImportJob
+from core import exports, imports
+from core.pagination import decode_cursor, page_size, paginated_response
 from .services.devices import DeviceService
 from .services.measurements import MeasurementService
-from .serializers import MeasurementSerializer
+from .serializers import MEASUREMENT_VALUES, measurement_rows
 
 
 # =========================
@@ -25,50 +25,48 @@ def measurements_range(request):
     code = request.GET.get("device")
     frm = parse_datetime(request.GET.get("from")) if request.GET.get("from") else None
     to = parse_datetime(request.GET.get("to")) if request.GET.get("to") else None
-    limit = int(request.GET.get("limit") or 1000)
-
-    if code:
-        device = DeviceService.get_by_code_or_404(code)
-        qs = MeasurementService.series(device=device, frm=frm, to=to)[:limit]
-    else:
-        qs = MeasurementService.recent_all(limit=limit)
-
-    return Response(MeasurementSerializer(qs, many=True).data)
+    size = page_size(request, default=1000)
+    cursor = decode_cursor(request.GET.get("cursor"))
+
+    # one device: oldest first within the window; all devices: newest first
+    device = DeviceService.get_by_code_or_404(code) if code else None
+    rows, next_cursor, prev_cursor = MeasurementService.page(
+        device=device, frm=frm, to=to, size=size, cursor=cursor, descending=device is None,
+        fields=MEASUREMENT_VALUES,
+    )
+    return paginated_response(request, measurement_rows(rows), next_cursor, prev_cursor)
 
 
 # =========================
-# EXPORT CSV
+# EXPORT (CSV / NDJSON / Arrow / Parquet)
 # =========================
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def measurements_export_csv(request):
+def measurements_export(request, fmt="csv"):
+    if fmt not in exports.FORMATS:
+        return Response({"detail": f"Unknown export format {fmt!r}."}, status=status.HTTP_404_NOT_FOUND)
+    if not exports.available(fmt):
+        return Response({"detail": f"{fmt} export needs pyarrow."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    encode, content_type, ext, _ = exports.FORMATS[fmt]
+
     code = request.GET.get("device")
+    site = request.GET.get("site")
     frm = parse_datetime(request.GET.get("from")) if request.GET.get("from") else None
     to = parse_datetime(request.GET.get("to")) if request.GET.get("to") else None
 
-    if code:
-        device = DeviceService.get_by_code_or_404(code)
-        qs = MeasurementService.series(device=device, frm=frm, to=to)
-        filename = f"measurements_{device.code}.csv"
-    else:
-        qs = MeasurementService.recent_all(limit=10000)
-        filename = "measurements_all.csv"
-
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    writer.writerow(["device", "timestamp", "temp_c", "humidity", "state"])
+    device = DeviceService.get_by_code_or_404(code) if code else None
+    filename = exports.export_filename(ext, device=device, site=site)
 
-    for m in qs:
-        writer.writerow([
-            m.device.code,
-            m.ts.isoformat(),
-            m.temp_c,
-            m.humidity,
-            m.state,
-        ])
+    # streamed straight off server-side cursors: no row cap, constant memory
+    rows = exports.iter_rows(device=device, site=site, frm=frm, to=to)
+    body = encode(rows, exports.device_codes(device=device, site=site))
+    if request.GET.get("compress") == "gzip":
+        body = exports.gzip_chunks(body)
+        content_type = "application/gzip"
+        filename += ".gz"
 
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -79,7 +77,11 @@ def measurements_export_csv(request):
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])  # 🔥 REQUIRED
 def measurements_import_csv(request):
-
+    """
+    POST /api/measurements/import.csv   (multipart "file")
+    Small files are imported in the request (200 + report); larger than
+    IMPORT_INLINE_MAX_BYTES, or with ?background=1, they are queued (202 + job).
+    """
     if not request.user.is_staff:
         return Response(
             {"detail": "Only admins can import measurements."},
@@ -92,52 +94,35 @@ def measurements_import_csv(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    file = request.FILES["file"]
-    reader = csv.DictReader(TextIOWrapper(file, encoding="utf-8"))
-
-    inserted = 0
-    skipped = 0
-    errors = []
-
-    with transaction.atomic():
-        for line_no, row in enumerate(reader, start=2):
-            try:
-                device_code = row["device"].strip()
-                ts = parse_datetime(row["timestamp"])
-
-                if not ts:
-                    raise ValueError("Invalid timestamp")
-
-                temp = float(row["temp_c"]) if row.get("temp_c") else None
-                hum = float(row["humidity"]) if row.get("humidity") else None
-
-                device = DeviceService.get_by_code_or_404(device_code)
-
-                if Measurement.objects.filter(device=device, ts=ts).exists():
-                    skipped += 1
-                    continue
-
-                Measurement.objects.create(
-                    device=device,
-                    ts=ts,
-                    temp_c=temp,
-                    humidity=hum,
-                )
-
-                inserted += 1
-
-            except Exception as e:
-                errors.append({
-                    "line": line_no,
-                    "error": str(e),
-                    "row": row,
-                })
+    job = imports.save_upload(request.FILES["file"], user=request.user)
+    if job.bytes_total > imports.inline_max_bytes() or request.GET.get("background") in ("1", "true"):
+        return Response(imports.job_as_dict(job), status=status.HTTP_202_ACCEPTED)
 
+    job = imports.run_import_job(job)
+    if job.status == "FAILED":
+        return Response({"detail": job.error, "job": job.id}, status=status.HTTP_400_BAD_REQUEST)
     return Response(
         {
-            "inserted": inserted,
-            "skipped_duplicates": skipped,
-            "errors": errors,
+            "job": job.id,
+            "inserted": job.inserted,
+            "skipped_duplicates": job.skipped_duplicates,
+            "error_count": job.error_count,
+            "errors": job.errors,
         },
         status=status.HTTP_200_OK,
     )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def measurements_imports(request, job_id: int | None = None):
+    """
+    GET /api/measurements/imports        -> recent import jobs (admin only)
+    GET /api/measurements/imports/{id}   -> one job: stage, progress, per-line error report
+    """
+    if not request.user.is_staff:
+        return Response({"detail": "Admin only."}, status=status.HTTP_403_FORBIDDEN)
+    if job_id is not None:
+        return Response(imports.job_as_dict(get_object_or_404(ImportJob, id=job_id)))
+    jobs = ImportJob.objects.order_by("-created_at")[:20]
+    return Response([{k: v for k, v in imports.job_as_dict(j).items() if k != "errors"} for j in jobs])
@@ -0,0 +1,95 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import live
+from .authentication import CachedJWTAuthentication
+from .models import Device
+
+
+def _authenticate(request):
+    """
+    JWT from `Authorization: Bearer ...` or `?token=` (EventSource can't set
+    headers). Returns the user or None.
+    """
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else request.GET.get("token")
+    if not raw:
+        return None
+    try:
+        return auth.get_read_user(auth.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _device_ids(codes):
+    found = dict(Device.objects.filter(code__in=codes).values_list("code", "id"))
+    missing = [c for c in codes if c not in found]
+    return list(found.values()), missing
+
+
+def _last_event_id(request):
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("lastEventId")
+    try:
+        return int(raw) if raw else None
+    except ValueError:
+        return None
+
+
+async def _events(sub: live.Subscriber, last_id):
+    hub = live.hub()
+    # subscribe before replaying, so nothing falls between the two
+    hub.subscribe(sub)
+    heartbeat = int(getattr(settings, "LIVE_HEARTBEAT_S", 15))
+    try:
+        yield "retry: 3000\n\n"
+        replayed = set()
+        if last_id is not None:
+            rows = await sync_to_async(live.replay)(last_id, device_ids=sub.device_ids, site=sub.site)
+            for row in rows:
+                replayed.add(row["id"])
+                yield live.sse_event(row)
+        while True:
+            try:
+                row = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if row is None:
+                return  # fell behind; the client reconnects with Last-Event-ID
+            if row["id"] in replayed:
+                continue
+            yield live.sse_event(row)
+    finally:
+        hub.unsubscribe(sub)
+
+
+# GET /api/stream?device=CODE[,CODE..]&site=SITE  (text/event-stream)
+@require_GET
+async def live_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "The live stream is served by the ASGI app (coldchain.asgi)."}, status=501)
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    codes = [c for c in (request.GET.get("device") or "").split(",") if c]
+    device_ids = None
+    if codes:
+        device_ids, missing = await sync_to_async(_device_ids)(codes)
+        if missing:
+            return JsonResponse({"detail": f"Unknown device(s): {', '.join(missing)}"}, status=404)
+
+    sub = live.Subscriber(device_ids=device_ids, site=request.GET.get("site"))
+    resp = StreamingHttpResponse(_events(sub, _last_event_id(request)), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+    return resp
@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 
+from .authentication import invalidate_user
 from .serializers.users import (
     UserListSerializer,
     UserCreateSerializer,
@@ -52,10 +53,12 @@ def users_detail(request, user_id: int):
         ser = UserUpdateSerializer(user, data=request.data, partial=partial)
         ser.is_valid(raise_exception=True)
         user = ser.save()
+        invalidate_user(user.id)
         return Response(UserListSerializer(user).data)
 
     # DELETE -> default = soft delete (deactivate)
     hard = request.GET.get("hard") in ("1", "true", "True")
+    invalidate_user(user.id)
     if hard:
         user.delete()
     else:
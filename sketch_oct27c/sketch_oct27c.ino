@@ -1,13 +1,15 @@
 /****************************************************
  * ColdChain IoT - ESP8266 + DHT11 → MQTT (JSON)
  * topic:   coldchain/<DEVICE_ID>/telemetry
- * payload: {"deviceId","ts","tempC","humidity"}
+ * payload: {"deviceId","ts","tempC","humidity","sig"}
+ * sig = hex HMAC-SHA256(DEVICE_KEY, the JSON without "sig")
  ****************************************************/
 
 #include <ESP8266WiFi.h>
 #include <PubSubClient.h>
 #include <DHT.h>
 #include <time.h>  // NTP time
+#include <bearssl/bearssl_hmac.h>  // HMAC-SHA256 for "sig"
 
 // ------------ USER CONFIG ------------
 const char* WIFI_SSID     = "Et@ehei";
@@ -17,6 +19,8 @@ const char* MQTT_HOST = "10.9.9.74";
 const uint16_t MQTT_PORT = 1883;
 
 const char* DEVICE_ID = "fridge-ARZAK-001";
+// hex key from GET /api/devices/<DEVICE_ID>/credentials (re-flash after a rotation)
+const char* DEVICE_KEY = "0000000000000000000000000000000000000000000000000000000000000000";
 #define  DHTPIN   D4                        // change if you wired to another pin (e.g., D2)
 #define  DHTTYPE  DHT11                     // ✅ your sensor is DHT11
 // ------------------------------------
@@ -35,6 +39,7 @@ void ensureMqtt();
 void publishTelemetry();
 void initTime();
 bool readDhtSafe(float &t, float &h);
+void signPayload(char *payload, size_t size);
 
 void setup() {
   Serial.begin(115200);
@@ -48,6 +53,7 @@ void setup() {
   initTime();
 
   mqtt.setServer(MQTT_HOST, MQTT_PORT);
+  mqtt.setBufferSize(512);  // topic + signed payload exceed the 256-byte default
 }
 
 void loop() {
@@ -96,7 +102,7 @@ void initTime() {
   }
   Serial.println();
   time_t now = time(nullptr);
-  if (now < 1700000000) Serial.println("[time] WARNING: NTP not ready; will send without ts");
+  if (now < 1700000000) Serial.println("[time] WARNING: NTP not ready; not publishing until it is");
   else Serial.println("[time] NTP ready");
 }
 
@@ -140,21 +146,22 @@ void publishTelemetry() {
   // Build topic and JSON
   String topic = String("coldchain/") + DEVICE_ID + "/telemetry";
 
-  // ISO timestamp via NTP (UTC). If NTP wasn't ready, omit ts.
-  char payload[200];
+  // ISO timestamp via NTP (UTC). The server refuses signed readings without
+  // one (it is what makes a replayed message recognisable), so wait for NTP.
   time_t now = time(nullptr);
-  if (now >= 1700000000) {
-    struct tm *tm_utc = gmtime(&now);
-    char iso[25];
-    strftime(iso, sizeof(iso), "%Y-%m-%dT%H:%M:%SZ", tm_utc);
-    snprintf(payload, sizeof(payload),
-             "{\"deviceId\":\"%s\",\"ts\":\"%s\",\"tempC\":%.2f,\"humidity\":%.2f}",
-             DEVICE_ID, iso, t, h);
-  } else {
-    snprintf(payload, sizeof(payload),
-             "{\"deviceId\":\"%s\",\"tempC\":%.2f,\"humidity\":%.2f}",
-             DEVICE_ID, t, h);
+  if (now < 1700000000) {
+    Serial.println("[time] NTP not ready, skipping publish");
+    return;
   }
+  struct tm *tm_utc = gmtime(&now);
+  char iso[25];
+  strftime(iso, sizeof(iso), "%Y-%m-%dT%H:%M:%SZ", tm_utc);
+
+  char payload[256];
+  snprintf(payload, sizeof(payload),
+           "{\"deviceId\":\"%s\",\"ts\":\"%s\",\"tempC\":%.2f,\"humidity\":%.2f}",
+           DEVICE_ID, iso, t, h);
+  signPayload(payload, sizeof(payload));
 
   bool ok = mqtt.publish(topic.c_str(), payload);
   Serial.printf("[mqtt] publish topic=%s ok=%s payload=%s\n",
@@ -178,3 +185,28 @@ bool readDhtSafe(float &t, float &h) {
   }
   return false;
 }
+
+// Append ,"sig":"<hex HMAC-SHA256(key, payload)>" as the last member, over the
+// exact bytes sent without it (the server checks them as received).
+void signPayload(char *payload, size_t size) {
+  uint8_t key[32];
+  for (int i = 0; i < 32; i++) {
+    char byteHex[3] = { DEVICE_KEY[2 * i], DEVICE_KEY[2 * i + 1], 0 };
+    key[i] = (uint8_t) strtoul(byteHex, nullptr, 16);
+  }
+
+  br_hmac_key_context kc;
+  br_hmac_context ctx;
+  uint8_t mac[32];
+  br_hmac_key_init(&kc, &br_sha256_vtable, key, sizeof(key));
+  br_hmac_init(&ctx, &kc, 0);
+  br_hmac_update(&ctx, payload, strlen(payload));
+  br_hmac_out(&ctx, mac);
+
+  size_t len = strlen(payload) - 1;  // drop the closing brace
+  len += snprintf(payload + len, size - len, ",\"sig\":\"");
+  for (int i = 0; i < 32; i++) {
+    len += snprintf(payload + len, size - len, "%02x", mac[i]);
+  }
+  snprintf(payload + len, size - len, "\"}");
+}